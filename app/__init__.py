@@ -4,8 +4,11 @@ from flask_migrate import Migrate
 import config as config_module
 from datetime import datetime
 
-def create_app(config_name='default'):
-    """Application factory pattern"""
+def create_app(config_name='default', preload_models=True):
+    """Application factory pattern
+    
+    preload_models: start loading MODEL_PRELOAD in the background; scripts that only need the database pass False.
+    """
     app = Flask(__name__)
     app.config.from_object(config_module.config[config_name])
     config_module.config[config_name].init_app(app)
@@ -67,16 +70,12 @@ def create_app(config_name='default'):
     app.register_blueprint(prediction_api, url_prefix='/api')
     app.register_blueprint(api_bp, url_prefix='/api')
     
-    # Initialize model service with default model
-    with app.app_context():
+    # Load the default model in a background thread so the app starts serving at once; /api/health reports
+    # readiness separately from liveness until the model is loaded and warmed up
+    if preload_models and app.config.get('MODEL_PRELOAD'):
         from app.services import model_service
         try:
-            # Try to load default model (kronos-mini for faster startup)
-            success, message = model_service.load_model('kronos-mini')
-            if success:
-                app.logger.info(f"✅ Default model loaded: {message}")
-            else:
-                app.logger.warning(f"⚠️  Failed to load default model: {message}")
+            model_service.start_background_load(app, app.config['MODEL_PRELOAD'], warmup=app.config.get('MODEL_WARMUP', True))
         except Exception as e:
             app.logger.error(f"❌ Model initialization error: {e}")
     
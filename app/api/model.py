@@ -4,11 +4,15 @@ from app.services import model_service
 
 @api_bp.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint: liveness, plus whether the default model is loaded and warmed up"""
     try:
-        # Basic health check - ensure the service is running
+        # Basic health check - ensure the service is running; a cold model does not make it unhealthy
+        readiness = model_service.get_readiness()
         return jsonify({
             'status': 'healthy',
+            'live': True,
+            'ready': readiness['ready'],
+            'readiness': readiness,
             'timestamp': __import__('datetime').datetime.now().isoformat(),
             'service': 'kronos-stock-prediction'
         }), 200
@@ -18,6 +22,23 @@ def health_check():
             'error': str(e)
         }), 500
 
+@api_bp.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe: the process serves requests"""
+    return jsonify({'live': True}), 200
+
+@api_bp.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until a model is loaded and warmed up, so no traffic is routed to a cold model"""
+    try:
+        readiness = model_service.get_readiness()
+        return jsonify(readiness), 200 if readiness['ready'] else 503
+    except Exception as e:
+        return jsonify({
+            'ready': False,
+            'error': str(e)
+        }), 503
+
 @api_bp.route('/models', methods=['GET'])
 def get_models():
     """Get available models"""
@@ -68,7 +89,7 @@ def load_model():
 
 @api_bp.route('/models/status', methods=['GET']) 
 def get_model_status():
-    """Get current model status"""
+    """Get current model status, including the resident models and registry hit/miss and load-time stats"""
     try:
         status = model_service.get_model_status()
         return jsonify({
@@ -83,9 +104,10 @@ def get_model_status():
 
 @api_bp.route('/models/unload', methods=['POST'])
 def unload_model():
-    """Unload current model"""
+    """Unload one resident model, or all of them when no model_name is given"""
     try:
-        model_service.unload_model()
+        data = request.get_json(silent=True) or {}
+        model_service.unload_model(data.get('model_name'))
         return jsonify({
             'success': True,
             'message': 'Model unloaded successfully'
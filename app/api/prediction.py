@@ -1,9 +1,8 @@
-from flask import Blueprint, request, jsonify, render_template, make_response
+from flask import Blueprint, request, jsonify, render_template, make_response, Response, stream_with_context
 import time
 import traceback
 import json
 import logging
-import numpy as np
 from datetime import datetime, timedelta
 from app.services import model_service
 from app.services.prediction_service import prediction_service
@@ -26,7 +25,8 @@ def predict():
         # Extract parameters from frontend form
         stock_code = data.get('stock_code')
         prediction_days = data.get('prediction_days', 7)
-        model_type = data.get('model_type', 'kronos-mini')
+        # Requests without model_type go to the active model
+        model_type = data.get('model_type') or model_service.active_model or 'kronos-mini'
         
         # Map to backend parameters
         lookback = 30  # Default lookback period
@@ -84,7 +84,7 @@ def predict():
             }), 500
         
         # Make prediction
-        success, result = prediction_service.predict_stock(stock_code, lookback, pred_len, temperature)
+        success, result = prediction_service.predict_stock(stock_code, lookback, pred_len, temperature, model_type)
         
         # Calculate execution time
         execution_time = time.time() - start_time
@@ -153,6 +153,100 @@ def predict():
             'traceback': full_traceback if request.args.get('debug') == 'true' else None
         }), 500
 
+def _sse_event(event, data):
+    """Format one server-sent event; multi-line payloads become several data lines"""
+    lines = ''.join(f'data: {line}\n' for line in data.split('\n'))
+    return f'event: {event}\n{lines}\n'
+
+@prediction_api.route('/predictions/stream', methods=['GET'])
+def stream_prediction():
+    """Stream forecast bars as server-sent events while they are sampled
+    
+    Events: 'bar' for every forecast day, then 'done' with the full result or 'error'. Payloads are HTML
+    fragments for the HTMX sse extension, or JSON with ?format=json.
+    """
+    start_time = time.time()
+    stock_code = request.args.get('stock_code')
+    model_type = request.args.get('model_type') or model_service.active_model or 'kronos-mini'
+    as_json = request.args.get('format') == 'json'
+    lookback = 30  # Default lookback period
+    temperature = 0.7  # Default temperature
+    
+    if not stock_code:
+        return jsonify({
+            'success': False,
+            'error': 'stock_code is required'
+        }), 400
+    
+    try:
+        pred_len = int(request.args.get('prediction_days', 7))
+    except (ValueError, TypeError):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid parameter types'
+        }), 400
+    
+    if not (1 <= pred_len <= 30):
+        return jsonify({
+            'success': False,
+            'error': 'prediction_days must be between 1 and 30 days'
+        }), 400
+    
+    prediction_record = PredictionRecord(
+        stock_code=stock_code,
+        prediction_days=pred_len,
+        model_type=model_type,
+        lookback=lookback,
+        temperature=temperature,
+        status='processing',
+        user_id=request.remote_addr,
+        session_id=request.headers.get('X-Session-ID', 'unknown')
+    )
+    try:
+        db.session.add(prediction_record)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': f'Database error: {str(e)}'
+        }), 500
+    
+    def events():
+        for event, data in prediction_service.predict_stock_stream(stock_code, lookback, pred_len, temperature, model_type):
+            if event == 'done':
+                data['record_id'] = prediction_record.id
+            try:
+                if event == 'done':
+                    prediction_record.status = 'completed'
+                    prediction_record.execution_time = time.time() - start_time
+                    prediction_record.set_prediction_data(data)
+                    db.session.commit()
+                elif event == 'error':
+                    prediction_record.status = 'failed'
+                    prediction_record.error_message = data.get('error', 'Prediction failed')
+                    prediction_record.execution_time = time.time() - start_time
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Failed to update prediction record {prediction_record.id}: {e}")
+            
+            if as_json:
+                payload = json.dumps(data, ensure_ascii=False)
+            elif event == 'bar':
+                payload = render_template('components/prediction_row.html', item=data)
+            elif event == 'done':
+                payload = render_template('components/prediction_result.html', success=True, data=data)
+            else:
+                payload = render_template('components/prediction_result.html', success=False,
+                                          error=data.get('error', 'Prediction failed'))
+            yield _sse_event(event, payload)
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let nginx pass events through unbuffered
+    return response
+
 @prediction_api.route('/notifications/check', methods=['GET'])
 def check_notifications():
     return jsonify({
@@ -313,6 +407,8 @@ def get_prediction_record(record_id):
 
 def calculate_prediction_accuracy_with_service(record, stock_service):
     """Calculate prediction accuracy using stock service"""
+    import numpy as np
+    
     try:
         prediction_data = record.get_prediction_data()
         if not prediction_data or 'prediction_results' not in prediction_data:
@@ -396,6 +492,8 @@ def calculate_prediction_accuracy_with_service(record, stock_service):
 
 def calculate_prediction_accuracy(record, current_df):
     """Legacy function for backward compatibility"""
+    import numpy as np
+    
     try:
         prediction_data = record.get_prediction_data()
         if not prediction_data or 'prediction_results' not in prediction_data:
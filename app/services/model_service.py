@@ -1,21 +1,118 @@
+import importlib.util
 import os
 import sys
+import threading
+import time
 import warnings
-from typing import Optional, Dict, Any, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator, Tuple
 from flask import current_app
 
 warnings.filterwarnings('ignore')
 
+WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin')
+# Imported on the first model load, not at startup
+MODEL_PACKAGES = ('model', 'torch', 'einops')
+
+def _module_bytes(*modules) -> int:
+    """Memory held by the tensors of modules, including packed int8 weights and non-persistent buffers"""
+    import torch
+    
+    storages = {}
+    for module in modules:
+        tensors = list(module.buffers())
+        for value in module.state_dict(keep_vars=True).values():
+            tensors.extend(value if isinstance(value, tuple) else [value])
+        for tensor in tensors:
+            if isinstance(tensor, torch.Tensor) and tensor.numel():
+                storages[tensor.data_ptr()] = tensor.numel() * tensor.element_size()
+    return sum(storages.values())
+
+class ResidentModel:
+    """One model kept in memory by ModelService, with its own predictor and scheduler (None when unbatched)"""
+    
+    def __init__(self, name: str, tokenizer, model, predictor, scheduler, size_bytes: int, load_seconds: float):
+        self.name = name
+        self.tokenizer = tokenizer
+        self.model = model
+        self.predictor = predictor
+        self.scheduler = scheduler
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.requests = 0
+        self.last_used = time.time()
+        # Requests holding the model from lookup until their prediction resolves, see ModelService.lease
+        self.leases = 0
+        # Serialises unbatched predictions, which share the predictor's caches and statistics
+        self.lock = threading.Lock()
+    
+    def is_busy(self) -> bool:
+        """Whether the model still has queued or running requests"""
+        if self.leases:
+            return True
+        if self.scheduler is None:
+            return self.lock.locked()
+        stats = self.scheduler.get_stats()
+        return bool(stats['queued'] or stats['active_rows'])
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'size_mb': round(self.size_bytes / 2 ** 20, 1),
+            'load_seconds': round(self.load_seconds, 3),
+            'requests': self.requests,
+            'last_used': self.last_used
+        }
+
 class ModelService:
-    """AI model management service"""
+    """AI model management service
+    
+    Keeps several models resident in a least-recently-used registry bounded by MODEL_MEMORY_BUDGET_MB. Requests name
+    the model they want; a model that is not resident is loaded on demand, evicting the least recently used idle
+    models to stay within the budget. The active model, the one last loaded explicitly, serves requests that do not
+    name one.
+    
+    The lock only guards lookups and changes of the registry. Loads run outside it, so requests for resident models
+    are never held up by a load; concurrent requests for a model being loaded wait on its future in _loading.
+    """
     
     def __init__(self):
-        self.tokenizer = None
-        self.model = None 
-        self.predictor = None
+        self._models = OrderedDict()  # name -> ResidentModel, least recently used first
+        self._loading = {}  # name -> Future of the (success, message) of its load in progress
+        self._preload = None  # Future of the background load started by start_background_load
+        self._lock = threading.RLock()
+        self.active_model = None
+        self.registry_stats = {'hits': 0, 'misses': 0, 'loads': 0, 'failed_loads': 0, 'evictions': 0,
+                               'total_load_seconds': 0.0, 'last_load_seconds': None}
+        self.stream_stats = {'streams': 0, 'last_time_to_first_bar': None, 'mean_time_to_first_bar': None}
+        # Progress of the background load started by create_app, see start_background_load
+        self.readiness = {'state': 'not_loaded', 'model': None, 'error': None, 'load_seconds': None, 'warmup_seconds': None}
+        self._loader = None
         self._setup_paths()
         self._model_available = self._check_model_availability()
     
+    @property
+    def tokenizer(self):
+        entry = self._models.get(self.active_model)
+        return entry.tokenizer if entry else None
+    
+    @property
+    def model(self):
+        entry = self._models.get(self.active_model)
+        return entry.model if entry else None
+    
+    @property
+    def predictor(self):
+        entry = self._models.get(self.active_model)
+        return entry.predictor if entry else None
+    
+    @property
+    def scheduler(self):
+        entry = self._models.get(self.active_model)
+        return entry.scheduler if entry else None
+    
     def _setup_paths(self):
         """Setup model import paths"""
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,82 +120,394 @@ class ModelService:
         
         if current_dir not in sys.path:
             sys.path.insert(0, current_dir)
-            
+        
         embedded_model_dir = os.path.join(root_dir, 'model')
         if os.path.isdir(embedded_model_dir) and embedded_model_dir not in sys.path:
             sys.path.insert(0, embedded_model_dir)
-            
+        
         if root_dir not in sys.path:
             sys.path.append(root_dir)
     
     def _check_model_availability(self) -> bool:
-        """Check if model code is available"""
-        try:
-            from model import Kronos, KronosTokenizer, KronosPredictor
-            return True
-        except Exception as e:
-            current_app.logger.error(f"Model import error: {e}")
-            return False
+        """Check if model code is available
+        
+        Only locates the packages: importing the model package pulls in torch, which takes seconds, so the import
+        is left to the first model load and import errors surface there.
+        """
+        missing = [name for name in MODEL_PACKAGES if importlib.util.find_spec(name) is None]
+        if missing:
+            try:
+                current_app.logger.error(f"Model import error: missing {', '.join(missing)}")
+            except RuntimeError:
+                # No app context available during init
+                pass
+        return not missing
     
     def get_available_models(self) -> Dict[str, Any]:
         """Get list of available models"""
         return current_app.config['AVAILABLE_MODELS']
     
-    def load_model(self, model_name: str) -> Tuple[bool, str]:
-        """Load specified model"""
+    def _memory_budget(self) -> int:
+        return int(current_app.config.get('MODEL_MEMORY_BUDGET_MB', 4096) * 2 ** 20)
+    
+    def _resident_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._models.values())
+    
+    def _estimate_bytes(self, model_name: str) -> int:
+        """Size of the weight files of a model and its draft model, known before loading them"""
+        models_config = self.get_available_models()
+        names = [model_name, models_config[model_name].get('draft_model')]
+        total = 0
+        for name in filter(None, names):
+            for weight_file in WEIGHT_FILES:
+                path = os.path.join(current_app.config['MODEL_DIR'], name, weight_file)
+                if os.path.isfile(path):
+                    total += os.path.getsize(path)
+                    break
+        return total
+    
+    def _evict(self, needed_bytes: int, keep: Optional[str] = None):
+        """Evict least recently used idle models until needed_bytes more fit in the budget"""
+        budget = self._memory_budget()
+        for name in list(self._models):
+            if self._resident_bytes() + needed_bytes <= budget:
+                return
+            entry = self._models[name]
+            if name == keep or entry.is_busy():
+                continue
+            self._release(name)
+            self.registry_stats['evictions'] += 1
+            current_app.logger.info(f"Evicted model {name} ({entry.size_bytes / 2 ** 20:.0f} MB) to stay within the memory budget")
+        if self._resident_bytes() + needed_bytes > budget:
+            current_app.logger.warning(f"Resident models exceed the memory budget of {budget / 2 ** 20:.0f} MB")
+    
+    def _release(self, name: str):
+        entry = self._models.pop(name)
+        if entry.scheduler is not None:
+            entry.scheduler.shutdown()
+    
+    def _load(self, model_name: str, future: Future) -> Tuple[bool, str]:
+        """Load model_name into the registry and resolve future, registered in _loading, with the outcome"""
+        try:
+            result = self._build(model_name)
+        except Exception as e:
+            self.registry_stats['failed_loads'] += 1
+            result = False, f"Failed to load model {model_name}: {str(e)}"
+            current_app.logger.error(result[1])
+        finally:
+            with self._lock:
+                del self._loading[model_name]
+        future.set_result(result)
+        return result
+    
+    def _build(self, model_name: str) -> Tuple[bool, str]:
+        """Build the predictor of model_name without holding the lock, then register it"""
+        from model import Kronos, KronosTokenizer, KronosPredictor
+        
+        models_config = self.get_available_models()
+        model_path = os.path.join(current_app.config['MODEL_DIR'], model_name)
+        if not os.path.exists(model_path):
+            return False, f"Model path {model_path} does not exist"
+        
+        # Make room before loading, so that the new weights never join a full registry
+        with self._lock:
+            self._evict(self._estimate_bytes(model_name))
+        start_time = time.perf_counter()
+        
+        # Load tokenizer and model with CPU device
+        import torch
+        device = torch.device('cpu')  # Force CPU usage
+        
+        # Optional dynamic int8 quantization, selected per model in AVAILABLE_MODELS
+        quantize = models_config[model_name].get('quantize')
+        
+        tokenizer = KronosTokenizer.from_pretrained(model_path, quantize=quantize)
+        model = Kronos.from_pretrained(model_path, quantize=quantize)
+        
+        # Move model to CPU
+        model = model.to(device)
+        model.eval()  # Set to evaluation mode
+        
+        # Optional speculative decoding: a smaller model with the same vocabulary drafts tokens for this one
+        draft_name = models_config[model_name].get('draft_model')
+        draft_model = None
+        if draft_name:
+            draft_path = os.path.join(current_app.config['MODEL_DIR'], draft_name)
+            draft_model = Kronos.from_pretrained(draft_path, quantize=quantize).to(device).eval()
+        
+        # Create predictor with CPU device
+        precision = models_config[model_name].get('precision', 'fp32')
+        compiled = models_config[model_name].get('compiled', False)
+        predictor = KronosPredictor(model, tokenizer, device="cpu", precision=precision,
+                                    compiled=compiled, compile_cache_dir=current_app.config.get('COMPILE_CACHE_DIR'),
+                                    draft_model=draft_model)
+        
+        # Concurrent predictions share decode steps through one continuous-batching worker per model. The batcher
+        # decodes with the eager model only, so speculative and compiled models serve predictions one at a time
+        # through their predictor instead
+        scheduler = None
+        if not (draft_model is not None or compiled):
+            from .scheduler_service import InferenceScheduler
+            scheduler = InferenceScheduler(predictor, current_app.config.get('INFERENCE_BATCH_ROWS', 64))
+        
+        load_seconds = time.perf_counter() - start_time
+        size_bytes = _module_bytes(predictor.tokenizer, predictor.model, *filter(None, [predictor.draft_model]))
+        with self._lock:
+            self._models[model_name] = ResidentModel(model_name, predictor.tokenizer, predictor.model, predictor,
+                                                     scheduler, size_bytes, load_seconds)
+            stats = self.registry_stats
+            stats['loads'] += 1
+            stats['total_load_seconds'] += load_seconds
+            stats['last_load_seconds'] = load_seconds
+            # The estimate misses what loading adds, e.g. bf16 copies or traced graphs
+            self._evict(0, keep=model_name)
+        
+        current_app.logger.info(f"Successfully loaded model: {model_name}" + (f" ({quantize})" if quantize else "")
+                                + f" in {load_seconds:.2f}s, {size_bytes / 2 ** 20:.0f} MB")
+        return True, f"Model {model_name} loaded successfully"
+    
+    def use_model(self, model_name: Optional[str] = None) -> Tuple[bool, str]:
+        """Make a model resident for a request, loading it on a miss
+        
+        model_name defaults to the active model. Counts a registry hit or miss. A miss on a model another request
+        is already loading waits for that load instead of starting a second one.
+        """
         if not self._model_available:
             return False, "Model code not available"
+        model_name = model_name or self.active_model
+        if model_name is None:
+            return False, "No model is loaded. Please load a model first."
+        if model_name not in self.get_available_models():
+            return False, f"Model {model_name} not found"
         
-        try:
-            from model import Kronos, KronosTokenizer, KronosPredictor
-            
-            models_config = self.get_available_models()
-            if model_name not in models_config:
-                return False, f"Model {model_name} not found"
-            
-            model_path = os.path.join(current_app.config['MODEL_DIR'], model_name)
-            if not os.path.exists(model_path):
-                return False, f"Model path {model_path} does not exist"
+        with self._lock:
+            entry = self._models.get(model_name)
+            if entry is not None:
+                self.registry_stats['hits'] += 1
+                self._models.move_to_end(model_name)
+                entry.last_used = time.time()
+                return True, f"Model {model_name} already loaded"
             
-            # Load tokenizer and model with CPU device
-            import torch
-            device = torch.device('cpu')  # Force CPU usage
-            
-            self.tokenizer = KronosTokenizer.from_pretrained(model_path)
-            self.model = Kronos.from_pretrained(model_path)
-            
-            # Move model to CPU
-            self.model = self.model.to(device)
-            self.model.eval()  # Set to evaluation mode
-            
-            # Create predictor with CPU device
-            self.predictor = KronosPredictor(self.model, self.tokenizer, device="cpu")
-            
-            current_app.logger.info(f"Successfully loaded model: {model_name}")
-            return True, f"Model {model_name} loaded successfully"
-            
-        except Exception as e:
-            error_msg = f"Failed to load model {model_name}: {str(e)}"
-            current_app.logger.error(error_msg)
-            return False, error_msg
+            self.registry_stats['misses'] += 1
+            future = self._loading.get(model_name)
+            if future is None:
+                future = self._loading[model_name] = Future()
+                loading = False
+            else:
+                loading = True
+        
+        if loading:
+            if future is self._preload:
+                # Startup answers at once while the default model loads; readiness tells when to come back
+                return False, f"Model {model_name} is still loading, please try again shortly"
+            return future.result()
+        return self._load(model_name, future)
     
-    def is_model_loaded(self) -> bool:
-        """Check if a model is currently loaded"""
-        return all([self.tokenizer, self.model, self.predictor])
+    def load_model(self, model_name: str) -> Tuple[bool, str]:
+        """Load specified model and make it the active model"""
+        success, message = self.use_model(model_name)
+        if success:
+            self.active_model = model_name
+        return success, message
+    
+    def get_resident_model(self, model_name: Optional[str] = None, pin: bool = False) -> ResidentModel:
+        """The resident model serving a request for model_name (default: the active model), loaded if needed
+        
+        pin takes a lease on the model under the registry lock, so that it cannot be evicted before the caller
+        releases it; use lease rather than pinning directly.
+        """
+        model_name = model_name or self.active_model
+        with self._lock:
+            entry = self._models.get(model_name)
+        if entry is None:
+            # Evicted since use_model, or never requested through it
+            success, message = self.use_model(model_name)
+            if not success:
+                raise RuntimeError(message)
+        with self._lock:
+            entry = self._models.get(model_name)
+            if entry is None:
+                raise RuntimeError(f"Model {model_name} was evicted while loading")
+            self._models.move_to_end(model_name)
+            entry.requests += 1
+            entry.last_used = time.time()
+            if pin:
+                entry.leases += 1
+            return entry
+    
+    @contextmanager
+    def lease(self, model_name: Optional[str] = None):
+        """The resident model for model_name (default: the active model), kept from eviction until the block exits"""
+        entry = self.get_resident_model(model_name, pin=True)
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.leases -= 1
+    
+    def get_predictor(self, model_name: Optional[str] = None):
+        """The predictor of model_name (default: the active model), loaded if needed"""
+        return self.get_resident_model(model_name).predictor
+    
+    def is_model_loaded(self, model_name: Optional[str] = None) -> bool:
+        """Check if a model, by default the active one, is currently loaded"""
+        return (model_name or self.active_model) in self._models
+    
+    def start_background_load(self, app, model_name: str, warmup: bool = True) -> threading.Thread:
+        """Load model_name as the active model in a background thread, then warm it up
+        
+        The app serves requests meanwhile; get_readiness tells when the model is ready. Requests for the model that
+        arrive during the load are answered at once that it is still loading, rather than waiting for it.
+        """
+        self.readiness.update(state='loading', model=model_name, error=None, load_seconds=None, warmup_seconds=None)
+        future = None
+        with self._lock:
+            # Unknown models and models already resident or loading go through load_model in the thread
+            known = model_name in app.config['AVAILABLE_MODELS']
+            if known and model_name not in self._models and model_name not in self._loading:
+                future = self._preload = self._loading[model_name] = Future()
+        self._loader = threading.Thread(target=self._background_load, args=(app, model_name, warmup, future),
+                                        name='kronos-model-loader', daemon=True)
+        self._loader.start()
+        return self._loader
+    
+    def _background_load(self, app, model_name: str, warmup: bool, future: Optional[Future]):
+        with app.app_context():
+            start_time = time.perf_counter()
+            if future is None:
+                success, message = self.load_model(model_name)
+            else:
+                success, message = self._load(model_name, future)
+                if success:
+                    self.active_model = model_name
+            if not success:
+                self.readiness.update(state='failed', error=message)
+                app.logger.warning(f"⚠️  Failed to load default model: {message}")
+                return
+            self.readiness['load_seconds'] = time.perf_counter() - start_time
+            if warmup:
+                self.readiness['state'] = 'warming_up'
+                try:
+                    self.readiness['warmup_seconds'] = self.warmup(model_name)
+                except Exception as e:
+                    # A cold model still serves requests, only the first ones are slower
+                    app.logger.warning(f"Warmup of {model_name} failed: {e}")
+            self.readiness['state'] = 'ready'
+            app.logger.info(f"✅ Default model ready: {message}")
+    
+    def warmup(self, model_name: Optional[str] = None, lookback: int = 30, pred_len: int = 5) -> float:
+        """Run a dummy forecast on a resident model and return its duration in seconds
+        
+        The first forecast of a model pays for allocator growth, kernel selection and, for compiled models, tracing
+        the graphs of its shapes; the shapes used here are those of the prediction API.
+        """
+        import numpy as np
+        import pandas as pd
+        
+        close = 10 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, lookback)))
+        df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': 1e5})
+        dates = pd.Series(pd.bdate_range('2024-01-01', periods=lookback + pred_len))
+        start_time = time.perf_counter()
+        with self.lease(model_name) as entry:
+            self._predict(entry, df, dates[:lookback], dates[lookback:].reset_index(drop=True), pred_len, T=0.7,
+                          top_p=0.9)
+        return time.perf_counter() - start_time
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        """Whether the app can serve forecasts: a model is loaded and no background load or warmup is running"""
+        readiness = dict(self.readiness)
+        if readiness['state'] not in ('loading', 'warming_up'):
+            if self.is_model_loaded():
+                readiness['state'] = 'ready'
+            elif readiness['state'] == 'ready':
+                readiness['state'] = 'not_loaded'
+        readiness['ready'] = readiness['state'] == 'ready'
+        return readiness
+    
+    def is_ready(self) -> bool:
+        return self.get_readiness()['ready']
     
     def get_model_status(self) -> Dict[str, Any]:
         """Get current model status"""
-        return {
+        status = {
             'available': self._model_available,
             'loaded': self.is_model_loaded(),
+            'active_model': self.active_model,
+            'readiness': self.get_readiness(),
             'models': self.get_available_models()
         }
+        with self._lock:
+            resident = [entry.as_dict() for entry in reversed(self._models.values())]
+            lookups = self.registry_stats['hits'] + self.registry_stats['misses']
+            status['registry'] = dict(
+                self.registry_stats,
+                resident=resident,
+                loading=sorted(self._loading),
+                hit_rate=self.registry_stats['hits'] / lookups if lookups else None,
+                resident_mb=round(self._resident_bytes() / 2 ** 20, 1),
+                budget_mb=round(self._memory_budget() / 2 ** 20, 1)
+            )
+        if self.predictor is not None and getattr(self.predictor, 'draft_model', None) is not None:
+            status['speculative'] = self.predictor.speculative_stats.as_dict()
+        if self.scheduler is not None:
+            status['scheduler'] = self.scheduler.get_stats()
+        if self.stream_stats['streams']:
+            status['streaming'] = dict(self.stream_stats)
+        return status
+    
+    def record_first_bar(self, seconds: float):
+        """Track the time from a streaming request to its first forecast bar"""
+        stats = self.stream_stats
+        stats['streams'] += 1
+        stats['last_time_to_first_bar'] = seconds
+        previous = stats['mean_time_to_first_bar'] or 0.0
+        stats['mean_time_to_first_bar'] = previous + (seconds - previous) / stats['streams']
+        current_app.logger.info(f"Time to first bar: {seconds * 1000:.0f} ms")
+    
+    def submit_prediction(self, df, x_timestamp, y_timestamp, pred_len: int, T: float = 1.0, top_k: int = 0,
+                          top_p: float = 0.9, sample_count: int = 1, model_name: Optional[str] = None):
+        """Run one prediction on model_name (default: the active model), batched with concurrent ones"""
+        with self.lease(model_name) as entry:
+            return self._predict(entry, df, x_timestamp, y_timestamp, pred_len, T=T, top_k=top_k, top_p=top_p,
+                                 sample_count=sample_count)
+    
+    def stream_prediction(self, df, x_timestamp, y_timestamp, pred_len: int, T: float = 1.0, top_k: int = 0,
+                          top_p: float = 0.9, sample_count: int = 1, model_name: Optional[str] = None) -> Iterator:
+        """Predict on model_name (default: the active model) bar by bar, see KronosPredictor.predict_stream
+        
+        Streams run on the predictor, not through the scheduler; the model is leased and its lock held until the
+        stream ends or is closed.
+        """
+        with self.lease(model_name) as entry, entry.lock:
+            yield from entry.predictor.predict_stream(df=df, x_timestamp=x_timestamp, y_timestamp=y_timestamp,
+                                                      pred_len=pred_len, T=T, top_k=top_k, top_p=top_p,
+                                                      sample_count=sample_count)
+    
+    def _predict(self, entry: ResidentModel, df, x_timestamp, y_timestamp, pred_len: int, T: float = 1.0,
+                 top_k: int = 0, top_p: float = 0.9, sample_count: int = 1):
+        if entry.scheduler is None:
+            with entry.lock:
+                return entry.predictor.predict(df=df, x_timestamp=x_timestamp, y_timestamp=y_timestamp,
+                                               pred_len=pred_len, T=T, top_k=top_k, top_p=top_p,
+                                               sample_count=sample_count, verbose=False)
+        future = entry.scheduler.submit(df, x_timestamp, y_timestamp, pred_len, T=T, top_k=top_k, top_p=top_p,
+                                        sample_count=sample_count)
+        timeout = current_app.config.get('PREDICTION_TIMEOUT_SECONDS')
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # The scheduler drops the request if it has not started decoding yet
+            future.cancel()
+            raise RuntimeError(f"Prediction on {entry.name} did not finish within {timeout:.0f}s")
     
-    def unload_model(self):
-        """Unload current model to free memory"""
-        self.tokenizer = None
-        self.model = None
-        self.predictor = None
+    def unload_model(self, model_name: Optional[str] = None):
+        """Unload one model, or all of them, to free memory"""
+        with self._lock:
+            for name in [model_name] if model_name else list(self._models):
+                if name in self._models:
+                    self._release(name)
+            if self.active_model not in self._models:
+                self.active_model = None
 
 # Global model service instance
-model_service = ModelService()
\ No newline at end of file
+model_service = ModelService()
@@ -1,55 +1,30 @@
-import pandas as pd
 import datetime
 import json
 import os
-from typing import Dict, Any, List, Tuple, Optional
+import time
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Tuple, Optional
 from flask import current_app
 
 from .model_service import model_service
 from .stock_service import stock_service
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 class PredictionService:
     """Stock prediction service"""
     
     def predict_stock(self, stock_code: str, lookback: int = 30, 
-                     pred_len: int = 5, temperature: float = 0.7) -> Tuple[bool, Dict[str, Any]]:
-        """Predict stock prices"""
+                     pred_len: int = 5, temperature: float = 0.7, model_type: Optional[str] = None) -> Tuple[bool, Dict[str, Any]]:
+        """Predict stock prices with model_type, by default the active model"""
         try:
-            # Validate inputs
-            if not model_service.is_model_loaded():
-                return False, {'error': 'No model is loaded. Please load a model first.'}
-            
-            # Validate stock code
-            valid, validated_code = stock_service.validate_stock_code(stock_code)
-            if not valid:
-                return False, {'error': f'Invalid stock code: {validated_code}'}
-            
-            # Get stock data
-            success, df, message = stock_service.get_stock_data(validated_code)
+            success, inputs = self._prepare_inputs(stock_code, lookback, pred_len, model_type)
             if not success:
-                return False, {'error': message}
-            
-            if len(df) < lookback:
-                return False, {'error': f'Insufficient data. Need at least {lookback} days, got {len(df)} days.'}
-            
-            # Prepare data for prediction
-            x_df = df.iloc[-lookback:][['open', 'high', 'low', 'close', 'volume']].copy()
-            x_timestamp = pd.Series(df.iloc[-lookback:].index)  # Convert DatetimeIndex to Series
-            
-            # Generate future timestamps (trading days only)
-            last_timestamp = df.index[-1]
-            if hasattr(last_timestamp, 'date'):
-                last_date = last_timestamp.date()
-            else:
-                last_date = pd.to_datetime(last_timestamp).date()
-            
-            future_dates = self._generate_future_trading_dates(
-                last_date, pred_len
-            )
-            y_timestamp = pd.Series(future_dates)
+                return False, inputs
+            validated_code, df, x_df, x_timestamp, y_timestamp = inputs
             
             # Make prediction
-            pred_df = model_service.predictor.predict(
+            pred_df = model_service.submit_prediction(
                 df=x_df,
                 x_timestamp=x_timestamp, 
                 y_timestamp=y_timestamp,
@@ -57,37 +32,125 @@ class PredictionService:
                 T=temperature,
                 top_p=0.9,
                 sample_count=1,
-                verbose=False
+                model_name=model_type
             )
             
-            # Format prediction results
-            results = self._format_prediction_results(pred_df, df['close'].iloc[-1])
+            return True, self._build_result(validated_code, df, pred_df, lookback, pred_len, temperature)
             
-            # Generate summary
-            summary = self._generate_prediction_summary(df, pred_df, lookback, pred_len)
+        except Exception as e:
+            error_msg = f'Prediction failed: {str(e)}'
+            current_app.logger.error(error_msg)
+            return False, {'error': error_msg}
+    
+    def predict_stock_stream(self, stock_code: str, lookback: int = 30, pred_len: int = 5, temperature: float = 0.7,
+                             model_type: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Predict stock prices bar by bar
+        
+        Yields ('bar', bar) for every forecast day as soon as it is sampled, then ('done', result) with the same
+        result as predict_stock plus the time to first bar, or ('error', {'error': ...}).
+        """
+        import pandas as pd
+        
+        try:
+            success, inputs = self._prepare_inputs(stock_code, lookback, pred_len, model_type)
+            if not success:
+                yield 'error', inputs
+                return
+            validated_code, df, x_df, x_timestamp, y_timestamp = inputs
             
-            # Save prediction results
-            filename = self._save_prediction_results(validated_code, results, df, {
-                'lookback': lookback,
-                'pred_len': pred_len, 
-                'temperature': temperature
-            })
+            start_time = time.perf_counter()
+            time_to_first_bar = None
+            bars = []
+            prev_close = float(df['close'].iloc[-1])
+            for bar_df in model_service.stream_prediction(x_df, x_timestamp, y_timestamp, pred_len, T=temperature,
+                                                          top_p=0.9, sample_count=1, model_name=model_type):
+                if time_to_first_bar is None:
+                    time_to_first_bar = time.perf_counter() - start_time
+                    model_service.record_first_bar(time_to_first_bar)
+                bar = self._format_prediction_results(bar_df, prev_close)[0]
+                prev_close = bar['close']
+                bars.append(bar_df)
+                yield 'bar', bar
             
-            return True, {
-                'stock_code': validated_code,
-                'prediction_results': results,
-                'prediction_summary': summary,
-                'saved_file': filename,
-                'historical_data': self._format_historical_data(df.tail(30))  # Last 30 days for chart
-            }
+            pred_df = pd.concat(bars)
+            result = self._build_result(validated_code, df, pred_df, lookback, pred_len, temperature)
+            result['time_to_first_bar'] = time_to_first_bar
+            yield 'done', result
             
         except Exception as e:
             error_msg = f'Prediction failed: {str(e)}'
             current_app.logger.error(error_msg)
-            return False, {'error': error_msg}
+            yield 'error', {'error': error_msg}
     
-    def _generate_future_trading_dates(self, last_date: datetime.date, pred_len: int) -> List[pd.Timestamp]:
+    def _prepare_inputs(self, stock_code: str, lookback: int, pred_len: int,
+                        model_type: Optional[str] = None) -> Tuple[bool, Any]:
+        """Validate the request and build the model inputs"""
+        import pandas as pd
+        
+        # Validate inputs; the requested model is loaded here if it is not resident
+        success, message = model_service.use_model(model_type)
+        if not success:
+            return False, {'error': message}
+        
+        # Validate stock code
+        valid, validated_code = stock_service.validate_stock_code(stock_code)
+        if not valid:
+            return False, {'error': f'Invalid stock code: {validated_code}'}
+        
+        # Get stock data
+        success, df, message = stock_service.get_stock_data(validated_code)
+        if not success:
+            return False, {'error': message}
+        
+        if len(df) < lookback:
+            return False, {'error': f'Insufficient data. Need at least {lookback} days, got {len(df)} days.'}
+        
+        # Prepare data for prediction
+        x_df = df.iloc[-lookback:][['open', 'high', 'low', 'close', 'volume']].copy()
+        x_timestamp = pd.Series(df.iloc[-lookback:].index)  # Convert DatetimeIndex to Series
+        
+        # Generate future timestamps (trading days only)
+        last_timestamp = df.index[-1]
+        if hasattr(last_timestamp, 'date'):
+            last_date = last_timestamp.date()
+        else:
+            last_date = pd.to_datetime(last_timestamp).date()
+        
+        future_dates = self._generate_future_trading_dates(
+            last_date, pred_len
+        )
+        y_timestamp = pd.Series(future_dates)
+        
+        return True, (validated_code, df, x_df, x_timestamp, y_timestamp)
+    
+    def _build_result(self, validated_code: str, df: 'pd.DataFrame', pred_df: 'pd.DataFrame',
+                      lookback: int, pred_len: int, temperature: float) -> Dict[str, Any]:
+        """Format, summarise and save a finished prediction"""
+        # Format prediction results
+        results = self._format_prediction_results(pred_df, df['close'].iloc[-1])
+        
+        # Generate summary
+        summary = self._generate_prediction_summary(df, pred_df, lookback, pred_len)
+        
+        # Save prediction results
+        filename = self._save_prediction_results(validated_code, results, df, {
+            'lookback': lookback,
+            'pred_len': pred_len, 
+            'temperature': temperature
+        })
+        
+        return {
+            'stock_code': validated_code,
+            'prediction_results': results,
+            'prediction_summary': summary,
+            'saved_file': filename,
+            'historical_data': self._format_historical_data(df.tail(30))  # Last 30 days for chart
+        }
+    
+    def _generate_future_trading_dates(self, last_date: datetime.date, pred_len: int) -> List['pd.Timestamp']:
         """Generate future trading dates (weekdays only)"""
+        import pandas as pd
+        
         future_dates = []
         current_date = last_date
         
@@ -98,7 +161,7 @@ class PredictionService:
         
         return future_dates
     
-    def _format_prediction_results(self, pred_df: pd.DataFrame, last_close: float) -> List[Dict[str, Any]]:
+    def _format_prediction_results(self, pred_df: 'pd.DataFrame', last_close: float) -> List[Dict[str, Any]]:
         """Format prediction results for API response"""
         results = []
         prev_close = last_close
@@ -122,7 +185,7 @@ class PredictionService:
         
         return results
     
-    def _format_historical_data(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _format_historical_data(self, df: 'pd.DataFrame') -> List[Dict[str, Any]]:
         """Format historical data for charts"""
         historical = []
         
@@ -146,7 +209,7 @@ class PredictionService:
         
         return historical
     
-    def _generate_prediction_summary(self, df: pd.DataFrame, pred_df: pd.DataFrame,
+    def _generate_prediction_summary(self, df: 'pd.DataFrame', pred_df: 'pd.DataFrame',
                                    lookback: int, pred_len: int) -> Dict[str, Any]:
         """Generate prediction summary statistics"""
         current_price = float(df['close'].iloc[-1])
@@ -163,7 +226,7 @@ class PredictionService:
         }
     
     def _save_prediction_results(self, stock_code: str, results: List[Dict[str, Any]], 
-                               df: pd.DataFrame, params: Dict[str, Any]) -> str:
+                               df: 'pd.DataFrame', params: Dict[str, Any]) -> str:
         """Save prediction results to file"""
         try:
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
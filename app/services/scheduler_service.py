@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceScheduler:
+    """Continuous-batching scheduler shared by all prediction requests
+
+    A single worker thread owns the model. Requests are queued from any thread and joined into the running
+    batch between decode steps, so concurrent users share forward passes instead of serialising on the model.
+    """
+
+    def __init__(self, predictor, max_batch_rows: int = 64):
+        from model.batching import ContinuousBatcher
+
+        self.predictor = predictor
+        self.batcher = ContinuousBatcher.from_predictor(predictor, max_rows=max_batch_rows)
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'unbatched': 0, 'steps': 0, 'max_rows': 0}
+        self._thread = threading.Thread(target=self._run, name='kronos-scheduler', daemon=True)
+        self._thread.start()
+
+    def submit(self, df, x_timestamp, y_timestamp, pred_len: int, T: float = 1.0, top_k: int = 0,
+               top_p: float = 0.9, sample_count: int = 1) -> Future:
+        """Queue one prediction; the returned future resolves to the same DataFrame as `KronosPredictor.predict`"""
+        from model.batching import GenerationRequest
+
+        if self._stopped.is_set():
+            raise RuntimeError("Inference scheduler has been shut down")
+
+        # Validation errors surface in the caller's thread
+        x, x_stamp, y_stamp, x_mean, x_std = self.predictor.prepare(df, x_timestamp, y_timestamp)
+        future = Future()
+        request = GenerationRequest(x, x_stamp, y_stamp, pred_len, T=T, top_k=top_k, top_p=top_p,
+                                    sample_count=sample_count, tag=(future, x_mean, x_std, y_timestamp))
+        self._stats['submitted'] += 1
+        self._queue.put(request)
+        return future
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scheduler counters"""
+        return dict(self._stats, queued=self._queue.qsize(), active_rows=self.batcher.num_rows)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop the worker thread; requests still queued or in flight fail"""
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _resolve(self, request):
+        future, x_mean, x_std, y_timestamp = request.tag
+        if future.cancelled():
+            # The caller timed out while the request was decoding
+            return
+        future.set_result(self.predictor.denormalize(request.preds, x_mean, x_std, y_timestamp))
+        self._stats['completed'] += 1
+
+    def _fail(self, requests, error):
+        for request in requests:
+            future = request.tag[0]
+            if not future.done():
+                future.set_exception(error)
+                self._stats['failed'] += 1
+
+    def _run_unbatched(self, request):
+        """Requests longer than max_context need the sliding window of auto_regressive_inference"""
+        try:
+            preds = self.predictor.generate(request.x[None], request.x_stamp[None], request.y_stamp[None], request.pred_len,
+                                            request.T, request.top_k, request.top_p, request.sample_count, verbose=False)
+            request.preds = preds[0]
+            self._resolve(request)
+            self._stats['unbatched'] += 1
+        except Exception as e:
+            self._fail([request], e)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # Block only while idle; otherwise pick up new arrivals between decode steps
+            try:
+                request = self._queue.get(block=not self.batcher.has_work())
+            except queue.Empty:
+                request = None
+            while request is not None:
+                if request.tag[0].cancelled():
+                    # The caller timed out while the request was queued
+                    pass
+                elif self.batcher.fits(request):
+                    self.batcher.add(request)
+                else:
+                    self._run_unbatched(request)
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    request = None
+            if self._stopped.is_set():
+                break
+            if not self.batcher.has_work():
+                continue
+
+            try:
+                finished = self.batcher.step()
+            except Exception as e:
+                logger.error(f"Batched decode step failed: {e}")
+                self._fail(self.batcher.reset(), e)
+                continue
+            self._stats['steps'] += 1
+            self._stats['max_rows'] = max(self._stats['max_rows'], self.batcher.num_rows)
+            for request in finished:
+                self._resolve(request)
+
+        # Fail whatever is left so no caller waits forever
+        error = RuntimeError("Inference scheduler has been shut down")
+        self._fail(self.batcher.reset(), error)
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                self._fail([request], error)
@@ -1,9 +1,11 @@
-import pandas as pd
-import numpy as np
+import importlib.util
 import datetime
-from typing import Optional, Tuple, Dict, Any
+from typing import TYPE_CHECKING, Optional, Tuple, Dict, Any
 from flask import current_app
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 class StockService:
     """Stock data management service"""
     
@@ -11,11 +13,14 @@ class StockService:
         self._stock_data_available = self._check_stock_data_availability()
     
     def _check_stock_data_availability(self) -> bool:
-        """Check if china_stock_data is available"""
+        """Check if china_stock_data is available
+        
+        Only locates the package: importing it pulls in akshare, and creating a StockData may hit the network, so
+        both are left to the first data request, where errors are reported per request.
+        """
         try:
-            from china_stock_data import StockData
-            # Test if we can create an instance
-            test_instance = StockData('000001')
+            if importlib.util.find_spec('china_stock_data') is None:
+                raise ImportError("No module named 'china_stock_data'")
             return True
         except (ImportError, Exception) as e:
             # Log warning if we have app context
@@ -26,8 +31,10 @@ class StockService:
                 pass
             return False
     
-    def get_stock_data(self, stock_code: str, period: str = '1y') -> Tuple[bool, pd.DataFrame, str]:
+    def get_stock_data(self, stock_code: str, period: str = '1y') -> Tuple[bool, 'pd.DataFrame', str]:
         """Get stock data for given code and period"""
+        import pandas as pd
+        
         if not self._stock_data_available:
             error_msg = "Stock data service is not available. Please install china_stock_data package."
             current_app.logger.error(error_msg)
@@ -40,8 +47,9 @@ class StockService:
             current_app.logger.error(error_msg)
             return False, pd.DataFrame(), error_msg
     
-    def _get_real_stock_data(self, stock_code: str, period: str) -> Tuple[bool, pd.DataFrame, str]:
+    def _get_real_stock_data(self, stock_code: str, period: str) -> Tuple[bool, 'pd.DataFrame', str]:
         """Get real stock data using china_stock_data"""
+        import pandas as pd
         from china_stock_data import StockData
         
         try:
@@ -69,8 +77,10 @@ class StockService:
             current_app.logger.error(f"Error getting real stock data: {e}")
             return False, pd.DataFrame(), f"Error retrieving data: {str(e)}"
     
-    def _standardize_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _standardize_dataframe(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
         """Standardize dataframe column names and format"""
+        import pandas as pd
+        
         # Column mapping from Chinese/various formats to standard English names
         column_mapping = {
             '开盘': 'open', 'open': 'open', '开盘价': 'open',
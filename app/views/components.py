@@ -1,4 +1,4 @@
-from flask import render_template, request
+from flask import render_template, request, url_for
 from . import views_bp
 from app.services import model_service, prediction_service, stock_service
 
@@ -39,6 +39,13 @@ def prediction_result_component():
         return render_template('components/prediction_result.html',
                              success=False, error=str(e))
 
+@views_bp.route('/components/prediction-stream')
+def prediction_stream_component():
+    """HTMX component that renders forecast bars as they stream in"""
+    stream_url = url_for('prediction_api.stream_prediction', **request.args.to_dict())
+    return render_template('components/prediction_stream.html',
+                         stream_url=stream_url, stock_code=request.args.get('stock_code', ''))
+
 @views_bp.route('/components/load-model', methods=['POST'])
 def load_model_component():
     """HTMX component for loading models"""
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+CPU micro-benchmark of the attention backends across sequence lengths.
+
+Times one causal self-attention call of shape [batch, n_heads, seq_len, head_dim] per backend. Kernels that are
+not available on the current device are reported as n/a.
+
+Usage: python benchmarks/bench_attention.py [--seq-lens 32 128 512 2048] [--n-heads 8] [--head-dim 64]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+
+from common import measure, print_table
+from model.module import ATTENTION_BACKENDS, attention, get_attention_backend, set_attention_backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seq-lens', type=int, nargs='+', default=[32, 64, 128, 256, 512, 1024, 2048])
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--n-heads', type=int, default=8)
+    parser.add_argument('--head-dim', type=int, default=64)
+    parser.add_argument('--backends', nargs='+', default=list(ATTENTION_BACKENDS))
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    previous = get_attention_backend()
+    rows = []
+    with torch.no_grad():
+        for seq_len in args.seq_lens:
+            q, k, v = (torch.randn(args.batch_size, args.n_heads, seq_len, args.head_dim) for _ in range(3))
+            row = [seq_len]
+            for backend in args.backends:
+                set_attention_backend(backend)
+                try:
+                    seconds = measure(lambda: attention(q, k, v, is_causal=True), repeat=args.repeat)
+                    row.append(f'{seconds * 1000:.3f}')
+                except RuntimeError:
+                    row.append('n/a')
+            rows.append(row)
+    set_attention_backend(previous)
+
+    print(f"\nbatch={args.batch_size} n_heads={args.n_heads} head_dim={args.head_dim} threads={torch.get_num_threads()} (ms per call)")
+    print_table(['seq_len'] + list(args.backends), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+fp32 vs. bfloat16 autocast inference (KronosPredictor(..., precision='bf16')).
+
+Throughput is forecast bars per second over a fixed set of synthetic series. Drift is the MAPE of the bf16 close
+forecast against fp32 for the same seed, next to the fp32 seed-to-seed MAPE as a noise floor. Weight memory is the
+size of the model and tokenizer parameters and buffers. bf16 is only faster on CPUs with AVX512-BF16 or AMX.
+
+Usage: python benchmarks/bench_bf16.py [--models kronos-mini kronos-base] [--series 4] [--pred-len 20]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import torch
+
+from common import add_common_args, load_kronos, make_series, measure, print_table, setup_threads
+from model import KronosPredictor
+
+
+def weight_mb(*modules):
+    tensors = [t for m in modules for t in (*m.parameters(), *m.buffers())]
+    return sum(t.numel() * t.element_size() for t in tensors) / 2 ** 20
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--series', type=int, default=4, help='Number of fixed synthetic series')
+    parser.add_argument('--lookback', type=int, default=200)
+    parser.add_argument('--pred-len', type=int, default=20)
+    parser.add_argument('--sample-count', type=int, default=5)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    series = [make_series(args.lookback, args.pred_len, seed=i) for i in range(args.series)]
+
+    rows = []
+    for model_name in args.models:
+        results = {}
+        for precision in ('fp32', 'bf16'):
+            tokenizer, model = load_kronos(model_name, args.model_dir)
+            predictor = KronosPredictor(model, tokenizer, device='cpu', precision=precision)
+
+            def predict(seed=0):
+                closes = []
+                for df, x_timestamp, y_timestamp in series:
+                    torch.manual_seed(seed)
+                    pred = predictor.predict(df, x_timestamp, y_timestamp, args.pred_len,
+                                             sample_count=args.sample_count, verbose=False)
+                    closes.append(pred['close'].to_numpy())
+                return np.stack(closes)
+
+            seconds = measure(predict, repeat=args.repeat)
+            results[precision] = (args.series * args.pred_len / seconds, weight_mb(model, tokenizer),
+                                  predict(0), predict(1) if precision == 'fp32' else None)
+
+        fp32, bf16 = results['fp32'], results['bf16']
+        drift = np.mean(np.abs(bf16[2] - fp32[2]) / np.abs(fp32[2])) * 100
+        noise = np.mean(np.abs(fp32[3] - fp32[2]) / np.abs(fp32[2])) * 100
+        rows.append([
+            model_name,
+            f'{fp32[0]:.1f}',
+            f'{bf16[0]:.1f}',
+            f'{bf16[0] / fp32[0]:.2f}x',
+            f'{fp32[1]:.0f}',
+            f'{bf16[1]:.0f}',
+            f'{drift:.3f}',
+            f'{noise:.3f}',
+        ])
+
+    print(f"\nseries={args.series} lookback={args.lookback} pred_len={args.pred_len} "
+          f"sample_count={args.sample_count} threads={torch.get_num_threads()}")
+    print_table(['model', 'fp32 bars/s', 'bf16 bars/s', 'speedup', 'fp32 weights MB', 'bf16 weights MB',
+                 'bf16 MAPE %', 'seed MAPE %'], rows)
+
+
+if __name__ == '__main__':
+    main()
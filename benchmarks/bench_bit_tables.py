@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Bit/index conversions of the tokenizer: per-call bitwise arithmetic vs. precomputed bit tables.
+
+Decode used to expand every s1/s2 id against a freshly built `2 ** arange` mask; it is now one embedding_bag over
+the quantizer's table of scaled codes (2^s1_bits + 2^s2_bits rows). Encode used to run the whole quantizer, losses
+included, and pack the bits with a float power-of-two sum; it now packs the signs of the projection as integers.
+Both conversions are timed on `--batch-size` x `--context` tokens, together with the full tokenizer encode and decode.
+
+Usage: python benchmarks/bench_bit_tables.py [--models kronos-mini] [--batch-size 8 64] [--context 512]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+
+from common import add_common_args, load_kronos, make_inputs, measure, print_table, setup_threads
+
+
+def bitwise_indices_to_bits(x, codebook_dim):
+    """`KronosTokenizer.indices_to_bits(half=True)` as it was before the bit tables."""
+    mask = 2 ** torch.arange(codebook_dim // 2, device=x[0].device, dtype=torch.long)
+    bits = torch.cat([(x[0].unsqueeze(-1) & mask) != 0, (x[1].unsqueeze(-1) & mask) != 0], dim=-1)
+    return (bits.float() * 2 - 1) * (1. / (codebook_dim ** 0.5))
+
+
+def bitwise_indices(quantizer, z):
+    """`BSQuantizer.forward(half=True)` indices as computed before, through the quantizer with its losses."""
+    _, _, z_indices = quantizer(z, half=True)
+    return z_indices
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[8, 64])
+    parser.add_argument('--context', type=int, default=512)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    rows = []
+    for model_name in args.models:
+        tokenizer, _ = load_kronos(model_name, args.model_dir)
+        quantizer = tokenizer.tokenizer
+        for batch_size in args.batch_size:
+            x, _, _ = make_inputs(batch_size, args.context, 0)
+            with torch.no_grad():
+                z = torch.randn(batch_size, args.context, tokenizer.codebook_dim)
+                ids = tokenizer.encode(x, half=True)
+                cases = {
+                    'decode bits': (lambda: bitwise_indices_to_bits(ids, tokenizer.codebook_dim),
+                                    lambda: tokenizer.indices_to_bits(ids, half=True)),
+                    'encode ids': (lambda: bitwise_indices(quantizer, z), lambda: quantizer.indices(z, half=True)),
+                }
+                for case, (bitwise, table) in cases.items():
+                    before, after = measure(bitwise, repeat=args.repeat), measure(table, repeat=args.repeat)
+                    rows.append([model_name, batch_size, case, f'{before * 1000:.2f}', f'{after * 1000:.2f}',
+                                 f'{before / after:.2f}x'])
+                # For scale: the end-to-end tokenizer calls the conversions are part of
+                for case, fn in (('tokenizer encode', lambda: tokenizer.encode(x, half=True)),
+                                 ('tokenizer decode', lambda: tokenizer.decode(ids, half=True))):
+                    rows.append([model_name, batch_size, case, '', f'{measure(fn, repeat=args.repeat) * 1000:.2f}', ''])
+
+    print(f"\ncontext={args.context} threads={torch.get_num_threads()}")
+    print_table(['model', 'batch', 'case', 'bitwise ms', 'table ms', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
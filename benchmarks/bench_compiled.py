@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Eager vs. compiled (TorchScript) decoding loop.
+
+Reports the steady-state time of one `auto_regressive_inference` call in both modes, the first compiled call
+(tracing every graph), the first call after a restart that loads the graphs from the on-disk cache, and the max
+absolute difference of the forecasts for the same seed.
+
+Usage: python benchmarks/bench_compiled.py [--models kronos-mini] [--batch-size 1] [--context 200] [--pred-len 20]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import torch
+
+from common import add_common_args, load_kronos, make_inputs, measure, print_table, setup_threads
+from model.compiled import CompiledKronos, CompiledKronosTokenizer
+from model.kronos import auto_regressive_inference
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--batch-size', type=int, default=1, help='Number of series per call')
+    parser.add_argument('--context', type=int, default=200)
+    parser.add_argument('--pred-len', type=int, default=20)
+    parser.add_argument('--max-context', type=int, default=512)
+    parser.add_argument('--sample-count', type=int, default=5)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    x, x_stamp, y_stamp = make_inputs(args.batch_size, args.context, args.pred_len)
+
+    rows = []
+    for model_name in args.models:
+        tokenizer, model = load_kronos(model_name, args.model_dir)
+        cache_dir = tempfile.mkdtemp(prefix=f'{model_name}-compiled-')
+
+        def run(tok, mod):
+            torch.manual_seed(0)
+            return auto_regressive_inference(tok, mod, x, x_stamp, y_stamp, args.max_context, args.pred_len,
+                                             sample_count=args.sample_count)
+
+        def first_call():
+            start = time.perf_counter()
+            preds = run(CompiledKronosTokenizer(tokenizer, cache_dir), CompiledKronos(model, cache_dir))
+            return time.perf_counter() - start, preds
+
+        cold_time, compiled_preds = first_call()
+        restart_time, _ = first_call()
+
+        compiled_tokenizer, compiled_model = CompiledKronosTokenizer(tokenizer, cache_dir), CompiledKronos(model, cache_dir)
+        eager_time = measure(lambda: run(tokenizer, model), repeat=args.repeat)
+        compiled_time = measure(lambda: run(compiled_tokenizer, compiled_model), repeat=args.repeat, warmup=2)
+        diff = np.abs(run(tokenizer, model) - compiled_preds).max()
+
+        rows.append([
+            model_name,
+            f'{eager_time * 1000:.1f}',
+            f'{compiled_time * 1000:.1f}',
+            f'{eager_time / compiled_time:.2f}x',
+            f'{cold_time:.2f}',
+            f'{restart_time:.2f}',
+            f'{diff:.1e}',
+        ])
+
+    print(f"\nbatch_size={args.batch_size} context={args.context} pred_len={args.pred_len} "
+          f"sample_count={args.sample_count} threads={torch.get_num_threads()}")
+    print_table(['model', 'eager ms', 'compiled ms', 'speedup', 'first call s', 'warm restart s', 'max |diff|'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Separate vs. fused q/k/v and w1/w3 projections on CPU.
+
+`fuse_projections` concatenates the weights of linear layers that read the same input, so each transformer block
+runs one GEMM for q/k/v and one for w1/w3 instead of five. Reports the prefill of `--context` tokens, the tokenizer
+encode of the history, the per-step latency of cached decoding and the end-to-end forecast, for the separate
+(`fuse=False`) and the fused layout of the same weights.
+
+Usage: python benchmarks/bench_fusion.py [--models kronos-mini kronos-small] [--context 400] [--batch-size 1 8]
+"""
+
+import argparse
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+
+from common import add_common_args, load_kronos, make_inputs, measure, print_table, setup_threads
+from model.kronos import auto_regressive_inference
+from model.module import fuse_projections
+
+
+def time_cases(tokenizer, model, x, x_stamp, y_stamp, args):
+    """Returns (encode, prefill, decode step, forecast) times in seconds."""
+    s1_ids, s2_ids = tokenizer.encode(x, half=True)
+
+    def prefill():
+        model.decode_s1_step(s1_ids, s2_ids, x_stamp, kv_cache=model.init_kv_cache())
+
+    kv_cache = model.init_kv_cache()
+    _, context = model.decode_s1_step(s1_ids, s2_ids, x_stamp, kv_cache=kv_cache)
+    prefix_len = kv_cache[0].position
+
+    def step():
+        for layer_cache in kv_cache:
+            layer_cache.truncate(prefix_len)
+        logits, last = model.decode_s1_step(s1_ids[:, -1:], s2_ids[:, -1:], x_stamp[:, -1:], kv_cache=kv_cache)
+        model.decode_s2_step(last, logits.argmax(dim=-1, keepdim=True), kv_cache=kv_cache)
+
+    def forecast():
+        torch.manual_seed(0)
+        auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 512, args.pred_len, sample_count=1)
+
+    with torch.no_grad():
+        return (measure(lambda: tokenizer.encode(x, half=True), repeat=args.repeat), measure(prefill, repeat=args.repeat),
+                measure(step, repeat=args.repeat * 10), measure(forecast, repeat=args.repeat))
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--context', type=int, default=400, help='History length in tokens')
+    parser.add_argument('--pred-len', type=int, default=30, help='Forecast horizon of the end-to-end case')
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args()
+    setup_threads(args)
+
+    rows = []
+    for model_name in args.models:
+        tokenizer, model = load_kronos(model_name, args.model_dir, fuse=False)
+        fused_tokenizer, fused_model = fuse_projections(copy.deepcopy(tokenizer)), fuse_projections(copy.deepcopy(model))
+        for batch_size in args.batch_size:
+            x, x_stamp, y_stamp = make_inputs(batch_size, args.context, args.pred_len)
+            separate = time_cases(tokenizer, model, x, x_stamp, y_stamp, args)
+            fused = time_cases(fused_tokenizer, fused_model, x, x_stamp, y_stamp, args)
+            for case, before, after in zip(('encode', 'prefill', 'decode step', 'forecast'), separate, fused):
+                rows.append([model_name, batch_size, case, f'{before * 1000:.2f}', f'{after * 1000:.2f}', f'{before / after:.2f}x'])
+
+    print(f"\ncontext={args.context} pred_len={args.pred_len} threads={torch.get_num_threads()}")
+    print_table(['model', 'batch', 'case', 'separate ms', 'fused ms', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Mixed horizons in one batch: decoding every series to the longest horizon vs. retiring series at their own horizon.
+
+`--batch-size` series with the same history length get horizons cycling through `--horizons` (5 and 30 days by
+default). The padded case runs `auto_regressive_inference` with the longest horizon for every row, which is what
+`predict_batch` required before per-series horizons; the ragged case passes one horizon per series and compacts
+finished rows out of the batch. Only the decoding steps shrink; the prefill of the histories costs the same in both
+cases, so the gain grows with `--sample-count` and the share of short horizons.
+
+Usage: python benchmarks/bench_horizons.py [--models kronos-mini] [--batch-size 16] [--horizons 5 30]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+
+from common import add_common_args, load_kronos, make_inputs, measure, print_table, setup_threads
+from model.kronos import auto_regressive_inference
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--context', type=int, default=200)
+    parser.add_argument('--horizons', type=int, nargs='+', default=[5, 30])
+    parser.add_argument('--sample-count', type=int, default=5)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    rows = []
+    for model_name in args.models:
+        tokenizer, model = load_kronos(model_name, args.model_dir)
+        for batch_size in args.batch_size:
+            horizons = torch.tensor([args.horizons[i % len(args.horizons)] for i in range(batch_size)])
+            max_horizon = int(horizons.max())
+            x, x_stamp, y_stamp = make_inputs(batch_size, args.context, max_horizon)
+
+            def run(pred_len):
+                return auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 512, pred_len, top_p=0.9,
+                                                 sample_count=args.sample_count)
+
+            padded = measure(lambda: run(max_horizon), repeat=args.repeat)
+            ragged = measure(lambda: run(horizons), repeat=args.repeat)
+            rows.append([
+                model_name,
+                batch_size,
+                f'{padded * 1000:.0f}',
+                f'{ragged * 1000:.0f}',
+                f'{padded / ragged:.2f}x',
+                f'{int(horizons.sum()) / max_horizon / batch_size:.2f}',
+            ])
+
+    print(f"\ncontext={args.context} horizons={args.horizons} sample_count={args.sample_count} threads={torch.get_num_threads()}")
+    print_table(['model', 'batch', 'padded ms', 'ragged ms', 'speedup', 'row-step ratio'], rows)
+
+
+if __name__ == '__main__':
+    main()
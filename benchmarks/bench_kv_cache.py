@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Per-step decoding latency with and without the key/value cache.
+
+Usage: python benchmarks/bench_kv_cache.py [--models kronos-mini kronos-small] [--context 400] [--pred-len 30]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+
+from common import add_common_args, load_kronos, make_inputs, measure, print_table, setup_threads
+from model.kronos import auto_regressive_inference
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--context', type=int, default=400, help='History length in tokens')
+    parser.add_argument('--pred-len', type=int, default=30, help='Forecast horizon')
+    parser.add_argument('--max-context', type=int, default=512)
+    parser.add_argument('--sample-count', type=int, default=1)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    x, x_stamp, y_stamp = make_inputs(1, args.context, args.pred_len)
+    rows = []
+    for model_name in args.models:
+        tokenizer, model = load_kronos(model_name, args.model_dir)
+        results = {}
+        for use_cache in (False, True):
+            def run():
+                torch.manual_seed(0)
+                return auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, args.max_context, args.pred_len,
+                                                 sample_count=args.sample_count, use_cache=use_cache)
+            results[use_cache] = measure(run, repeat=args.repeat)
+
+        full, cached = results[False], results[True]
+        rows.append([
+            model_name,
+            f'{full * 1000 / args.pred_len:.2f}',
+            f'{cached * 1000 / args.pred_len:.2f}',
+            f'{full / cached:.2f}x',
+        ])
+
+    print(f"\ncontext={args.context} pred_len={args.pred_len} sample_count={args.sample_count} threads={torch.get_num_threads()}")
+    print_table(['model', 'recompute ms/step', 'kv-cache ms/step', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
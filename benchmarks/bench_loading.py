@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Model loading: randomly initialised modules plus a copied state dict vs. memory-mapped weights on meta-built modules.
+
+The previous `Kronos.from_pretrained` built the model with `_init_weights`, read the whole checkpoint into memory
+and copied it into the parameters, so peak memory held the weights twice. It now maps `model.safetensors` and
+builds the model with its parameters on the meta device, so the mapped tensors become the parameters. Each case
+runs in a fresh process and reports the first and the median later load time, the peak RSS of the process and its
+RSS after `--switches` reloads of the model, keeping only the last one as a model switch in the app does. The first
+mapped load also pays for torch's one-off setup of the meta device. Models without a checkpoint in `--model-dir`
+get a random one written to a temporary directory.
+
+Usage: python benchmarks/bench_loading.py [--models kronos-mini kronos-small] [--switches 6]
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+
+from common import MODEL_PRESETS, add_common_args, print_table, rss_mb, setup_threads
+from config import Config
+from model import Kronos
+
+
+def checkpoint_dir(model_name, model_dir=None, tmp_dir=None):
+    """Returns a directory holding config.json and model.safetensors for model_name, writing one to tmp_dir if needed."""
+    path = os.path.join(model_dir or Config.MODEL_DIR, model_name)
+    if os.path.isfile(os.path.join(path, 'model.safetensors')):
+        return path
+    from safetensors.torch import save_file
+    path = os.path.join(tmp_dir, model_name)
+    os.makedirs(path)
+    with open(os.path.join(path, 'config.json'), 'w') as f:
+        json.dump(MODEL_PRESETS[model_name], f)
+    save_file(Kronos(**MODEL_PRESETS[model_name]).state_dict(), os.path.join(path, 'model.safetensors'))
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB. ru_maxrss is not used: Linux carries it over from the parent."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+
+
+def copy_load(path):
+    """The loading path before memory mapping: initialise, read the file, copy into the parameters."""
+    from safetensors.torch import load_file
+    with open(os.path.join(path, 'config.json')) as f:
+        model = Kronos(**json.load(f))
+    model.load_state_dict(load_file(os.path.join(path, 'model.safetensors')), strict=False)
+    return model
+
+
+def mapped_load(path):
+    return Kronos.from_pretrained(path, fuse=False)
+
+
+def worker(case, path, switches):
+    """Runs in a fresh process; prints the first and the median later load time, peak RSS and final RSS as JSON."""
+    load = copy_load if case == 'copy' else mapped_load
+    model, seconds = None, []
+    for _ in range(switches + 1):
+        model = None
+        gc.collect()
+        start = time.perf_counter()
+        model = load(path)
+        seconds.append(time.perf_counter() - start)
+        # Touch every weight, as the first forecast would
+        with torch.no_grad():
+            sum(float(p.sum()) for p in model.parameters())
+    print(json.dumps({'first': seconds[0], 'reload': statistics.median(seconds[1:]), 'peak': peak_rss_mb(), 'final': rss_mb()}))
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--switches', type=int, default=6, help='Reloads after the first load')
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    setup_threads(args)
+    if args.worker:
+        worker(*args.worker, args.switches)
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix='kronos-loading-')
+    paths = {name: checkpoint_dir(name, args.model_dir, tmp_dir) for name in args.models}
+    rows = []
+    for model_name, path in paths.items():
+        for case in ('copy', 'mmap'):
+            runs = []
+            for _ in range(args.repeat):
+                output = subprocess.run([sys.executable, __file__, '--switches', str(args.switches), '--worker', case, path],
+                                        check=True, capture_output=True, text=True).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            best = min(runs, key=lambda run: run['reload'])
+            rows.append([model_name, case, f"{best['first'] * 1000:.0f}", f"{best['reload'] * 1000:.0f}", f"{best['peak']:.0f}",
+                         f"{best['final']:.0f}"])
+    shutil.rmtree(tmp_dir)
+
+    print(f"\nswitches={args.switches} threads={torch.get_num_threads()}")
+    print_table(['model', 'load', 'first load ms', 'reload ms', 'peak RSS MB', 'RSS after switches MB'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+fp32 vs. dynamic int8 quantized CPU inference (Kronos.from_pretrained(..., quantize='int8')).
+
+Each (model, mode) pair is loaded in a fresh process so the RSS numbers are not polluted by the other variant.
+Latency is the median KronosPredictor.predict wall time per series. Drift is the MAPE of the int8 close forecast
+against the fp32 forecast for the same seed, next to the fp32 seed-to-seed MAPE as a noise floor.
+
+Usage: python benchmarks/bench_quantization.py [--models kronos-base] [--series 8] [--pred-len 20]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import torch
+
+from common import add_common_args, load_kronos, make_series, measure, print_table, rss_mb, setup_threads
+
+
+def run_variant(model_name, quantize, args, seeds):
+    """Loads one variant and returns (load RSS MB, peak-ish RSS MB, median s/series, {seed: close forecasts})."""
+    setup_threads(args)
+    from model import KronosPredictor
+
+    base_rss = rss_mb()
+    tokenizer, model = load_kronos(model_name, args.model_dir, quantize=quantize)
+    predictor = KronosPredictor(model, tokenizer, device='cpu', max_context=args.max_context)
+    load_rss = rss_mb() - base_rss
+
+    series = [make_series(args.lookback, args.pred_len, seed=i) for i in range(args.series)]
+
+    def predict(seed):
+        closes = []
+        for df, x_timestamp, y_timestamp in series:
+            torch.manual_seed(seed)
+            pred = predictor.predict(df, x_timestamp, y_timestamp, args.pred_len,
+                                     sample_count=args.sample_count, verbose=False)
+            closes.append(pred['close'].to_numpy())
+        return np.stack(closes)
+
+    latency = measure(lambda: predict(0), repeat=args.repeat) / args.series
+    forecasts = {seed: predict(seed) for seed in seeds}
+    return load_rss, rss_mb() - base_rss, latency, forecasts
+
+
+def mape(pred, ref):
+    return float(np.mean(np.abs(pred - ref) / np.abs(ref)) * 100)
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--series', type=int, default=8, help='Number of fixed synthetic series')
+    parser.add_argument('--lookback', type=int, default=200)
+    parser.add_argument('--pred-len', type=int, default=20)
+    parser.add_argument('--max-context', type=int, default=512)
+    parser.add_argument('--sample-count', type=int, default=5)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    rows = []
+    for model_name in args.models:
+        with ctx.Pool(1) as pool:
+            fp32 = pool.apply(run_variant, (model_name, None, args, (0, 1)))
+        with ctx.Pool(1) as pool:
+            int8 = pool.apply(run_variant, (model_name, 'int8', args, (0,)))
+
+        rows.append([
+            model_name,
+            f'{fp32[2] * 1000:.1f}',
+            f'{int8[2] * 1000:.1f}',
+            f'{fp32[2] / int8[2]:.2f}x',
+            f'{fp32[0]:.0f} / {fp32[1]:.0f}',
+            f'{int8[0]:.0f} / {int8[1]:.0f}',
+            f'{mape(int8[3][0], fp32[3][0]):.3f}',
+            f'{mape(fp32[3][1], fp32[3][0]):.3f}',
+        ])
+
+    print(f"\nseries={args.series} lookback={args.lookback} pred_len={args.pred_len} "
+          f"sample_count={args.sample_count} threads={args.threads or torch.get_num_threads()}")
+    print_table(['model', 'fp32 ms/series', 'int8 ms/series', 'speedup', 'fp32 RSS MB (load/run)',
+                 'int8 RSS MB (load/run)', 'int8 MAPE %', 'seed MAPE %'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Exact recompute vs. rolling KV cache once the history fills max_context.
+
+Speed is reported per decoding step. Accuracy is the mean absolute difference between the rolling and exact
+forecasts (normalised units) for the same seed, next to the seed-to-seed spread of the exact mode as a noise floor.
+
+Usage: python benchmarks/bench_rolling_cache.py [--models kronos-mini] [--pred-len 30]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import torch
+
+from common import add_common_args, load_kronos, make_inputs, measure, print_table, setup_threads
+from model.kronos import auto_regressive_inference
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--max-context', type=int, default=512)
+    parser.add_argument('--context', type=int, default=None, help='History length (default: max_context)')
+    parser.add_argument('--pred-len', type=int, default=30)
+    parser.add_argument('--sample-count', type=int, default=5)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    context = args.context or args.max_context
+    x, x_stamp, y_stamp = make_inputs(1, context, args.pred_len)
+
+    rows = []
+    for model_name in args.models:
+        tokenizer, model = load_kronos(model_name, args.model_dir)
+
+        def run(rolling, seed=0):
+            torch.manual_seed(seed)
+            preds = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, args.max_context, args.pred_len,
+                                              sample_count=args.sample_count, rolling_cache=rolling)
+            return preds[:, -args.pred_len:]
+
+        exact_time = measure(lambda: run(False), repeat=args.repeat)
+        rolling_time = measure(lambda: run(True), repeat=args.repeat)
+
+        exact = run(False)
+        drift = np.abs(run(True) - exact).mean()
+        noise = np.abs(run(False, seed=1) - exact).mean()
+
+        rows.append([
+            model_name,
+            f'{exact_time * 1000 / args.pred_len:.2f}',
+            f'{rolling_time * 1000 / args.pred_len:.2f}',
+            f'{exact_time / rolling_time:.2f}x',
+            f'{drift:.4f}',
+            f'{noise:.4f}',
+        ])
+
+    print(f"\ncontext={context} max_context={args.max_context} pred_len={args.pred_len} "
+          f"sample_count={args.sample_count} threads={torch.get_num_threads()}")
+    print_table(['model', 'exact ms/step', 'rolling ms/step', 'speedup', 'rolling MAE', 'seed MAE'], rows)
+
+
+if __name__ == '__main__':
+    main()
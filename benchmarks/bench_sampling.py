@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Per-step sampler cost: the previous filter-then-multinomial sampler vs. the fused `sample_from_logits`.
+
+The previous sampler ran a full sort, cumsum and scatter for nucleus filtering and masked the logits in place before
+softmax + multinomial. The fused sampler partially sorts with `torch.topk` for top-k, samples nucleus candidates in
+sorted order and draws with Gumbel-max. Cases are timed per call on [rows, 2^bits] logits, where the vocabulary sizes
+default to 2^s1_bits and 2^s2_bits of the selected models.
+
+Usage: python benchmarks/bench_sampling.py [--models kronos-base] [--rows 1 16 64] [--bits 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+import torch.nn.functional as F
+
+from common import MODEL_PRESETS, add_common_args, print_table, setup_threads
+from model.kronos import sample_from_logits
+
+CASES = [
+    ('greedy', dict(sample_logits=False)),
+    ('T=1.0', dict(temperature=1.0)),
+    ('top_k=20', dict(temperature=0.7, top_k=20)),
+    ('top_p=0.9', dict(temperature=0.7, top_p=0.9)),
+]
+
+
+def legacy_sample_from_logits(logits, temperature=1.0, top_k=0, top_p=1.0, sample_logits=True):
+    """The sampler before the fused rewrite, with greedy mode fixed to use argmax."""
+    logits = logits.float() / temperature
+    if top_k > 0:
+        indices_to_remove = logits < torch.topk(logits, min(top_k, logits.size(-1)))[0][..., -1, None]
+        logits[indices_to_remove] = -float('inf')
+    elif top_p < 1.0:
+        sorted_logits, sorted_indices = torch.sort(logits, descending=True)
+        cumulative_probs = torch.cumsum(F.softmax(sorted_logits, dim=-1), dim=-1)
+        sorted_indices_to_remove = cumulative_probs > top_p
+        sorted_indices_to_remove[..., 1:] = sorted_indices_to_remove[..., :-1].clone()
+        sorted_indices_to_remove[..., 0] = 0
+        indices_to_remove = sorted_indices_to_remove.scatter(1, sorted_indices, sorted_indices_to_remove)
+        logits[indices_to_remove] = -float('inf')
+    probs = F.softmax(logits, dim=-1)
+    if not sample_logits:
+        return probs.argmax(dim=-1, keepdim=True)
+    return torch.multinomial(probs, num_samples=1)
+
+
+def time_per_call(fn, logits, calls):
+    for _ in range(10):
+        fn(logits)
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(logits)
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.set_defaults(models=['kronos-base'])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 16, 64], help='Rows (series x samples) per step')
+    parser.add_argument('--bits', type=int, nargs='+', default=None, help='Vocabulary bits (default: s1_bits/s2_bits of --models)')
+    parser.add_argument('--calls', type=int, default=2000, help='Sampler calls per timing')
+    args = parser.parse_args()
+    setup_threads(args)
+
+    bits = args.bits or sorted({MODEL_PRESETS[m][key] for m in args.models for key in ('s1_bits', 's2_bits')})
+
+    rows = []
+    for vocab_bits in bits:
+        for num_rows in args.rows:
+            logits = torch.randn(num_rows, 2 ** vocab_bits, generator=torch.Generator().manual_seed(0)) * 3
+            for name, kwargs in CASES:
+                legacy = time_per_call(lambda l: legacy_sample_from_logits(l, **kwargs), logits, args.calls)
+                fused = time_per_call(lambda l: sample_from_logits(l, **kwargs), logits, args.calls)
+                rows.append([f'2^{vocab_bits}', num_rows, name, f'{legacy * 1e6:.1f}', f'{fused * 1e6:.1f}', f'{legacy / fused:.2f}x'])
+
+    print(f"\ncalls={args.calls} threads={torch.get_num_threads()}")
+    print_table(['vocab', 'rows', 'mode', 'legacy us', 'fused us', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
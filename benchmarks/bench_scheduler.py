@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Serialised predictions vs. the continuous-batching scheduler under concurrent load.
+
+`--users` threads each submit `--requests` predictions with histories drawn from `--context` and horizons from
+`--pred-len`. The baseline runs every prediction through `KronosPredictor.predict` behind a lock, which is how the
+web service behaved when all requests shared one model; the scheduler joins them into one running batch between
+decode steps. Reports requests per second, median / p95 latency and the largest batch the scheduler ran.
+
+Usage: python benchmarks/bench_scheduler.py [--models kronos-mini] [--users 50] [--requests 2] [--batch-rows 64]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import torch
+
+from common import add_common_args, load_kronos, make_series, print_table, setup_threads
+from app.services.scheduler_service import InferenceScheduler
+from model import KronosPredictor
+
+
+def run_load(predict, workload, users):
+    """Runs every (series, pred_len) job of workload from `users` threads; returns (wall time, per-request latencies)."""
+    latencies = []
+
+    def job(item):
+        (df, x_timestamp, y_timestamp), pred_len = item
+        start = time.perf_counter()
+        predict(df, x_timestamp, y_timestamp, pred_len)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(job, workload))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.set_defaults(models=['kronos-mini'])
+    parser.add_argument('--users', type=int, default=50, help='Concurrent client threads')
+    parser.add_argument('--requests', type=int, default=2, help='Predictions per user')
+    parser.add_argument('--context', type=int, nargs=2, default=[60, 200], help='Range of history lengths')
+    parser.add_argument('--pred-len', type=int, nargs=2, default=[5, 30], help='Range of horizons')
+    parser.add_argument('--batch-rows', type=int, nargs='+', default=[16, 64], help='Scheduler row budgets')
+    parser.add_argument('--temperature', type=float, default=0.7)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    rng = np.random.default_rng(0)
+    workload = []
+    for i in range(args.users * args.requests):
+        length = int(rng.integers(args.context[0], args.context[1] + 1))
+        pred_len = int(rng.integers(args.pred_len[0], args.pred_len[1] + 1))
+        workload.append((make_series(length, pred_len, seed=i), pred_len))
+
+    rows = []
+    for model_name in args.models:
+        tokenizer, model = load_kronos(model_name, args.model_dir)
+        predictor = KronosPredictor(model, tokenizer, device='cpu')
+        lock = threading.Lock()
+
+        def serialised(df, x_timestamp, y_timestamp, pred_len):
+            with lock:
+                return predictor.predict(df, x_timestamp, y_timestamp, pred_len, T=args.temperature, verbose=False)
+
+        cases = [('serialised', '-', serialised, None)]
+        for batch_rows in args.batch_rows:
+            scheduler = InferenceScheduler(predictor, max_batch_rows=batch_rows)
+
+            def scheduled(df, x_timestamp, y_timestamp, pred_len, scheduler=scheduler):
+                return scheduler.submit(df, x_timestamp, y_timestamp, pred_len, T=args.temperature).result()
+
+            cases.append(('scheduler', str(batch_rows), scheduled, scheduler))
+
+        baseline = None
+        for name, batch_rows, predict, scheduler in cases:
+            wall, latencies = run_load(predict, workload, args.users)
+            if scheduler is not None:
+                max_rows = scheduler.get_stats()['max_rows']
+                scheduler.shutdown()
+            throughput = len(workload) / wall
+            baseline = baseline or throughput
+            latencies.sort()
+            rows.append([
+                model_name,
+                name,
+                batch_rows,
+                f'{throughput:.2f}',
+                f'{throughput / baseline:.2f}x',
+                f'{statistics.median(latencies):.2f}',
+                f'{latencies[int(0.95 * (len(latencies) - 1))]:.2f}',
+                max_rows if scheduler is not None else '-',
+            ])
+
+    print(f"\nusers={args.users} requests={len(workload)} context={args.context} pred_len={args.pred_len} "
+          f"threads={torch.get_num_threads()}")
+    print_table(['model', 'mode', 'batch rows', 'req/s', 'speedup', 'p50 s', 'p95 s', 'max rows'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Plain autoregressive sampling vs. speculative sampling with a smaller draft model.
+
+Reports the time of one `auto_regressive_inference` call on the target, the time of `speculative_inference` with
+`--draft` proposing `--num-draft` pairs per round, the draft acceptance rate and the generated tokens per target
+forward pass. Speculative sampling only pays off when the draft agrees with the target often, so run it on real
+checkpoints: randomly initialised models of different sizes almost never agree.
+
+Usage: python benchmarks/bench_speculative.py [--models kronos-base] [--draft kronos-mini] [--num-draft 4] [--pred-len 20]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+
+from common import add_common_args, load_kronos, make_inputs, measure, print_table, setup_threads
+from model.kronos import SpeculativeStats, auto_regressive_inference, speculative_inference
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.set_defaults(models=['kronos-base'])
+    parser.add_argument('--draft', default='kronos-mini', help='Draft model')
+    parser.add_argument('--num-draft', type=int, nargs='+', default=[2, 4], help='Drafted pairs per round')
+    parser.add_argument('--batch-size', type=int, default=1, help='Number of series per call')
+    parser.add_argument('--context', type=int, default=200)
+    parser.add_argument('--pred-len', type=int, default=20)
+    parser.add_argument('--max-context', type=int, default=512)
+    parser.add_argument('--sample-count', type=int, default=1)
+    parser.add_argument('--temperature', type=float, default=1.0)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    x, x_stamp, y_stamp = make_inputs(args.batch_size, args.context, args.pred_len)
+    _, draft_model = load_kronos(args.draft, args.model_dir)
+
+    rows = []
+    for model_name in args.models:
+        tokenizer, model = load_kronos(model_name, args.model_dir)
+
+        def plain():
+            return auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, args.max_context, args.pred_len,
+                                             T=args.temperature, sample_count=args.sample_count)
+
+        plain_time = measure(plain, repeat=args.repeat)
+        rows.append([model_name, '-', f'{plain_time * 1000:.1f}', '1.00x', '-', '1.00'])
+
+        for num_draft in args.num_draft:
+            stats = SpeculativeStats()
+
+            def speculative():
+                return speculative_inference(tokenizer, model, draft_model, x, x_stamp, y_stamp, args.max_context, args.pred_len,
+                                             T=args.temperature, sample_count=args.sample_count, num_draft=num_draft, stats=stats)
+
+            spec_time = measure(speculative, repeat=args.repeat)
+            rows.append([
+                model_name,
+                f'{args.draft} k={num_draft}',
+                f'{spec_time * 1000:.1f}',
+                f'{plain_time / spec_time:.2f}x',
+                f'{stats.acceptance_rate:.1%}',
+                f'{stats.tokens_per_call:.2f}',
+            ])
+
+    print(f"\nbatch_size={args.batch_size} context={args.context} pred_len={args.pred_len} "
+          f"sample_count={args.sample_count} T={args.temperature} threads={torch.get_num_threads()}")
+    print_table(['target', 'draft', 'ms', 'speedup', 'acceptance', 'tokens / target pass'], rows)
+
+
+if __name__ == '__main__':
+    main()
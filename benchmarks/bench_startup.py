@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Application cold start: import-time breakdown and time until the first history and static pages are served.
+
+The services used to import their heavy dependencies when `app.services` was imported: `ModelService` imported the
+`model` package (torch, einops) to check it was available, and `StockService` imported `china_stock_data` (akshare)
+and created a `StockData` as a probe. Both now only locate the packages and import them on first use, as the
+services and the history API do with pandas and numpy, and `model` resolves its classes on first access. Each case runs
+in a fresh `python -X importtime` process: `lazy` is the app as it starts now, `eager` imports `model.kronos` and
+`china_stock_data` first, as startup did before. The app is created with the testing config (in-memory database,
+no background model preload), then serves `/history`, `/api/predictions` and a static file. The slowest imports of
+the lazy case are listed below the timings.
+
+Usage: python benchmarks/bench_startup.py [--repeat 3] [--top 15]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import ROOT_DIR, print_table
+
+WORKER = '''
+import json, sys, time
+start = time.perf_counter()
+marks = {}
+if sys.argv[1] == 'eager':
+    import model.kronos
+    import china_stock_data
+    marks['eager imports'] = time.perf_counter() - start
+import app
+marks['import app'] = time.perf_counter() - start
+application = app.create_app('testing')
+with application.app_context():
+    from app.models import db
+    db.create_all()
+marks['create_app'] = time.perf_counter() - start
+client = application.test_client()
+for path in ('/history', '/api/predictions', '/static/css/tw.css'):
+    client.get(path)
+    marks[path] = time.perf_counter() - start
+marks['torch imported'] = 'torch' in sys.modules
+print(json.dumps(marks))
+'''
+
+
+def run_worker(case):
+    """Runs one cold start; returns its timings in seconds and the -X importtime report."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', WORKER, case], cwd=ROOT_DIR,
+                            check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def import_breakdown(report, top, max_depth=4):
+    """The slowest imports down to max_depth levels of nesting as (module, self ms, cumulative ms)."""
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= max_depth:
+            rows.append(('  ' * depth + name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return sorted(rows, key=lambda row: -row[2])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3, help='Cold starts per case; the median is reported')
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    rows, reports = [], {}
+    for case in ('eager', 'lazy'):
+        runs = []
+        for _ in range(args.repeat):
+            marks, reports[case] = run_worker(case)
+            runs.append(marks)
+        phases = [key for key in runs[0] if key not in ('eager imports', 'torch imported')]
+        rows.append([case] + [f"{statistics.median(run[key] for run in runs) * 1000:.0f}" for key in phases]
+                    + [str(runs[0]['torch imported'])])
+
+    print(f'\nms from the start of the process to the end of each phase, median of {args.repeat} cold starts')
+    print_table(['imports'] + [f'{phase} ms' for phase in phases] + ['torch imported'], rows)
+    print('\nSlowest imports (lazy):')
+    print_table(['module', 'self ms', 'cumulative ms'],
+                [[name, f'{self_ms:.1f}', f'{cumulative_ms:.1f}'] for name, self_ms, cumulative_ms in
+                 import_breakdown(reports['lazy'], args.top)])
+
+
+if __name__ == '__main__':
+    main()
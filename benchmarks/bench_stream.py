@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Time to first bar of `predict_stream` vs. the latency of a full `predict` call.
+
+With streaming the first forecast bar is available after the prefill and one decoding step instead of after all
+`--pred-len` steps, which is what users of the streamed result view wait for before anything renders.
+
+Usage: python benchmarks/bench_stream.py [--models kronos-mini kronos-base] [--context 400] [--pred-len 30]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+
+from common import add_common_args, load_kronos, make_series, measure, print_table, setup_threads
+from model import KronosPredictor
+
+
+def main():
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--context', type=int, default=400)
+    parser.add_argument('--pred-len', type=int, default=30)
+    parser.add_argument('--sample-count', type=int, default=1)
+    args = parser.parse_args()
+    setup_threads(args)
+
+    df, x_timestamp, y_timestamp = make_series(args.context, args.pred_len)
+
+    rows = []
+    for model_name in args.models:
+        tokenizer, model = load_kronos(model_name, args.model_dir)
+        predictor = KronosPredictor(model, tokenizer, device='cpu')
+
+        full_time = measure(lambda: predictor.predict(df, x_timestamp, y_timestamp, args.pred_len, sample_count=args.sample_count,
+                                                      verbose=False), repeat=args.repeat)
+
+        first_bar_times, stream_times = [], []
+        for _ in range(args.repeat + 1):
+            start = time.perf_counter()
+            first_bar = None
+            for _ in predictor.predict_stream(df, x_timestamp, y_timestamp, args.pred_len, sample_count=args.sample_count):
+                first_bar = first_bar or time.perf_counter() - start
+            first_bar_times.append(first_bar)
+            stream_times.append(time.perf_counter() - start)
+        # The first pass is warmup, as in measure()
+        first_bar_time = statistics.median(first_bar_times[1:])
+        stream_time = statistics.median(stream_times[1:])
+
+        rows.append([
+            model_name,
+            f'{full_time * 1000:.1f}',
+            f'{first_bar_time * 1000:.1f}',
+            f'{full_time / first_bar_time:.1f}x',
+            f'{stream_time * 1000:.1f}',
+        ])
+
+    print(f"\ncontext={args.context} pred_len={args.pred_len} sample_count={args.sample_count} threads={torch.get_num_threads()}")
+    print_table(['model', 'predict ms', 'first bar ms', 'earlier by', 'stream total ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
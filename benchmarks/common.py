@@ -0,0 +1,133 @@
+"""Shared helpers for the inference benchmarks."""
+
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+import pandas as pd
+import torch
+
+from config import Config
+from model import Kronos, KronosTokenizer
+
+# Architectures of the published checkpoints, used when the weights have not been downloaded
+MODEL_PRESETS = {
+    'kronos-mini': {
+        's1_bits': 10, 's2_bits': 10, 'n_layers': 4, 'd_model': 256, 'n_heads': 4, 'ff_dim': 512,
+        'ffn_dropout_p': 0.0, 'attn_dropout_p': 0.0, 'resid_dropout_p': 0.0, 'token_dropout_p': 0.0, 'learn_te': True
+    },
+    'kronos-small': {
+        's1_bits': 10, 's2_bits': 10, 'n_layers': 8, 'd_model': 512, 'n_heads': 8, 'ff_dim': 1024,
+        'ffn_dropout_p': 0.0, 'attn_dropout_p': 0.0, 'resid_dropout_p': 0.0, 'token_dropout_p': 0.0, 'learn_te': True
+    },
+    'kronos-base': {
+        's1_bits': 10, 's2_bits': 10, 'n_layers': 12, 'd_model': 832, 'n_heads': 16, 'ff_dim': 2048,
+        'ffn_dropout_p': 0.0, 'attn_dropout_p': 0.0, 'resid_dropout_p': 0.0, 'token_dropout_p': 0.0, 'learn_te': True
+    },
+}
+
+
+def model_path(model_name, model_dir=None):
+    """Returns the checkpoint directory for model_name, writing a preset config.json when no checkpoint exists."""
+    path = os.path.join(model_dir or Config.MODEL_DIR, model_name)
+    if os.path.isfile(os.path.join(path, 'config.json')):
+        return path
+    if model_name not in MODEL_PRESETS:
+        raise ValueError(f"Unknown model {model_name}, expected one of {list(MODEL_PRESETS)}")
+    path = tempfile.mkdtemp(prefix=f'{model_name}-')
+    with open(os.path.join(path, 'config.json'), 'w') as f:
+        json.dump(MODEL_PRESETS[model_name], f)
+    print(f"⚠️  No checkpoint for {model_name}, using randomly initialised weights")
+    return path
+
+
+def load_kronos(model_name, model_dir=None, quantize=None, fuse=True):
+    """Loads (tokenizer, model) in eval mode."""
+    path = model_path(model_name, model_dir)
+    tokenizer = KronosTokenizer.from_pretrained(path, quantize=quantize, fuse=fuse).eval()
+    model = Kronos.from_pretrained(path, quantize=quantize, fuse=fuse).eval()
+    return tokenizer, model
+
+
+def make_series(length, pred_len=0, seed=0):
+    """Builds a synthetic daily OHLCV frame plus history and future timestamps."""
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    open_ = close * (1 + rng.normal(0, 0.005, length))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, length)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, length)))
+    volume = rng.uniform(1e6, 5e6, length)
+    dates = pd.bdate_range('2020-01-01', periods=length + pred_len)
+    df = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume})
+    return df, pd.Series(dates[:length]), pd.Series(dates[length:])
+
+
+def make_inputs(batch_size, length, pred_len, seed=0):
+    """Builds normalised model inputs (x, x_stamp, y_stamp) as tensors."""
+    generator = torch.Generator().manual_seed(seed)
+    x = torch.randn(batch_size, length, 6, generator=generator)
+
+    def stamps(n):
+        return torch.stack([
+            torch.zeros(batch_size, n),
+            torch.zeros(batch_size, n),
+            torch.randint(0, 5, (batch_size, n), generator=generator).float(),
+            torch.randint(1, 29, (batch_size, n), generator=generator).float(),
+            torch.randint(1, 13, (batch_size, n), generator=generator).float(),
+        ], dim=-1)
+
+    return x, stamps(length), stamps(pred_len)
+
+
+def measure(fn, repeat=3, warmup=1):
+    """Returns the median wall time of fn() in seconds."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def rss_mb():
+    """Resident set size of the current process in MB (Linux /proc, falling back to the peak RSS)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def add_common_args(parser):
+    parser.add_argument('--models', nargs='+', default=list(MODEL_PRESETS), help='Models to benchmark')
+    parser.add_argument('--model-dir', default=None, help='Checkpoint directory (default: Config.MODEL_DIR)')
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed repetitions per case')
+    return parser
+
+
+def setup_threads(args):
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(row, widths)))
@@ -12,6 +12,17 @@ class Config:
     # Model configurations
     MODEL_DIR = os.path.join(os.path.dirname(__file__), 'models')
     EMBEDDED_MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model')
+    # Traced graphs of models loaded with 'compiled': True, reused across restarts
+    COMPILE_CACHE_DIR = os.environ.get('COMPILE_CACHE_DIR') or os.path.join(MODEL_DIR, '.compiled')
+    # Rows (requests x samples) decoded together by the continuous-batching scheduler, see benchmarks/bench_scheduler.py
+    INFERENCE_BATCH_ROWS = int(os.environ.get('INFERENCE_BATCH_ROWS', 64))
+    # Longest a request waits for its queued prediction before giving up
+    PREDICTION_TIMEOUT_SECONDS = float(os.environ.get('PREDICTION_TIMEOUT_SECONDS', 300))
+    # RAM for resident models; requests for other models evict the least recently used ones, see ModelService
+    MODEL_MEMORY_BUDGET_MB = float(os.environ.get('MODEL_MEMORY_BUDGET_MB', 4096))
+    # Model loaded in the background at startup (empty to disable) and warmed up with a dummy forecast
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', 'kronos-mini')
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') not in ('0', 'false', 'False')
     
     # Available models configuration
     AVAILABLE_MODELS = {
@@ -19,19 +30,32 @@ class Config:
             'path': 'kronos-mini',
             'description': 'Lightweight model for fast inference',
             'size': 'Small (~100MB)',
-            'performance': 'Fast'
+            'performance': 'Fast',
+            'quantize': None,
+            'precision': 'fp32',
+            'compiled': False,
+            'draft_model': None
         },
         'kronos-small': {
             'path': 'kronos-small', 
             'description': 'Balanced model for general use',
             'size': 'Medium (~500MB)',
-            'performance': 'Balanced'
+            'performance': 'Balanced',
+            'quantize': None,
+            'precision': 'fp32',
+            'compiled': False,
+            'draft_model': None
         },
         'kronos-base': {
             'path': 'kronos-base',
             'description': 'Full-featured model for best accuracy',
             'size': 'Large (~1GB)',
-            'performance': 'Best'
+            'performance': 'Best',
+            'quantize': None,  # 'int8' for dynamic int8 CPU inference, see benchmarks/bench_quantization.py
+            'precision': 'fp32',  # 'bf16' on CPUs with AVX512-BF16/AMX, see benchmarks/bench_bf16.py
+            # Both serve predictions one at a time instead of through the continuous-batching scheduler
+            'compiled': False,  # TorchScript decoding steps, see benchmarks/bench_compiled.py
+            'draft_model': None  # 'kronos-mini' for speculative decoding, see benchmarks/bench_speculative.py
         }
     }
     
@@ -69,6 +93,8 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # Tests load the models they need themselves
+    MODEL_PRELOAD = None
 
 config = {
     'development': DevelopmentConfig,
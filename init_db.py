@@ -22,7 +22,7 @@ def init_db():
     print(f"Initializing database with config: {config_name}")
     
     # Create Flask app
-    app = create_app(config_name)
+    app = create_app(config_name, preload_models=False)
     
     with app.app_context():
         # Create all tables
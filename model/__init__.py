@@ -1,10 +1,46 @@
-from .kronos import KronosTokenizer, Kronos, KronosPredictor
+from collections.abc import Mapping
 
-model_dict = {
-    'kronos_tokenizer': KronosTokenizer,
-    'kronos': Kronos,
-    'kronos_predictor': KronosPredictor
-}
+# The classes are imported on first access: importing model.kronos pulls in torch, which backends such as
+# model.onnx_backend and the web app's startup do without.
+_EXPORTS = {'KronosTokenizer': 'model.kronos', 'Kronos': 'model.kronos', 'KronosPredictor': 'model.kronos'}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        value = getattr(importlib.import_module(_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazyClasses(Mapping):
+    """Maps names to the classes exported above, importing them on first lookup."""
+
+    def __init__(self, names):
+        self._names = names
+
+    def __getitem__(self, key):
+        return __getattr__(self._names[key])
+
+    def __contains__(self, key):
+        # Mapping's default looks the value up, which would import it
+        return key in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+model_dict = _LazyClasses({
+    'kronos_tokenizer': 'KronosTokenizer',
+    'kronos': 'Kronos',
+    'kronos_predictor': 'KronosPredictor'
+})
 
 
 def get_model_class(model_name):
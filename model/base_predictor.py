@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+
+
+def calc_time_stamps(x_timestamp):
+    time_df = pd.DataFrame()
+    time_df['minute'] = x_timestamp.dt.minute
+    time_df['hour'] = x_timestamp.dt.hour
+    time_df['weekday'] = x_timestamp.dt.weekday
+    time_df['day'] = x_timestamp.dt.day
+    time_df['month'] = x_timestamp.dt.month
+    return time_df
+
+
+class BasePredictor:
+    """
+    Framework-independent part of the predictors: input validation, normalisation, time features and
+    de-normalisation. Subclasses implement `generate(x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count,
+    verbose, padding_mask=None)` on normalised numpy arrays, returning predictions of shape [batch, pred_len, feat].
+    `padding_mask` ([batch, seq_len], True = padding) marks the left padding of shorter histories in a batch.
+    `T`, `top_k` and `top_p` are scalars or numpy arrays of shape [batch] with one setting per series. `pred_len` may
+    likewise be an array of per-series horizons; the predictions then cover the longest one and are NaN past each
+    series' own horizon.
+    """
+
+    def __init__(self, max_context=512, clip=5):
+        self.max_context = max_context
+        self.clip = clip
+        self.price_cols = ['open', 'high', 'low', 'close']
+        self.vol_col = 'volume'
+        self.amt_vol = 'amount'
+        self.time_cols = ['minute', 'hour', 'weekday', 'day', 'month']
+
+    def generate(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose, padding_mask=None):
+        raise NotImplementedError
+
+    @staticmethod
+    def _per_series(value, num_series, name):
+        """Passes a scalar sampling parameter through and turns a sequence into an array with one value per series."""
+        if np.ndim(value) == 0:
+            return value
+        value = np.asarray(value)
+        if value.shape != (num_series,):
+            raise ValueError(f"{name} must be a scalar or hold one value per series ({num_series}), got shape {value.shape}.")
+        return value
+
+    def prepare(self, df, x_timestamp, y_timestamp):
+        """
+        Validates one series and returns its model inputs.
+
+        Returns:
+            Tuple: (x, x_stamp, y_stamp, x_mean, x_std) with the normalised, clipped history x of shape [seq_len, feat],
+                the time features of the history and of the forecast horizon, and the statistics for `denormalize`.
+        """
+        if not isinstance(df, pd.DataFrame):
+            raise ValueError("Input must be a pandas DataFrame.")
+
+        if not all(col in df.columns for col in self.price_cols):
+            raise ValueError(f"Price columns {self.price_cols} not found in DataFrame.")
+
+        df = df.copy()
+        if self.vol_col not in df.columns:
+            df[self.vol_col] = 0.0  # Fill missing volume with zeros
+            df[self.amt_vol] = 0.0  # Fill missing amount with zeros
+        if self.amt_vol not in df.columns and self.vol_col in df.columns:
+            df[self.amt_vol] = df[self.vol_col] * df[self.price_cols].mean(axis=1)
+
+        if df[self.price_cols + [self.vol_col, self.amt_vol]].isnull().values.any():
+            raise ValueError("Input DataFrame contains NaN values in price or volume columns.")
+
+        x_time_df = calc_time_stamps(x_timestamp)
+        y_time_df = calc_time_stamps(y_timestamp)
+
+        x = df[self.price_cols + [self.vol_col, self.amt_vol]].values.astype(np.float32)
+        x_stamp = x_time_df.values.astype(np.float32)
+        y_stamp = y_time_df.values.astype(np.float32)
+
+        x_mean, x_std = np.mean(x, axis=0), np.std(x, axis=0)
+
+        x = (x - x_mean) / (x_std + 1e-5)
+        x = np.clip(x, -self.clip, self.clip)
+        return x, x_stamp, y_stamp, x_mean, x_std
+
+    def denormalize(self, preds, x_mean, x_std, y_timestamp):
+        """Maps normalised predictions of shape [pred_len, feat] back to prices and volumes indexed by y_timestamp."""
+        preds = preds * (x_std + 1e-5) + x_mean
+        return pd.DataFrame(preds, columns=self.price_cols + [self.vol_col, self.amt_vol], index=y_timestamp)
+
+    def predict(self, df, x_timestamp, y_timestamp, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True):
+        x, x_stamp, y_stamp, x_mean, x_std = self.prepare(df, x_timestamp, y_timestamp)
+
+        x = x[np.newaxis, :]
+        x_stamp = x_stamp[np.newaxis, :]
+        y_stamp = y_stamp[np.newaxis, :]
+
+        preds = self.generate(x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose)
+
+        preds = preds.squeeze(0)
+        return self.denormalize(preds, x_mean, x_std, y_timestamp)
+
+    def generate_stream(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count):
+        """
+        Yields the forecast one bar at a time, each of shape [batch, feat]. Backends without incremental decoding
+        fall back to slicing the output of `generate`.
+        """
+        preds = self.generate(x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose=False)
+        for i in range(pred_len):
+            yield preds[:, i]
+
+    def predict_stream(self, df, x_timestamp, y_timestamp, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1):
+        """
+        Streaming variant of `predict`: yields every forecast bar as a one-row DataFrame indexed by its timestamp
+        as soon as it has been sampled.
+        """
+        x, x_stamp, y_stamp, x_mean, x_std = self.prepare(df, x_timestamp, y_timestamp)
+        bars = self.generate_stream(x[np.newaxis, :], x_stamp[np.newaxis, :], y_stamp[np.newaxis, :], pred_len, T, top_k, top_p,
+                                    sample_count)
+        for i, bar in enumerate(bars):
+            yield self.denormalize(bar, x_mean, x_std, y_timestamp[i:i + 1])
+
+    def predict_batch(self, df_list, x_timestamp_list, y_timestamp_list, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True):
+        """
+        Perform parallel (batch) prediction on multiple time series. Histories may differ in length: shorter ones are left-padded
+        and masked, so every series is forecast as if it had been passed to `predict` on its own. Horizons may differ as well:
+        a series stops being decoded once its own pred_len is reached.
+
+        Args:
+            df_list (List[pd.DataFrame]): List of input DataFrames, each containing price columns and optional volume/amount columns.
+            x_timestamp_list (List[pd.DatetimeIndex or Series]): List of timestamps corresponding to historical data, length should match the number of rows in each DataFrame.
+            y_timestamp_list (List[pd.DatetimeIndex or Series]): List of future prediction timestamps, length should equal the series' pred_len.
+            pred_len (int or sequence of int): Number of prediction steps, or one per series.
+            T (float or sequence of float): Sampling temperature, or one per series.
+            top_k (int or sequence of int): Top-k filtering threshold, or one per series.
+            top_p (float or sequence of float): Top-p (nucleus sampling) threshold, or one per series.
+            sample_count (int): Number of parallel samples per series, automatically averaged internally.
+            verbose (bool): Whether to display autoregressive progress.
+
+        Returns:
+            List[pd.DataFrame]: List of prediction results in the same order as input, each DataFrame contains
+                                `open, high, low, close, volume, amount` columns, indexed by corresponding `y_timestamp`.
+        """
+        # Basic validation
+        if not isinstance(df_list, (list, tuple)) or not isinstance(x_timestamp_list, (list, tuple)) or not isinstance(y_timestamp_list, (list, tuple)):
+            raise ValueError("df_list, x_timestamp_list, y_timestamp_list must be list or tuple types.")
+        if not (len(df_list) == len(x_timestamp_list) == len(y_timestamp_list)):
+            raise ValueError("df_list, x_timestamp_list, y_timestamp_list must have consistent lengths.")
+
+        num_series = len(df_list)
+        T, top_k, top_p = (self._per_series(param, num_series, name) for param, name in ((T, 'T'), (top_k, 'top_k'), (top_p, 'top_p')))
+        pred_len = self._per_series(pred_len, num_series, 'pred_len')
+        pred_lens = np.broadcast_to(pred_len, (num_series,))
+
+        x_list = []
+        x_stamp_list = []
+        y_stamp_list = []
+        means = []
+        stds = []
+        seq_lens = []
+
+        for i in range(num_series):
+            # The validation and normalisation of `predict`, with the series index in the errors
+            try:
+                x, x_stamp, y_stamp, x_mean, x_std = self.prepare(df_list[i], x_timestamp_list[i], y_timestamp_list[i])
+            except ValueError as e:
+                raise ValueError(f"Series at index {i}: {e}") from e
+
+            if x.shape[0] != x_stamp.shape[0]:
+                raise ValueError(f"Inconsistent lengths at index {i}: x has {x.shape[0]} vs x_stamp has {x_stamp.shape[0]}.")
+            if y_stamp.shape[0] != pred_lens[i]:
+                raise ValueError(f"y_timestamp length at index {i} should equal pred_len={pred_lens[i]}, got {y_stamp.shape[0]}.")
+
+            x_list.append(x)
+            x_stamp_list.append(x_stamp)
+            y_stamp_list.append(y_stamp)
+            means.append(x_mean)
+            stds.append(x_std)
+
+            seq_lens.append(x.shape[0])
+
+        # Left-pad shorter histories so that every series ends at the last position
+        max_seq_len = max(seq_lens)
+        padding_mask = None
+        if len(set(seq_lens)) != 1:
+            padding_mask = np.zeros((num_series, max_seq_len), dtype=bool)
+            for i in range(num_series):
+                pad = max_seq_len - seq_lens[i]
+                padding_mask[i, :pad] = True
+                x_list[i] = np.pad(x_list[i], ((pad, 0), (0, 0)))
+                x_stamp_list[i] = np.pad(x_stamp_list[i], ((pad, 0), (0, 0)))
+
+        # Stamps past a series' own horizon are never read
+        max_pred_len = int(pred_lens.max())
+        y_stamp_list = [np.pad(y_stamp, ((0, max_pred_len - len(y_stamp)), (0, 0))) for y_stamp in y_stamp_list]
+
+        x_batch = np.stack(x_list, axis=0).astype(np.float32)           # (B, seq_len, feat)
+        x_stamp_batch = np.stack(x_stamp_list, axis=0).astype(np.float32) # (B, seq_len, time_feat)
+        y_stamp_batch = np.stack(y_stamp_list, axis=0).astype(np.float32) # (B, pred_len, time_feat)
+
+        preds = self.generate(x_batch, x_stamp_batch, y_stamp_batch, pred_len, T, top_k, top_p, sample_count, verbose,
+                              padding_mask=padding_mask)
+        # preds: (B, max pred_len, feat)
+
+        return [self.denormalize(preds[i, :pred_lens[i]], means[i], stds[i], y_timestamp_list[i]) for i in range(num_series)]
+
@@ -0,0 +1,256 @@
+"""
+Iteration-level (continuous) batching for Kronos generation.
+
+`ContinuousBatcher` keeps one key/value cache for every row in flight. Each `step` admits queued requests,
+prefills them, merges them into the running batch and advances every row by one token. Requests leave the batch
+as soon as their horizon is reached, so short requests never wait for long ones and new requests never wait for
+the batch to drain.
+
+Rows of different lengths share the cache by left padding: every row's last position sits in the last slot and a
+padding mask hides the slots in front of its history, which also gives each row its own rotary positions.
+"""
+
+from collections import deque
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from model.kronos import sample_from_logits
+
+
+class GenerationRequest:
+    """
+    One series queued for a `ContinuousBatcher`.
+
+    Args:
+        x (np.ndarray): Normalised, clipped history. Shape: [seq_len, feat]
+        x_stamp (np.ndarray): History time features. Shape: [seq_len, time_feat]
+        y_stamp (np.ndarray): Future time features. Shape: [>= pred_len, time_feat]
+        pred_len (int): Number of bars to forecast.
+        T, top_k, top_p, sample_count: Sampling parameters, as for `KronosPredictor.predict`.
+        tag: Caller data carried along with the request, e.g. a future to resolve.
+    """
+
+    def __init__(self, x, x_stamp, y_stamp, pred_len, T=1.0, top_k=0, top_p=0.99, sample_count=1, tag=None):
+        self.x = x
+        self.x_stamp = x_stamp
+        self.y_stamp = y_stamp
+        self.pred_len = pred_len
+        self.T = T
+        self.top_k = top_k
+        self.top_p = top_p
+        self.sample_count = sample_count
+        self.tag = tag
+        self.preds = None  # [pred_len, feat] once finished
+
+        self.history_len = x.shape[0]
+        self.max_len = self.history_len + pred_len
+        self.length = 0
+        self.s1 = self.s2 = self.stamp = None
+
+    @property
+    def finished(self):
+        return self.length == self.max_len
+
+
+def _left_pad(cache_tensor, num_slots):
+    # [batch, n_heads, slots, head_dim] -> num_slots zero slots in front
+    return F.pad(cache_tensor, (0, 0, num_slots, 0))
+
+
+class ContinuousBatcher:
+    """
+    Runs many `GenerationRequest`s through one tokenizer / model pair with iteration-level batching.
+
+    Only requests whose history plus horizon fit in `max_context` are accepted (see `fits`); longer ones need the
+    sliding-window recompute of `auto_regressive_inference`.
+
+    Args:
+        tokenizer (KronosTokenizer): Tokenizer in eval mode.
+        model (Kronos): Model in eval mode.
+        max_context (int): Maximum context length.
+        clip (float): Clipping value for the normalised history.
+        device (str): Device of the model.
+        max_rows (int): Upper bound on rows (requests x sample_count) in flight; a single larger request still runs alone.
+        precision (str): 'bf16' runs the steps under bfloat16 autocast, as `KronosPredictor` does.
+    """
+
+    def __init__(self, tokenizer, model, max_context=512, clip=5, device='cpu', max_rows=64, precision='fp32'):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_context = max_context
+        self.clip = clip
+        self.device = device
+        self.max_rows = max_rows
+        self.precision = precision
+
+        self.pending = deque()
+        self.active = []  # requests in row order, each owning sample_count consecutive rows
+        self.kv_cache = None
+        self.padding = None  # [rows, slots], True marks slots in front of a row's history
+
+    @classmethod
+    def from_predictor(cls, predictor, max_rows=64):
+        return cls(predictor.tokenizer, predictor.model, predictor.max_context, predictor.clip, predictor.device, max_rows,
+                   predictor.precision)
+
+    @property
+    def num_rows(self):
+        return sum(request.sample_count for request in self.active)
+
+    def fits(self, request):
+        return request.max_len <= self.max_context
+
+    def add(self, request):
+        if not self.fits(request):
+            raise ValueError(f"History plus horizon ({request.max_len}) exceeds max_context={self.max_context}")
+        self.pending.append(request)
+
+    def has_work(self):
+        return bool(self.pending or self.active)
+
+    def reset(self):
+        """Drops every pending and active request, returning them."""
+        dropped = list(self.pending) + self.active
+        self.pending.clear()
+        self.active = []
+        self.kv_cache = self.padding = None
+        return dropped
+
+    def step(self):
+        """Admits pending requests and advances every active row by one token. Returns the requests that finished."""
+        with torch.no_grad(), torch.autocast(device_type=torch.device(self.device).type, dtype=torch.bfloat16,
+                                             enabled=self.precision == 'bf16'):
+            self._admit()
+            finished = self._retire()
+            if self.active:
+                self._decode_step()
+                finished += self._retire()
+        return finished
+
+    def _sample(self, logits, requests):
+        # One sampler call for all rows, with per-row settings when the requests differ
+        settings = {(request.T, request.top_k, request.top_p) for request in requests}
+        if len(settings) == 1:
+            T, top_k, top_p = settings.pop()
+        else:
+            counts = torch.tensor([request.sample_count for request in requests], device=logits.device)
+            T, top_k, top_p = (torch.tensor(values, device=logits.device).repeat_interleave(counts)
+                               for values in zip(*[(request.T, request.top_k, request.top_p) for request in requests]))
+        return sample_from_logits(logits, temperature=T, top_k=top_k, top_p=top_p)
+
+    def _write(self, requests, s1_ids, s2_ids):
+        offset = 0
+        for request in requests:
+            rows = slice(offset, offset + request.sample_count)
+            request.s1[:, request.length] = s1_ids[rows, 0]
+            request.s2[:, request.length] = s2_ids[rows, 0]
+            request.length += 1
+            offset += request.sample_count
+
+    def _admit(self):
+        budget = self.max_rows - self.num_rows
+        admitted = []
+        while self.pending and (self.pending[0].sample_count <= budget or not (self.active or admitted)):
+            request = self.pending.popleft()
+            budget -= request.sample_count
+            admitted.append(request)
+        if not admitted:
+            return
+
+        # Prefill the new histories together, left-padded to the longest one, once per series
+        seq_len = max(request.history_len for request in admitted)
+        x = torch.zeros(len(admitted), seq_len, admitted[0].x.shape[-1])
+        x_stamp = torch.zeros(len(admitted), seq_len, admitted[0].x_stamp.shape[-1])
+        padding = torch.zeros(len(admitted), seq_len, dtype=torch.bool)
+        for i, request in enumerate(admitted):
+            start = seq_len - request.history_len
+            x[i, start:] = torch.from_numpy(np.asarray(request.x, dtype=np.float32))
+            x_stamp[i, start:] = torch.from_numpy(np.asarray(request.x_stamp, dtype=np.float32))
+            padding[i, :start] = True
+        x = torch.clip(x, -self.clip, self.clip).to(self.device)
+        x_stamp, padding = x_stamp.to(self.device), padding.to(self.device)
+
+        s1_hist, s2_hist = self.tokenizer.encode(x, half=True, padding_mask=padding)
+        kv_cache = self.model.init_kv_cache()
+        s1_logits, context = self.model.decode_s1_step(s1_hist, s2_hist, x_stamp, padding_mask=padding, kv_cache=kv_cache)
+
+        counts = torch.tensor([request.sample_count for request in admitted], device=self.device)
+        for layer_cache in kv_cache:
+            layer_cache.repeat_interleave(counts)
+        padding = padding.repeat_interleave(counts, dim=0)
+        s1_logits = s1_logits.repeat_interleave(counts, dim=0)
+        context = context[:, -1:].repeat_interleave(counts, dim=0)
+
+        for i, request in enumerate(admitted):
+            request.s1 = s1_hist.new_empty(request.sample_count, request.max_len)
+            request.s2 = s2_hist.new_empty(request.sample_count, request.max_len)
+            request.s1[:, :request.history_len] = s1_hist[i, seq_len - request.history_len:]
+            request.s2[:, :request.history_len] = s2_hist[i, seq_len - request.history_len:]
+            request.stamp = torch.cat([
+                torch.from_numpy(np.asarray(request.x_stamp, dtype=np.float32)),
+                torch.from_numpy(np.asarray(request.y_stamp[:request.pred_len], dtype=np.float32)),
+            ]).to(self.device)
+            request.length = request.history_len
+
+        s1_ids = self._sample(s1_logits, admitted)
+        s2_logits = self.model.decode_s2_step(context, s1_ids, padding_mask=padding, kv_cache=kv_cache)
+        s2_ids = self._sample(s2_logits, admitted)
+        self._write(admitted, s1_ids, s2_ids)
+
+        self._merge(kv_cache, padding)
+        self.active += admitted
+
+    def _merge(self, kv_cache, padding):
+        if self.kv_cache is None:
+            self.kv_cache, self.padding = kv_cache, padding
+            return
+
+        # Right-align both groups on a common number of slots
+        slots, new_slots = self.padding.size(1), padding.size(1)
+        total = max(slots, new_slots)
+        self.padding = torch.cat([F.pad(self.padding, (total - slots, 0), value=True),
+                                  F.pad(padding, (total - new_slots, 0), value=True)], dim=0)
+        for layer_cache, new_cache in zip(self.kv_cache, kv_cache):
+            layer_cache.k = torch.cat([_left_pad(layer_cache.k, total - slots), _left_pad(new_cache.k, total - new_slots)], dim=0)
+            layer_cache.v = torch.cat([_left_pad(layer_cache.v, total - slots), _left_pad(new_cache.v, total - new_slots)], dim=0)
+            layer_cache.position = total
+
+    def _decode_step(self):
+        s1_ids = torch.cat([request.s1[:, request.length - 1:request.length] for request in self.active], dim=0)
+        s2_ids = torch.cat([request.s2[:, request.length - 1:request.length] for request in self.active], dim=0)
+        stamp = torch.cat([request.stamp[request.length - 1].expand(request.sample_count, 1, -1) for request in self.active], dim=0)
+        self.padding = F.pad(self.padding, (0, 1), value=False)
+
+        s1_logits, context = self.model.decode_s1_step(s1_ids, s2_ids, stamp, padding_mask=self.padding, kv_cache=self.kv_cache)
+        s1_ids = self._sample(s1_logits, self.active)
+        s2_logits = self.model.decode_s2_step(context, s1_ids, padding_mask=self.padding, kv_cache=self.kv_cache)
+        s2_ids = self._sample(s2_logits, self.active)
+        self._write(self.active, s1_ids, s2_ids)
+
+    def _retire(self):
+        finished = [request for request in self.active if request.finished]
+        if not finished:
+            return []
+
+        for request in finished:
+            z = self.tokenizer.decode([request.s1, request.s2], half=True)
+            request.preds = z.float().mean(dim=0)[-request.pred_len:].cpu().numpy()
+
+        keep = torch.cat([torch.full((request.sample_count,), not request.finished, dtype=torch.bool) for request in self.active])
+        self.active = [request for request in self.active if not request.finished]
+        if not self.active:
+            self.kv_cache = self.padding = None
+            return finished
+
+        keep = keep.to(self.device)
+        self.padding = self.padding[keep]
+        # Drop leading slots that are padding in every remaining row
+        lead = int(self.padding.long().cumprod(dim=1).sum(dim=1).min())
+        self.padding = self.padding[:, lead:]
+        for layer_cache in self.kv_cache:
+            layer_cache.k = layer_cache.k[keep, :, lead:]
+            layer_cache.v = layer_cache.v[keep, :, lead:]
+            layer_cache.position -= lead
+        return finished
@@ -0,0 +1,127 @@
+"""
+Zero-copy checkpoint loading for `KronosTokenizer.from_pretrained` and `Kronos.from_pretrained`.
+
+`model.safetensors` is memory-mapped copy-on-write and every tensor is a view into the mapping, so loading reads no
+more of the file than the weights touched and holds no second copy of them. Mappings of one file share the OS page
+cache, e.g. the tokenizer and the model loaded from one directory, while writes stay private to each load; the
+pages of a model that was switched out are released with its last tensor. Modules are built with their parameters
+on the meta device, which skips the random initialisation the checkpoint would overwrite, and then take the mapped
+tensors as their parameters.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+import torch
+import torch.nn as nn
+
+SAFETENSORS_DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8, 'U8': torch.uint8, 'BOOL': torch.bool,
+}
+
+
+def load_safetensors(path):
+    """Returns the tensors of a safetensors file as views into a copy-on-write mapping of it, which the tensors keep open."""
+    with open(path, 'rb') as f:
+        # Copy-on-write, so that in-place updates of a parameter reach neither the file nor other loads of it
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header_len, = struct.unpack('<Q', mapped[:8])
+    header = json.loads(mapped[8:8 + header_len])
+    header.pop('__metadata__', None)
+    data_start = 8 + header_len
+    state_dict = {}
+    for name, info in header.items():
+        dtype = SAFETENSORS_DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        if end == begin:
+            state_dict[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        count = (end - begin) // torch.tensor([], dtype=dtype).element_size()
+        state_dict[name] = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + begin).view(info['shape'])
+    return state_dict
+
+
+def load_checkpoint(model_dir):
+    """
+    Returns the state dict stored in model_dir, from model.safetensors (memory-mapped, see `load_safetensors`) or
+    pytorch_model.bin (memory-mapped where the file format allows it), or None when there is neither.
+    """
+    weight_file_safetensors = os.path.join(model_dir, 'model.safetensors')
+    weight_file_pt = os.path.join(model_dir, 'pytorch_model.bin')
+    if os.path.isfile(weight_file_safetensors):
+        try:
+            return load_safetensors(weight_file_safetensors)
+        except Exception:
+            pass
+    if os.path.isfile(weight_file_pt):
+        try:
+            return torch.load(weight_file_pt, map_location='cpu', mmap=True)
+        except RuntimeError:
+            # Files saved with the legacy (non-zip) serialization cannot be mapped
+            return torch.load(weight_file_pt, map_location='cpu')
+    return None
+
+
+# empty_parameters patches nn.Module.register_parameter while any thread is inside it; the patch only redirects the
+# parameters of threads that are, so modules built concurrently elsewhere, e.g. during a background load, are normal
+_register_parameter = nn.Module.register_parameter
+_meta_build = threading.local()
+_patch_lock = threading.Lock()
+_patch_users = 0
+
+
+def _register_meta_parameter(module, name, param):
+    if param is not None and getattr(_meta_build, 'active', False):
+        param = nn.Parameter(param.to('meta'), requires_grad=param.requires_grad)
+    _register_parameter(module, name, param)
+
+
+@contextmanager
+def empty_parameters():
+    """
+    Puts the parameters of modules built inside the context on the meta device, so neither their memory nor their
+    initialisation is paid for. Buffers are built as usual, since most of them are computed rather than loaded.
+    Only affects the calling thread, so build only the model inside.
+    """
+    global _patch_users
+    with _patch_lock:
+        if _patch_users == 0:
+            nn.Module.register_parameter = _register_meta_parameter
+        _patch_users += 1
+    active = getattr(_meta_build, 'active', False)
+    _meta_build.active = True
+    try:
+        yield
+    finally:
+        _meta_build.active = active
+        with _patch_lock:
+            _patch_users -= 1
+            if _patch_users == 0:
+                nn.Module.register_parameter = _register_parameter
+
+
+def build_with_state_dict(build, state_dict):
+    """
+    Returns the module build() creates, loaded non-strictly with state_dict. When state_dict holds every parameter,
+    the module is built with `empty_parameters` and the tensors of state_dict become its parameters without a
+    copy. Otherwise it is built and initialised as usual, so that parameters missing from the checkpoint keep their
+    random initialisation.
+    """
+    with empty_parameters():
+        module = build()
+    params = dict(module.named_parameters())
+    if all(name in state_dict and state_dict[name].shape == param.shape for name, param in params.items()):
+        state_dict = {name: value.to(params[name].dtype) if name in params else value for name, value in state_dict.items()}
+        module.load_state_dict(state_dict, strict=False, assign=True)
+        # assign replaces the parameters and with them their requires_grad flags
+        for name, param in module.named_parameters():
+            param.requires_grad_(params[name].requires_grad)
+        return module
+    module = build()
+    module.load_state_dict(state_dict, strict=False)
+    return module
@@ -0,0 +1,330 @@
+"""
+TorchScript-compiled decoding for Kronos.
+
+The eager decoding loop spends most of its time on Python overhead for small models. This module traces the hot
+functions into TorchScript graphs with static shapes:
+
+- the single-token `decode_s1_step` / `decode_s2_step` over fixed-capacity key/value buffers,
+- `KronosTokenizer.encode` / `decode`.
+
+Shapes are rounded up to buckets (powers of two rows up to `MAX_BATCH_BUCKET`, multiples of it beyond, and
+multiples of `CONTEXT_BUCKET` positions) so a handful of graphs cover all requests. Rows are padded with zeros and
+sequences are right-padded; both are exact because rows are independent and self-attention is causal, and the step
+graphs mask unused cache slots. Traced graphs are saved to `cache_dir`, so warm restarts load them instead of
+tracing again; loaded graphs are re-bound to the weights of the live module, so every bucket shares one copy.
+"""
+
+import hashlib
+import os
+import warnings
+
+import torch
+import torch.nn as nn
+
+from model.module import RollingKVCache, attention, get_attention_backend
+
+MAX_BATCH_BUCKET = 64
+CONTEXT_BUCKET = 64
+
+
+def bucket(n, step):
+    """Rounds n up to a multiple of step."""
+    return -(-n // step) * step
+
+
+def batch_bucket(rows):
+    """Rounds a row count up to a power of two, or to a multiple of `MAX_BATCH_BUCKET` above it."""
+    if rows > MAX_BATCH_BUCKET:
+        return bucket(rows, MAX_BATCH_BUCKET)
+    return 1 << (rows - 1).bit_length()
+
+
+def _update_digest(digest, name, value):
+    """Hashes the bytes of a state dict entry, including the int8 values and scales of quantized tensors."""
+    if isinstance(value, (tuple, list)):
+        # Packed parameters of dynamically quantized Linears hold (weight, bias)
+        for i, item in enumerate(value):
+            _update_digest(digest, f'{name}.{i}', item)
+        return
+    if not isinstance(value, torch.Tensor):
+        digest.update(f'{name}{value!r}'.encode())
+        return
+    tensor = value.detach().cpu()
+    digest.update(f'{name}{tuple(tensor.shape)}{tensor.dtype}'.encode())
+    if tensor.is_quantized:
+        if tensor.qscheme() in (torch.per_tensor_affine, torch.per_tensor_symmetric):
+            digest.update(f'{tensor.q_scale()!r}{tensor.q_zero_point()}'.encode())
+        else:
+            _update_digest(digest, f'{name}.scales', tensor.q_per_channel_scales())
+            _update_digest(digest, f'{name}.zero_points', tensor.q_per_channel_zero_points())
+        tensor = tensor.int_repr()
+    digest.update(tensor.contiguous().flatten().view(torch.uint8).numpy().data)
+
+
+def model_fingerprint(module):
+    """Identity of a module's architecture and weights, hashed from their bytes, used to key on-disk artifacts."""
+    digest = hashlib.sha1(repr(module).encode())
+    digest.update(torch.__version__.encode())
+    for name, value in module.state_dict().items():
+        _update_digest(digest, name, value)
+    return digest.hexdigest()[:16]
+
+
+def share_weights(graph, module):
+    """
+    Points the parameters, buffers and packed int8 weights of a loaded graph at those of `module`, the module it was
+    traced from. A traced graph shares the tensors of its module, but one loaded from disk owns a copy of them.
+    """
+    modules = dict(module.named_modules())
+    for name, submodule in graph.named_modules():
+        source = modules[name]
+        for attr, _ in [*submodule.named_parameters(recurse=False), *submodule.named_buffers(recurse=False)]:
+            setattr(submodule, attr, getattr(source, attr))
+        if isinstance(getattr(source, '_packed_params', None), torch.ScriptObject):
+            submodule._packed_params = source._packed_params
+    return graph
+
+
+class ArtifactCache:
+    """In-memory and optional on-disk store of traced graphs for one module."""
+
+    def __init__(self, module, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.fingerprint = model_fingerprint(module)
+        self.graphs = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, name, build, example_inputs):
+        """Returns the graph for `name`, loading it from disk or tracing `build()` on `example_inputs`."""
+        if name in self.graphs:
+            return self.graphs[name]
+        path = None
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f'{name}-{self.fingerprint}.pt')
+        device = example_inputs[0].device
+        if path and os.path.isfile(path):
+            graph = share_weights(torch.jit.load(path, map_location=device), build())
+        else:
+            # Shape asserts and cache lookups inside the modules are constant for a bucket, which is the point
+            with torch.no_grad(), warnings.catch_warnings():
+                warnings.simplefilter('ignore', torch.jit.TracerWarning)
+                graph = torch.jit.trace(build().eval(), example_inputs, check_trace=False)
+            if path:
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                torch.jit.save(graph, tmp_path)
+                os.replace(tmp_path, path)
+        self.graphs[name] = graph
+        return graph
+
+
+class StaticS1Step(nn.Module):
+    """`Kronos.decode_s1_step` for one new position over preallocated key/value buffers of fixed capacity."""
+
+    def __init__(self, model, capacity):
+        super().__init__()
+        self.model = model
+        inv_freq = model.transformer[0].self_attn.rotary.inv_freq
+        freqs = torch.outer(torch.arange(capacity, device=inv_freq.device).type_as(inv_freq), inv_freq)
+        emb = torch.cat((freqs, freqs), dim=-1)
+        self.register_buffer('cos', emb.cos())
+        self.register_buffer('sin', emb.sin())
+        self.register_buffer('slots', torch.arange(capacity, device=inv_freq.device))
+
+    def forward(self, s1_ids, s2_ids, stamp, position, caches):
+        """caches holds (k, v) buffers of shape [batch, n_heads, capacity, head_dim] per layer, then the dependency
+        layer's cross-attention buffers. The new position is written in place."""
+        model = self.model
+        batch_size = s1_ids.size(0)
+        x = model.embedding([s1_ids, s2_ids]) + model.time_emb(stamp)
+
+        cos = self.cos.index_select(0, position)[None, None]
+        sin = self.sin.index_select(0, position)[None, None]
+        mask = (self.slots > position)[None, None, None]  # True = blocked: slots after the new position
+
+        for i, layer in enumerate(model.transformer):
+            attn = layer.self_attn
+            k_cache, v_cache = caches[2 * i], caches[2 * i + 1]
+            h = layer.norm1(x)
+            q, k, v = (t.view(batch_size, 1, attn.n_heads, attn.head_dim).transpose(1, 2) for t in attn.project_qkv(h))
+            q = q * cos + attn.rotary._rotate_half(q) * sin
+            k = k * cos + attn.rotary._rotate_half(k) * sin
+            k_cache.index_copy_(2, position, k)
+            v_cache.index_copy_(2, position, v)
+            out = attention(q, k_cache, v_cache, attn_mask=mask)
+            x = x + attn.out_proj(out.transpose(1, 2).reshape(batch_size, 1, attn.d_model))
+            x = x + layer.ffn(layer.norm2(x))
+        x = model.norm(x)
+
+        cross_attn = model.dep_layer.cross_attn
+        k, v = (t.view(batch_size, 1, cross_attn.n_heads, cross_attn.head_dim).transpose(1, 2) for t in cross_attn.project_kv(x, x))
+        caches[-2].index_copy_(2, position, k)
+        caches[-1].index_copy_(2, position, v)
+        return model.head(x[:, -1]), x
+
+
+class StaticS2Step(nn.Module):
+    """`Kronos.decode_s2_step` over the dependency layer's cross-attention buffers, filled up to `position`."""
+
+    def __init__(self, model, capacity):
+        super().__init__()
+        self.model = model
+        self.register_buffer('slots', torch.arange(capacity, device=model.embedding.emb_s1.weight.device))
+
+    def forward(self, last_hidden, s1_ids, position, caches):
+        """caches holds the (k, v) cross-attention buffers of shape [batch, n_heads, capacity, head_dim]."""
+        model = self.model
+        cross_k, cross_v = caches
+        dep_layer = model.dep_layer
+        cross_attn = dep_layer.cross_attn
+        batch_size = s1_ids.size(0)
+
+        sibling_embed = model.embedding.emb_s1(s1_ids)
+        q = cross_attn.q_proj(sibling_embed).view(batch_size, 1, cross_attn.n_heads, cross_attn.head_dim).transpose(1, 2)
+        mask = (self.slots > position)[None, None, None]
+        out = attention(q, cross_k, cross_v, attn_mask=mask)
+        out = cross_attn.out_proj(out.transpose(1, 2).reshape(batch_size, 1, cross_attn.d_model))
+        x2 = dep_layer.norm(last_hidden + out)
+        return model.head.cond_forward(x2[:, -1])
+
+
+class TokenizerEncode(nn.Module):
+    def __init__(self, tokenizer):
+        super().__init__()
+        self.tokenizer = tokenizer
+
+    def forward(self, x):
+        s1_ids, s2_ids = self.tokenizer.encode(x, half=True)
+        return s1_ids, s2_ids
+
+
+class TokenizerDecode(nn.Module):
+    def __init__(self, tokenizer):
+        super().__init__()
+        self.tokenizer = tokenizer
+
+    def forward(self, s1_ids, s2_ids):
+        return self.tokenizer.decode([s1_ids, s2_ids], half=True)
+
+
+def _pad_to(tensor, size, dim):
+    """Zero-pads `tensor` along `dim` up to `size`."""
+    if tensor.size(dim) == size:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = size - shape[dim]
+    return torch.cat([tensor, tensor.new_zeros(shape)], dim=dim)
+
+
+class CompiledKronos:
+    """
+    Stand-in for a `Kronos` model in `auto_regressive_inference` whose cached single-token steps run as TorchScript.
+
+    Prefill, full-window recompute and rolling caches fall back to the eager model; every other attribute is
+    delegated to it. Key/value caches are allocated with a bucketed capacity and, on the first compiled step,
+    their rows are zero-padded to the batch bucket.
+
+    Args:
+        model (Kronos): Eager model in eval mode, already on its target device.
+        cache_dir (str, optional): Directory for traced graphs. Without it graphs are only kept in memory.
+    """
+
+    def __init__(self, model, cache_dir=None):
+        self.model = model
+        self.artifacts = ArtifactCache(model, cache_dir)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def init_kv_cache(self, capacity=None, rolling=False):
+        if capacity is None or rolling:
+            return self.model.init_kv_cache(capacity, rolling=rolling)
+        return self.model.init_kv_cache(bucket(capacity, CONTEXT_BUCKET))
+
+    @staticmethod
+    def _is_static(kv_cache):
+        return (kv_cache is not None and not isinstance(kv_cache[0], RollingKVCache)
+                and kv_cache[0].capacity is not None and kv_cache[0].k is not None)
+
+    @staticmethod
+    def _pad_rows(kv_cache, batch_size):
+        for layer_cache in kv_cache:
+            if layer_cache.k.size(0) != batch_size:
+                layer_cache.k = _pad_to(layer_cache.k, batch_size, 0)
+                layer_cache.v = _pad_to(layer_cache.v, batch_size, 0)
+
+    def _graph(self, kind, build, example_inputs):
+        batch_size, capacity = example_inputs[-1][0].size(0), example_inputs[-1][0].size(2)
+        device = example_inputs[0].device.type
+        name = f'{kind}-b{batch_size}-c{capacity}-{device}-{get_attention_backend()}'
+        return self.artifacts.get(name, build, example_inputs)
+
+    def decode_s1_step(self, s1_ids, s2_ids, stamp=None, padding_mask=None, kv_cache=None):
+        if not self._is_static(kv_cache) or stamp is None or padding_mask is not None or s1_ids.size(1) != 1:
+            return self.model.decode_s1_step(s1_ids, s2_ids, stamp, padding_mask=padding_mask, kv_cache=kv_cache)
+
+        rows = s1_ids.size(0)
+        batch_size = batch_bucket(rows)
+        self._pad_rows(kv_cache, batch_size)
+        capacity = kv_cache[0].capacity
+        position = torch.tensor([kv_cache[0].position], device=s1_ids.device)
+        caches = tuple(t for layer_cache in kv_cache for t in (layer_cache.k, layer_cache.v))
+
+        inputs = (_pad_to(s1_ids, batch_size, 0), _pad_to(s2_ids, batch_size, 0), _pad_to(stamp, batch_size, 0), position, caches)
+        graph = self._graph('s1_step', lambda: StaticS1Step(self.model, capacity), inputs)
+        s1_logits, context = graph(*inputs)
+        for layer_cache in kv_cache:
+            layer_cache.position += 1
+        return s1_logits[:rows], context[:rows]
+
+    def decode_s2_step(self, context, s1_ids, padding_mask=None, kv_cache=None):
+        if not self._is_static(kv_cache) or padding_mask is not None:
+            return self.model.decode_s2_step(context, s1_ids, padding_mask=padding_mask, kv_cache=kv_cache)
+
+        rows = s1_ids.size(0)
+        batch_size = batch_bucket(rows)
+        self._pad_rows(kv_cache, batch_size)
+        dep_cache = kv_cache[-1]
+        position = torch.tensor([dep_cache.position - 1], device=s1_ids.device)
+
+        inputs = (_pad_to(context[:, -1:], batch_size, 0), _pad_to(s1_ids, batch_size, 0), position, (dep_cache.k, dep_cache.v))
+        graph = self._graph('s2_step', lambda: StaticS2Step(self.model, dep_cache.capacity), inputs)
+        return graph(*inputs)[:rows]
+
+
+class CompiledKronosTokenizer:
+    """
+    Stand-in for a `KronosTokenizer` whose half-quantized `encode` / `decode` run as TorchScript graphs traced per
+    (batch, sequence length) bucket. Other calls are delegated to the eager tokenizer.
+    """
+
+    def __init__(self, tokenizer, cache_dir=None):
+        self.tokenizer = tokenizer
+        self.artifacts = ArtifactCache(tokenizer, cache_dir)
+
+    def __getattr__(self, name):
+        return getattr(self.tokenizer, name)
+
+    def _bucketed(self, tensor):
+        rows, seq_len = tensor.shape[:2]
+        tensor = _pad_to(tensor, batch_bucket(rows), 0)
+        return _pad_to(tensor, bucket(seq_len, CONTEXT_BUCKET), 1)
+
+    def encode(self, x, half=False, padding_mask=None):
+        if not half or padding_mask is not None:
+            return self.tokenizer.encode(x, half, padding_mask=padding_mask)
+        rows, seq_len = x.shape[:2]
+        x = self._bucketed(x)
+        name = f'encode-b{x.size(0)}-l{x.size(1)}-{x.device.type}-{get_attention_backend()}'
+        graph = self.artifacts.get(name, lambda: TokenizerEncode(self.tokenizer), (x,))
+        s1_ids, s2_ids = graph(x)
+        return [s1_ids[:rows, :seq_len], s2_ids[:rows, :seq_len]]
+
+    def decode(self, x, half=False, padding_mask=None, kv_cache=None):
+        if not half or padding_mask is not None or kv_cache is not None:
+            return self.tokenizer.decode(x, half, padding_mask=padding_mask, kv_cache=kv_cache)
+        rows, seq_len = x[0].shape
+        s1_ids, s2_ids = self._bucketed(x[0]), self._bucketed(x[1])
+        name = f'decode-b{s1_ids.size(0)}-l{s1_ids.size(1)}-{s1_ids.device.type}-{get_attention_backend()}'
+        graph = self.artifacts.get(name, lambda: TokenizerDecode(self.tokenizer), (s1_ids, s2_ids))
+        return graph(s1_ids, s2_ids)[:rows, :seq_len]
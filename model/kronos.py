@@ -4,15 +4,21 @@ import torch
 import sys
 import json
 import os
+from functools import partial
 
 try:  # Optional tqdm
-    from tqdm import trange
+    from tqdm import tqdm, trange
 except Exception:  # Fallback if tqdm not installed in minimal inference env
+    tqdm = None
+
     def trange(x):
         return range(x)
 
 sys.path.append("../")
 from model.module import *
+from model.checkpoint import build_with_state_dict, load_checkpoint
+from model.compiled import CompiledKronos, CompiledKronosTokenizer
+from model.base_predictor import BasePredictor, calc_time_stamps
 
 
 class KronosTokenizer(nn.Module):
@@ -77,17 +83,22 @@ class KronosTokenizer(nn.Module):
         self.tokenizer = BSQuantizer(self.s1_bits, self.s2_bits, beta, gamma0, gamma, zeta, group_size) # BSQuantizer module
 
     @classmethod
-    def from_pretrained(cls, model_dir: str):
+    def from_pretrained(cls, model_dir: str, quantize: str = None, fuse: bool = True):
         """Load tokenizer weights from a local directory created by save_pretrained.
         Expects: config.json (with architecture fields) & model.safetensors or pytorch_model.bin
+        quantize: None (fp32) or 'int8' for dynamic int8 quantization of the Transformer blocks (CPU inference only).
+        fuse: Run the q/k/v and w1/w3 projections of the encoder/decoder blocks as single GEMMs, see `fuse_projections`.
         """
+        if quantize not in QUANTIZE_MODES:
+            raise ValueError(f"Unknown quantize mode {quantize!r}, expected one of {QUANTIZE_MODES}")
         config_path = os.path.join(model_dir, 'config.json')
         if not os.path.isfile(config_path):
             raise FileNotFoundError(f"config.json not found in {model_dir}")
         with open(config_path, 'r') as f:
             cfg = json.load(f)
         # Tokenizer specific keys
-        obj = cls(
+        build = partial(
+            cls,
             d_in=6,  # fixed: open high low close volume amount
             d_model=cfg['d_model'],
             n_heads=cfg['n_heads'],
@@ -101,25 +112,17 @@ class KronosTokenizer(nn.Module):
             s2_bits=cfg['s2_bits'],
             beta=0.25, gamma0=0.1, gamma=0.1, zeta=1.0, group_size=4
         )
-        # Load weights if available
-        weight_file_safetensors = os.path.join(model_dir, 'model.safetensors')
-        weight_file_pt = os.path.join(model_dir, 'pytorch_model.bin')
-        state_dict = None
-        if os.path.isfile(weight_file_safetensors):
-            try:
-                from safetensors.torch import load_file as safe_load
-                state_dict = safe_load(weight_file_safetensors)
-            except Exception:
-                pass
-        if state_dict is None and os.path.isfile(weight_file_pt):
-            state_dict = torch.load(weight_file_pt, map_location='cpu')
+        # Load weights if available. The checkpoint is memory-mapped and its tensors become the parameters without a
+        # copy or a random initialisation beforehand, see model.checkpoint
+        state_dict = load_checkpoint(model_dir)
+        obj = None
         if state_dict is not None:
             # Some checkpoints may include both tokenizer & model; filter keys
             tok_keys = [k for k in state_dict.keys() if k.startswith('tokenizer.') or k.startswith('embed')]
             if len(tok_keys) == 0:
                 # Try direct load
                 try:
-                    obj.load_state_dict(state_dict, strict=False)
+                    obj = build_with_state_dict(build, state_dict)
                 except Exception:
                     pass
             else:
@@ -129,7 +132,13 @@ class KronosTokenizer(nn.Module):
                     if k.startswith('tokenizer.'):
                         new_k = k[len('tokenizer.') :]
                     cleaned[new_k] = state_dict[k]
-                obj.load_state_dict(cleaned, strict=False)
+                obj = build_with_state_dict(build, cleaned)
+        if obj is None:
+            obj = build()
+        if quantize == 'int8':
+            obj = quantize_dynamic_int8(obj.eval())
+        if fuse:
+            obj = fuse_projections(obj)
         return obj
 
     def forward(self, x):
@@ -184,59 +193,55 @@ class KronosTokenizer(nn.Module):
         Returns:
             torch.Tensor: Bit representation tensor.
         """
-        if half:
-            x1 = x[0] # Assuming x is a tuple of indices if half is True
-            x2 = x[1]
-            mask = 2 ** torch.arange(self.codebook_dim//2, device=x1.device, dtype=torch.long) # Create a mask for bit extraction
-            x1 = (x1.unsqueeze(-1) & mask) != 0 # Extract bits for the first half
-            x2 = (x2.unsqueeze(-1) & mask) != 0 # Extract bits for the second half
-            x = torch.cat([x1, x2], dim=-1) # Concatenate the bit representations
-        else:
-            mask = 2 ** torch.arange(self.codebook_dim, device=x.device, dtype=torch.long) # Create a mask for bit extraction
-            x = (x.unsqueeze(-1) & mask) != 0 # Extract bits
-
-        x = x.float() * 2 - 1 # Convert boolean to bipolar (-1, 1)
-        q_scale = 1. / (self.codebook_dim ** 0.5) # Scaling factor
-        x = x * q_scale
-        return x
+        # One lookup in the quantizer's precomputed bit table, see `BSQuantizer.indices_to_bits`
+        return self.tokenizer.indices_to_bits(x, half)
 
-    def encode(self, x, half=False):
+    def encode(self, x, half=False, padding_mask=None):
         """
         Encodes the input data into quantized indices.
 
         Args:
             x (torch.Tensor): Input tensor of shape (batch_size, seq_len, d_in).
             half (bool, optional): Whether to use half quantization in BSQuantizer. Defaults to False.
+            padding_mask (torch.Tensor, optional): Bool mask of shape (batch_size, seq_len), True marks left padding.
 
         Returns:
             torch.Tensor: Quantized indices from BSQuantizer.
         """
         z = self.embed(x)
         for layer in self.encoder:
-            z = layer(z)
+            z = layer(z, key_padding_mask=padding_mask)
         z = self.quant_embed(z)
 
-        bsq_loss, quantized, z_indices = self.tokenizer(z, half)
-        return z_indices
+        # Only the indices are returned, so the quantizer's losses are skipped
+        return self.tokenizer.indices(z, half)
 
-    def decode(self, x, half=False):
+    def decode(self, x, half=False, padding_mask=None, kv_cache=None):
         """
         Decodes quantized indices back to the input data space.
 
         Args:
             x (torch.Tensor): Quantized indices tensor.
             half (bool, optional): Whether the indices were generated with half quantization. Defaults to False.
+            padding_mask (torch.Tensor, optional): Bool mask of shape (batch_size, seq_len), True marks left padding.
+                With a kv_cache it covers the cached and the new positions.
+            kv_cache (List[KVCache], optional): Caches from `init_kv_cache`. The decoder is causal, so new positions can be
+                decoded one at a time while earlier ones are read from the cache.
 
         Returns:
             torch.Tensor: Reconstructed output tensor of shape (batch_size, seq_len, d_in).
         """
         quantized = self.indices_to_bits(x, half)
         z = self.post_quant_embed(quantized)
-        for layer in self.decoder:
-            z = layer(z)
+        for i, layer in enumerate(self.decoder):
+            z = layer(z, key_padding_mask=padding_mask, kv_cache=kv_cache[i] if kv_cache is not None else None)
         z = self.head(z)
         return z
 
+    def init_kv_cache(self):
+        """Creates an empty key/value cache per decoder layer for incremental `decode`."""
+        return [KVCache() for _ in range(self.dec_layers)]
+
 
 class Kronos(nn.Module):
     """
@@ -298,13 +303,21 @@ class Kronos(nn.Module):
             nn.init.ones_(module.weight)
 
     @classmethod
-    def from_pretrained(cls, model_dir: str):
+    def from_pretrained(cls, model_dir: str, quantize: str = None, fuse: bool = True):
+        """Load model weights from a local directory created by save_pretrained.
+        quantize: None (fp32) or 'int8' for dynamic int8 quantization of the Transformer blocks and the DualHead
+        (CPU inference only).
+        fuse: Run the q/k/v, w1/w3 and cross-attention k/v projections as single GEMMs, see `fuse_projections`.
+        """
+        if quantize not in QUANTIZE_MODES:
+            raise ValueError(f"Unknown quantize mode {quantize!r}, expected one of {QUANTIZE_MODES}")
         config_path = os.path.join(model_dir, 'config.json')
         if not os.path.isfile(config_path):
             raise FileNotFoundError(f"config.json not found in {model_dir}")
         with open(config_path, 'r') as f:
             cfg = json.load(f)
-        obj = cls(
+        build = partial(
+            cls,
             s1_bits=cfg['s1_bits'],
             s2_bits=cfg['s2_bits'],
             n_layers=cfg['n_layers'],
@@ -317,17 +330,8 @@ class Kronos(nn.Module):
             token_dropout_p=cfg['token_dropout_p'],
             learn_te=cfg['learn_te']
         )
-        weight_file_safetensors = os.path.join(model_dir, 'model.safetensors')
-        weight_file_pt = os.path.join(model_dir, 'pytorch_model.bin')
-        state_dict = None
-        if os.path.isfile(weight_file_safetensors):
-            try:
-                from safetensors.torch import load_file as safe_load
-                state_dict = safe_load(weight_file_safetensors)
-            except Exception:
-                pass
-        if state_dict is None and os.path.isfile(weight_file_pt):
-            state_dict = torch.load(weight_file_pt, map_location='cpu')
+        # Memory-mapped, and built without the random initialisation of _init_weights, see model.checkpoint
+        state_dict = load_checkpoint(model_dir)
         if state_dict is not None:
             # Remove potential prefix like 'model.'
             cleaned = {}
@@ -336,7 +340,13 @@ class Kronos(nn.Module):
                 if k.startswith('model.'):
                     new_k = k[len('model.') :]
                 cleaned[new_k] = v
-            obj.load_state_dict(cleaned, strict=False)
+            obj = build_with_state_dict(build, cleaned)
+        else:
+            obj = build()
+        if quantize == 'int8':
+            obj = quantize_dynamic_int8(obj.eval())
+        if fuse:
+            obj = fuse_projections(obj)
         return obj
 
     def forward(self, s1_ids, s2_ids, stamp=None, padding_mask=None, use_teacher_forcing=False, s1_targets=None):
@@ -378,7 +388,33 @@ class Kronos(nn.Module):
         s2_logits = self.head.cond_forward(x2)
         return s1_logits, s2_logits
 
-    def decode_s1(self, s1_ids, s2_ids, stamp=None, padding_mask=None):
+    def init_kv_cache(self, capacity=None, rolling=False):
+        """Creates an empty key/value cache for incremental decoding with `decode_s1` / `decode_s1_step`.
+
+        The list holds one cache per transformer layer followed by one for the dependency-aware layer,
+        which `decode_s1_step` fills and `decode_s2_step` reads.
+
+        Args:
+            capacity (int, optional): Number of positions to preallocate. Without it the cache grows on every step.
+            rolling (bool, optional): Use a `RollingKVCache` that evicts the oldest position once `capacity` is reached.
+        """
+        if rolling:
+            return [RollingKVCache(capacity) for _ in range(self.n_layers + 1)]
+        return [KVCache(capacity) for _ in range(self.n_layers + 1)]
+
+    def _context(self, s1_ids, s2_ids, stamp=None, padding_mask=None, kv_cache=None):
+        x = self.embedding([s1_ids, s2_ids])
+        if stamp is not None:
+            time_embedding = self.time_emb(stamp)
+            x = x + time_embedding
+        x = self.token_drop(x)
+
+        for i, layer in enumerate(self.transformer):
+            x = layer(x, key_padding_mask=padding_mask, kv_cache=kv_cache[i] if kv_cache is not None else None)
+
+        return self.norm(x)
+
+    def decode_s1(self, s1_ids, s2_ids, stamp=None, padding_mask=None, kv_cache=None):
         """
         Decodes only the s1 tokens.
 
@@ -390,22 +426,15 @@ class Kronos(nn.Module):
             s2_ids (torch.Tensor): Input tensor of s2 token IDs. Shape: [batch_size, seq_len]
             stamp (torch.Tensor, optional): Temporal stamp tensor. Shape: [batch_size, seq_len]. Defaults to None.
             padding_mask (torch.Tensor, optional): Mask for padding tokens. Shape: [batch_size, seq_len]. Defaults to None.
+            kv_cache (List[KVCache], optional): Per-layer caches from `init_kv_cache`. When given, the inputs hold only the
+                new positions, which are appended to the cache; logits and context are returned for those positions only.
 
         Returns:
             Tuple[torch.Tensor, torch.Tensor]:
                 - s1 logits: Logits for s1 token predictions. Shape: [batch_size, seq_len, s1_vocab_size]
                 - context: Context representation from the Transformer. Shape: [batch_size, seq_len, d_model]
         """
-        x = self.embedding([s1_ids, s2_ids])
-        if stamp is not None:
-            time_embedding = self.time_emb(stamp)
-            x = x + time_embedding
-        x = self.token_drop(x)
-
-        for layer in self.transformer:
-            x = layer(x, key_padding_mask=padding_mask)
-
-        x = self.norm(x)
+        x = self._context(s1_ids, s2_ids, stamp, padding_mask, kv_cache)
 
         s1_logits = self.head(x)
         return s1_logits, x
@@ -430,6 +459,69 @@ class Kronos(nn.Module):
         x2 = self.dep_layer(context, sibling_embed, key_padding_mask=padding_mask)
         return self.head.cond_forward(x2)
 
+    def decode_s1_step(self, s1_ids, s2_ids, stamp=None, padding_mask=None, kv_cache=None):
+        """
+        Generation-mode variant of `decode_s1` that projects only the last position through the s1 head.
+
+        With a kv_cache the new context positions are also projected into the dependency-aware layer's cache,
+        so `decode_s2_step` attends over them without re-projecting the whole context on every step.
+
+        Args:
+            s1_ids (torch.Tensor): Input tensor of s1 token IDs. Shape: [batch_size, seq_len]
+            s2_ids (torch.Tensor): Input tensor of s2 token IDs. Shape: [batch_size, seq_len]
+            stamp (torch.Tensor, optional): Temporal stamp tensor. Shape: [batch_size, seq_len]. Defaults to None.
+            padding_mask (torch.Tensor, optional): Bool mask, True marks (left) padding. Shape: [batch_size, seq_len], or
+                with a kv_cache [batch_size, cached + seq_len]. Defaults to None.
+            kv_cache (List[KVCache], optional): Caches from `init_kv_cache`; the inputs then hold only the new positions.
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor]:
+                - s1 logits of the last position. Shape: [batch_size, s1_vocab_size]
+                - context: Context representation of the input positions. Shape: [batch_size, seq_len, d_model]
+        """
+        x = self._context(s1_ids, s2_ids, stamp, padding_mask, kv_cache)
+        if kv_cache is not None:
+            self.dep_layer.cross_attn.append_kv(x, x, kv_cache[-1])
+        return self.head(x[:, -1]), x
+
+    def decode_s1_tail(self, s1_ids, s2_ids, stamp=None, num_positions=1, padding_mask=None, kv_cache=None):
+        """
+        Variant of `decode_s1_step` that projects the last `num_positions` positions through the s1 head, so several
+        drafted tokens can be scored in one forward pass.
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor]:
+                - s1 logits of the last num_positions positions. Shape: [batch_size, num_positions, s1_vocab_size]
+                - context: Context representation of the input positions. Shape: [batch_size, seq_len, d_model]
+        """
+        x = self._context(s1_ids, s2_ids, stamp, padding_mask, kv_cache)
+        if kv_cache is not None:
+            self.dep_layer.cross_attn.append_kv(x, x, kv_cache[-1])
+        return self.head(x[:, -num_positions:]), x
+
+    def decode_s2_step(self, context, s1_ids, padding_mask=None, kv_cache=None):
+        """
+        Generation-mode variant of `decode_s2` that runs the dependency-aware layer and s2 head for the last position only.
+
+        Args:
+            context (torch.Tensor): Context from `decode_s1_step`. Shape: [batch_size, seq_len, d_model]. With a kv_cache only
+                the last position is read, the keys/values come from the cache.
+            s1_ids (torch.Tensor): Sampled s1 token IDs of the last position. Shape: [batch_size, 1]
+            padding_mask (torch.Tensor, optional): Mask for padding tokens over the attended positions. Defaults to None.
+            kv_cache (List[KVCache], optional): The caches passed to `decode_s1_step`.
+
+        Returns:
+            torch.Tensor: s2 logits of the last position. Shape: [batch_size, s2_vocab_size]
+        """
+        if kv_cache is not None:
+            dep_cache = kv_cache[-1]
+        else:
+            dep_cache = KVCache()
+            self.dep_layer.cross_attn.append_kv(context, context, dep_cache)
+        sibling_embed = self.embedding.emb_s1(s1_ids)
+        x2 = self.dep_layer.step(context[:, -1:], sibling_embed, dep_cache, key_padding_mask=padding_mask)
+        return self.head.cond_forward(x2[:, -1])
+
 
 def top_k_top_p_filtering(
         logits,
@@ -441,289 +533,744 @@ def top_k_top_p_filtering(
     """Filter a distribution of logits using top-k and/or nucleus (top-p) filtering
     Args:
         logits: logits distribution shape (batch size, vocabulary size)
-        if top_k > 0: keep only top k tokens with highest probability (top-k filtering).
+        if top_k > 0: keep only top k tokens with highest probability (top-k filtering). Takes precedence over top_p.
         if top_p < 1.0: keep the top tokens with cumulative probability >= top_p (nucleus filtering).
             Nucleus filtering is described in Holtzman et al. (http://arxiv.org/abs/1904.09751)
         Make sure we keep at least min_tokens_to_keep per batch example in the output
+        top_k and top_p may also be tensors of shape (batch size,) with one setting per row.
+    Returns a new tensor; the input logits are left untouched. Sampling goes through `sample_from_logits`, which
+    never materialises the filtered distribution; this is for callers that need it, e.g. speculative sampling.
     From: https://gist.github.com/thomwolf/1a5a29f6962089e871b94cbd09daf317
     """
+    if torch.is_tensor(top_k) or torch.is_tensor(top_p):
+        top_k, top_p = _row_params(logits, top_k, top_p)
+        sorted_logits, sorted_indices = torch.sort(logits, descending=True)
+        sorted_indices_to_remove = _row_filter_mask(sorted_logits, torch.logsumexp(logits, dim=-1, keepdim=True), top_k, top_p,
+                                                    min_tokens_to_keep)
+        indices_to_remove = sorted_indices_to_remove.scatter(-1, sorted_indices, sorted_indices_to_remove)
+        return logits.masked_fill(indices_to_remove, filter_value)
+
     if top_k > 0:
         top_k = min(max(top_k, min_tokens_to_keep), logits.size(-1))  # Safety check
         # Remove all tokens with a probability less than the last token of the top-k
-        indices_to_remove = logits < torch.topk(logits, top_k)[0][..., -1, None]
-        logits[indices_to_remove] = filter_value
-        return logits
+        return logits.masked_fill(logits < torch.topk(logits, top_k)[0][..., -1, None], filter_value)
 
     if top_p < 1.0:
         sorted_logits, sorted_indices = torch.sort(logits, descending=True)
-        cumulative_probs = torch.cumsum(F.softmax(sorted_logits, dim=-1), dim=-1)
+        sorted_indices_to_remove = _nucleus_mask(sorted_logits, top_p, min_tokens_to_keep)
+        # scatter sorted tensors to original indexing
+        indices_to_remove = sorted_indices_to_remove.scatter(-1, sorted_indices, sorted_indices_to_remove)
+        return logits.masked_fill(indices_to_remove, filter_value)
 
-        # Remove tokens with cumulative probability above the threshold (token with 0 are kept)
-        sorted_indices_to_remove = cumulative_probs > top_p
-        if min_tokens_to_keep > 1:
-            # Keep at least min_tokens_to_keep (set to min_tokens_to_keep-1 because we add the first one below)
-            sorted_indices_to_remove[..., :min_tokens_to_keep] = 0
-        # Shift the indices to the right to keep also the first token above the threshold
-        sorted_indices_to_remove[..., 1:] = sorted_indices_to_remove[..., :-1].clone()
-        sorted_indices_to_remove[..., 0] = 0
+    return logits
 
-        # scatter sorted tensors to original indexing
-        indices_to_remove = sorted_indices_to_remove.scatter(1, sorted_indices, sorted_indices_to_remove)
-        logits[indices_to_remove] = filter_value
-        return logits
 
+def _nucleus_mask(sorted_logits, top_p, min_tokens_to_keep=1):
+    """Marks the tokens outside the nucleus of logits sorted in descending order.
 
-def sample_from_logits(logits, temperature=1.0, top_k=None, top_p=None, sample_logits=True):
-    logits = logits / temperature
-    if top_k is not None or top_p is not None:
-        if top_k > 0 or top_p < 1.0:
-            logits = top_k_top_p_filtering(logits, top_k=top_k, top_p=top_p)
+    A token is kept while the probability mass in front of it is at most top_p, which keeps the first token that
+    crosses the threshold. `top_p` is a float or a tensor broadcastable to [batch, 1].
+    """
+    probs = F.softmax(sorted_logits, dim=-1)
+    mass_before = torch.cumsum(probs, dim=-1).sub_(probs)
+    to_remove = mass_before > top_p
+    to_remove[..., :min_tokens_to_keep] = False
+    return to_remove
 
-    probs = F.softmax(logits, dim=-1)
 
-    if not sample_logits:
-        _, x = top_k(probs, k=1, dim=-1)
-    else:
-        x = torch.multinomial(probs, num_samples=1)
+def _row_params(logits, top_k, top_p):
+    """Broadcasts scalar or per-row top_k / top_p to tensors of shape [batch] on the device of logits."""
+    batch_size = logits.size(0)
+    top_k = torch.as_tensor(top_k, dtype=torch.long, device=logits.device).expand(batch_size)
+    top_p = torch.as_tensor(top_p, dtype=torch.float32, device=logits.device).expand(batch_size)
+    return top_k, top_p
 
-    return x
 
+def _row_filter_mask(sorted_logits, log_norm, top_k, top_p, min_tokens_to_keep=1):
+    """Per-row variant of the filters for the leading candidates of logits sorted in descending order.
 
-def auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99, sample_count=5, verbose=False):
-    with torch.no_grad():
-        batch_size = x.size(0)
-        initial_seq_len = x.size(1)
-        x = torch.clip(x, -clip, clip)
+    Rows with top_k > 0 keep their top_k tokens, the other rows with top_p < 1 keep their nucleus. `log_norm` is the
+    logsumexp over the whole vocabulary, so the candidates may be a prefix of the sorted vocabulary.
+    """
+    rank = torch.arange(sorted_logits.size(-1), device=sorted_logits.device)
+    probs = torch.exp(sorted_logits - log_norm)
+    mass_before = torch.cumsum(probs, dim=-1).sub_(probs)
+    by_k = (top_k > 0).unsqueeze(-1) & (rank >= top_k.unsqueeze(-1))
+    by_p = ((top_k == 0) & (top_p < 1.0)).unsqueeze(-1) & (mass_before > top_p.unsqueeze(-1))
+    to_remove = by_k | by_p
+    to_remove[..., :min_tokens_to_keep] = False
+    return to_remove
 
-        device = x.device
-        x = x.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, x.size(1), x.size(2)).to(device)
-        x_stamp = x_stamp.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, x_stamp.size(1), x_stamp.size(2)).to(device)
-        y_stamp = y_stamp.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, y_stamp.size(1), y_stamp.size(2)).to(device)
 
-        x_token = tokenizer.encode(x, half=True)
+# Nucleus sampling first looks for the nucleus among this many top tokens and only sorts the full vocabulary if
+# their probability mass does not reach top_p
+_NUCLEUS_CANDIDATES = 64
 
-        def get_dynamic_stamp(x_stamp, y_stamp, current_seq_len, pred_step):
 
-            if current_seq_len <= max_context - pred_step:
-                return torch.cat([x_stamp, y_stamp[:, :pred_step, :]], dim=1)
-            else:
-                start_idx = max_context - pred_step
-                return torch.cat([x_stamp[:, -start_idx:, :], y_stamp[:, :pred_step, :]], dim=1)
+def _gumbel_argmax(logits):
+    """Draws one index per row from softmax(logits) as argmax(logits + Gumbel noise), skipping softmax and multinomial."""
+    noise = torch.empty_like(logits).exponential_().log_()
+    return (logits - noise).argmax(dim=-1, keepdim=True)
 
-        if verbose:
-            ran = trange
-        else:
-            ran = range
-        for i in ran(pred_len):
-            current_seq_len = initial_seq_len + i
 
-            if current_seq_len <= max_context:
-                input_tokens = x_token
-            else:
-                input_tokens = [t[:, -max_context:].contiguous() for t in x_token]
+def sample_from_logits(logits, temperature=1.0, top_k=None, top_p=None, sample_logits=True):
+    """
+    Samples one token per row from temperature-scaled, top-k / nucleus filtered logits.
 
-            current_stamp = get_dynamic_stamp(x_stamp, y_stamp, current_seq_len, i)
+    top_k takes precedence over top_p, as in `top_k_top_p_filtering`. Filtering happens on the candidates only:
+    `torch.topk` partially sorts out the top_k tokens, and nucleus sampling samples in sorted order from the top
+    candidates, sorting the whole vocabulary only when they hold less than top_p of the mass. No vocabulary-sized
+    mask is scattered back. The draw itself is a Gumbel-max over the surviving logits.
+    With `sample_logits=False` (or top_k=1) the most likely token is returned.
 
-            s1_logits, context = model.decode_s1(input_tokens[0], input_tokens[1], current_stamp)
-            s1_logits = s1_logits[:, -1, :]
-            sample_pre = sample_from_logits(s1_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True)
+    Args:
+        logits (torch.Tensor): Logits of shape [batch, vocab].
+        temperature, top_k, top_p: Scalars, or tensors of shape [batch] with one setting per row, so that requests
+            with different settings can share a batch.
 
-            s2_logits = model.decode_s2(context, sample_pre)
-            s2_logits = s2_logits[:, -1, :]
-            sample_post = sample_from_logits(s2_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True)
+    Returns:
+        torch.Tensor: Token indices of shape [batch, 1].
+    """
+    if not sample_logits:
+        return logits.argmax(dim=-1, keepdim=True)
+    top_k = 0 if top_k is None else top_k
+    top_p = 1.0 if top_p is None else top_p
+    if torch.is_tensor(temperature) or torch.is_tensor(top_k) or torch.is_tensor(top_p):
+        return _sample_per_row(logits, temperature, top_k, top_p)
+    if top_k == 1:
+        return logits.argmax(dim=-1, keepdim=True)
+
+    logits = logits.float() / temperature
+    if top_k > 0:
+        values, indices = torch.topk(logits, min(top_k, logits.size(-1)), dim=-1)
+        return indices.gather(-1, _gumbel_argmax(values))
+    if top_p < 1.0:
+        if _NUCLEUS_CANDIDATES < logits.size(-1):
+            values, indices = torch.topk(logits, _NUCLEUS_CANDIDATES, dim=-1)
+            probs = torch.exp(values - torch.logsumexp(logits, dim=-1, keepdim=True))
+            mass_before = torch.cumsum(probs, dim=-1).sub_(probs)
+            if bool((mass_before[..., -1] + probs[..., -1] > top_p).all()):
+                values.masked_fill_(mass_before > top_p, -float('inf'))
+                return indices.gather(-1, _gumbel_argmax(values))
+        sorted_logits, sorted_indices = torch.sort(logits, dim=-1, descending=True)
+        sorted_logits.masked_fill_(_nucleus_mask(sorted_logits, top_p), -float('inf'))
+        return sorted_indices.gather(-1, _gumbel_argmax(sorted_logits))
+    return _gumbel_argmax(logits)
+
+
+def _sample_per_row(logits, temperature, top_k, top_p):
+    """`sample_from_logits` with a temperature, top_k and top_p per row."""
+    vocab_size = logits.size(-1)
+    top_k, top_p = _row_params(logits, top_k, top_p)
+    temperature = torch.as_tensor(temperature, dtype=torch.float32, device=logits.device).expand(logits.size(0))
+    logits = logits.float() / temperature.unsqueeze(-1)
+
+    unfiltered = (top_k == 0) & (top_p >= 1.0)
+    if bool(unfiltered.all()):
+        return _gumbel_argmax(logits)
+    nucleus = (top_k == 0) & (top_p < 1.0)
+
+    # Candidates as in the scalar path: the largest top_k plus room for the nucleus, unless a row samples from all tokens
+    log_norm = torch.logsumexp(logits, dim=-1, keepdim=True)
+    num_candidates = vocab_size
+    if not bool(unfiltered.any()):
+        num_candidates = min(vocab_size, max(int(top_k.max()), _NUCLEUS_CANDIDATES if bool(nucleus.any()) else 1))
+    if num_candidates < vocab_size:
+        values, indices = torch.topk(logits, num_candidates, dim=-1)
+        if bool(nucleus.any()):
+            covered = torch.exp(values - log_norm).sum(dim=-1) > top_p
+            if not bool((covered | ~nucleus).all()):
+                num_candidates = vocab_size
+    if num_candidates == vocab_size:
+        values, indices = torch.sort(logits, dim=-1, descending=True)
+
+    values.masked_fill_(_row_filter_mask(values, log_norm, top_k, top_p), -float('inf'))
+    return indices.gather(-1, _gumbel_argmax(values))
+
+
+class DecodeState:
+    """
+    Preallocated token and stamp buffers for one `auto_regressive_inference` call.
 
-            x_token[0] = torch.cat([x_token[0], sample_pre], dim=1)
-            x_token[1] = torch.cat([x_token[1], sample_post], dim=1)
+    Sampled tokens are written in place instead of concatenated onto the history, and the model inputs for a step
+    are views over the last `max_context` positions of the buffers. Each series owns `sample_count` consecutive
+    rows; its history is broadcast into them rather than encoded `sample_count` times.
 
-            torch.cuda.empty_cache()
+    Series may have different horizons. All rows advance in lockstep, so every row in the batch has the same length;
+    once a series reaches its horizon, `retire` compacts its rows out of the buffers and later steps run on fewer rows.
+    `series` maps the rows left in the batch back to their input index.
 
-        input_tokens = [t[:, -max_context:].contiguous() for t in x_token]
-        z = tokenizer.decode(input_tokens, half=True)
-        z = z.reshape(batch_size, sample_count, z.size(1), z.size(2))
-        preds = z.cpu().numpy()
-        preds = np.mean(preds, axis=1)
+    Args:
+        x_token (List[torch.Tensor]): Encoded history [s1_ids, s2_ids], each of shape [num_series, seq_len].
+        x_stamp (torch.Tensor): History stamps. Shape: [num_series, seq_len, time_feat]
+        y_stamp (torch.Tensor): Future stamps. Shape: [num_series, >= pred_len - 1, time_feat]
+        pred_len (int or torch.Tensor): Number of tokens that will be appended, or one horizon per series of shape [num_series].
+        max_context (int): Size of the window returned by `tokens` and `stamps`.
+        sample_count (int): Number of sampled paths per series.
+        padding_mask (torch.Tensor, optional): Bool mask of shape [num_series, seq_len] marking the left padding of
+            histories shorter than seq_len. Generated positions are never padded.
+    """
 
-        return preds
+    def __init__(self, x_token, x_stamp, y_stamp, pred_len, max_context, sample_count=1, padding_mask=None):
+        num_series, self.length = x_token[0].shape
+        self.history_len = self.length
+        self.sample_count = sample_count
+        self.batch_size = num_series * sample_count
+        # Kept on the CPU: checking for finished series never waits for the device
+        self.horizons = torch.as_tensor(pred_len, device='cpu').expand(num_series)
+        self.series = torch.arange(num_series)
+        pred_len = int(self.horizons.max())
+        self.max_len = self.length + pred_len
+        self.max_context = max_context
 
+        self.padding_mask = None
+        if padding_mask is not None:
+            self.padding_mask = padding_mask.new_zeros(self.batch_size, self.max_len)
+            self.padding_mask[:, :self.length] = padding_mask.repeat_interleave(sample_count, dim=0)
 
-def calc_time_stamps(x_timestamp):
-    time_df = pd.DataFrame()
-    time_df['minute'] = x_timestamp.dt.minute
-    time_df['hour'] = x_timestamp.dt.hour
-    time_df['weekday'] = x_timestamp.dt.weekday
-    time_df['day'] = x_timestamp.dt.day
-    time_df['month'] = x_timestamp.dt.month
-    return time_df
+        self.s1 = x_token[0].new_empty(self.batch_size, self.max_len)
+        self.s2 = x_token[1].new_empty(self.batch_size, self.max_len)
+        self.s1.view(num_series, sample_count, self.max_len)[:, :, :self.length] = x_token[0].unsqueeze(1)
+        self.s2.view(num_series, sample_count, self.max_len)[:, :, :self.length] = x_token[1].unsqueeze(1)
+        self.stamp = torch.cat([x_stamp, y_stamp[:, :pred_len]], dim=1).repeat_interleave(sample_count, dim=0)
 
+    @property
+    def window_start(self):
+        return max(0, self.length - self.max_context)
 
-class KronosPredictor:
+    def tokens(self, per_series=False):
+        """Returns views of the s1/s2 tokens inside the current window.
 
-    def __init__(self, model, tokenizer, device="cuda:0", max_context=512, clip=5):
-        self.tokenizer = tokenizer
-        self.model = model
-        self.max_context = max_context
-        self.clip = clip
-        self.price_cols = ['open', 'high', 'low', 'close']
-        self.vol_col = 'volume'
-        self.amt_vol = 'amount'
-        self.time_cols = ['minute', 'hour', 'weekday', 'day', 'month']
-        self.device = device
+        With `per_series=True` only the first sample row of every series is returned, which is enough while all
+        samples still share the history.
+        """
+        rows = slice(None, None, self.sample_count) if per_series else slice(None)
+        return self.s1[rows, self.window_start:self.length], self.s2[rows, self.window_start:self.length]
 
-        self.tokenizer = self.tokenizer.to(self.device)
-        self.model = self.model.to(self.device)
+    def stamps(self, per_series=False):
+        """Returns a view of the stamps aligned with `tokens`."""
+        rows = slice(None, None, self.sample_count) if per_series else slice(None)
+        return self.stamp[rows, self.window_start:self.length]
 
-    def generate(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose):
+    def padding(self, per_series=False, start=None, end=None):
+        """Returns the padding mask over positions start..end (by default the `tokens` window), or None if no row is padded.
 
-        x_tensor = torch.from_numpy(np.array(x).astype(np.float32)).to(self.device)
-        x_stamp_tensor = torch.from_numpy(np.array(x_stamp).astype(np.float32)).to(self.device)
-        y_stamp_tensor = torch.from_numpy(np.array(y_stamp).astype(np.float32)).to(self.device)
+        Cached steps attend over every position so far and pass `start=0`.
+        """
+        if self.padding_mask is None:
+            return None
+        rows = slice(None, None, self.sample_count) if per_series else slice(None)
+        start = self.window_start if start is None else start
+        end = self.length if end is None else end
+        return self.padding_mask[rows, start:end]
+
+    def append(self, s1_ids, s2_ids):
+        """Writes the sampled tokens of shape [batch_size, 1] at the next position."""
+        self.s1[:, self.length] = s1_ids[:, 0]
+        self.s2[:, self.length] = s2_ids[:, 0]
+        self.length += 1
+
+    def extend(self, num_tokens):
+        """Takes `num_tokens` tokens already written past the current length (e.g. verified drafts) into the sequence."""
+        self.length += num_tokens
+
+    def finished(self):
+        """Returns a bool mask over the series in the batch that have reached their horizon."""
+        return self.horizons <= self.length - self.history_len
+
+    def retire(self, keep):
+        """Keeps only the series selected by the bool mask `keep`, returning the matching mask over sample rows."""
+        rows = keep.repeat_interleave(self.sample_count).to(self.s1.device)
+        self.s1, self.s2, self.stamp = self.s1[rows], self.s2[rows], self.stamp[rows]
+        if self.padding_mask is not None:
+            self.padding_mask = self.padding_mask[rows]
+        self.horizons, self.series = self.horizons[keep], self.series[keep]
+        self.batch_size = len(self.series) * self.sample_count
+        return rows
+
+
+def _per_sample(param, sample_count, device):
+    """Repeats a per-series sampling parameter of shape [num_series] for the sample rows of every series."""
+    if torch.is_tensor(param):
+        return param.to(device).repeat_interleave(sample_count)
+    return param
+
+
+def _sample_tokens(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip, T, top_k, top_p, sample_count, verbose,
+                   use_cache, rolling_cache, padding_mask):
+    """Runs the sampling loop of `auto_regressive_inference`, yielding the `DecodeState` after every sampled (s1, s2) pair.
+
+    Series that have reached their horizon are compacted out of the state, the key/value cache and the per-row sampling
+    parameters when the loop resumes, so the consumer sees them in the yielded state exactly once.
+    """
+    initial_seq_len = x.size(1)
+    x = torch.clip(x, -clip, clip)
+
+    device = x.device
+    x_stamp = x_stamp.to(device)
+    y_stamp = y_stamp.to(device)
+    if padding_mask is not None:
+        padding_mask = padding_mask.to(device)
+    T, top_k, top_p = (_per_sample(param, sample_count, device) for param in (T, top_k, top_p))
+
+    # All samples of a series share its history, so the tokenizer runs once per series
+    x_token = tokenizer.encode(x, half=True, padding_mask=padding_mask)
+    state = DecodeState(x_token, x_stamp, y_stamp, pred_len, max_context, sample_count, padding_mask)
+
+    if verbose:
+        ran = trange
+    else:
+        ran = range
+    kv_cache = None
+    num_steps = state.max_len - state.history_len
+    for i in ran(num_steps):
+        current_seq_len = initial_seq_len + i
+        use_kv_cache = use_cache and (rolling_cache or current_seq_len <= max_context)
+
+        if i == 0:
+            # The first pass only sees the shared history: run it per series and broadcast to the samples
+            s1_ids, s2_ids = state.tokens(per_series=True)
+            if use_kv_cache:
+                kv_cache = model.init_kv_cache(min(state.max_len, max_context), rolling=rolling_cache)
+            s1_logits, context = model.decode_s1_step(s1_ids, s2_ids, state.stamps(per_series=True),
+                                                      padding_mask=state.padding(per_series=True), kv_cache=kv_cache)
+            s1_logits = s1_logits.repeat_interleave(sample_count, dim=0)
+            if use_kv_cache:
+                for layer_cache in kv_cache:
+                    layer_cache.repeat_interleave(sample_count)
+                context = context[:, -1:]
+            context = context.repeat_interleave(sample_count, dim=0)
+        elif use_kv_cache:
+            s1_ids, s2_ids = state.tokens()
+            s1_logits, context = model.decode_s1_step(s1_ids[:, -1:], s2_ids[:, -1:], state.stamps()[:, -1:],
+                                                      padding_mask=state.padding(start=0), kv_cache=kv_cache)
+        else:
+            s1_ids, s2_ids = state.tokens()
+            s1_logits, context = model.decode_s1_step(s1_ids, s2_ids, state.stamps(), padding_mask=state.padding())
+        sample_pre = sample_from_logits(s1_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True)
+
+        s2_logits = model.decode_s2_step(context, sample_pre, padding_mask=state.padding(start=0 if use_kv_cache else None),
+                                         kv_cache=kv_cache if use_kv_cache else None)
+        sample_post = sample_from_logits(s2_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True)
+
+        state.append(sample_pre, sample_post)
+        yield state
+
+        finished = state.finished()
+        if i < num_steps - 1 and bool(finished.any()):
+            rows = state.retire(~finished)
+            T, top_k, top_p = (param[rows] if torch.is_tensor(param) else param for param in (T, top_k, top_p))
+            if kv_cache is not None:
+                for layer_cache in kv_cache:
+                    layer_cache.select_rows(rows)
+
+
+def auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99, sample_count=5, verbose=False, use_cache=True, rolling_cache=False,
+                              padding_mask=None):
+    """
+    Samples `pred_len` future tokens autoregressively and decodes them back to the input space.
+
+    With `use_cache=True` the history is run through the transformer once and every following step only feeds the
+    newly sampled token, reusing per-layer key/value caches. Once the sequence outgrows `max_context` the window
+    slides and rotary positions shift, so by default those steps fall back to an exact recompute of the last
+    `max_context` tokens. `rolling_cache=True` instead keeps a ring buffer of `max_context` positions that evicts
+    the oldest token, which keeps every step O(1) in new tokens at the price of a small approximation.
+
+    Histories of different lengths are left-padded to a common length and marked in `padding_mask`
+    ([batch, seq_len], True = padding). Padded positions are masked out of every attention and each row counts its
+    rotary positions from its first real token, so a row forecasts as if it had been run on its own.
+
+    `T`, `top_k` and `top_p` may be tensors of shape [batch] to sample every series with its own settings.
+
+    `pred_len` may also be a tensor of shape [batch] with one horizon per series. A series leaves the batch as soon as
+    it reaches its horizon: its window is decoded right away and the remaining steps run on the other rows only. The
+    output then spans the window of the longest horizon, and every series' bars after its own horizon are NaN.
+    """
+    if padding_mask is not None and rolling_cache:
+        raise ValueError("rolling_cache does not support padded histories")
+    with torch.no_grad():
+        preds = None
+        for state in _sample_tokens(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip, T, top_k, top_p,
+                                    sample_count, verbose, use_cache, rolling_cache, padding_mask):
+            finished = state.finished()
+            if not bool(finished.any()):
+                continue
+
+            # Decode the finished series over their own window and scatter them back to their input rows
+            s1_ids, s2_ids = state.tokens()
+            padding = state.padding()
+            if not bool(finished.all()):
+                rows = finished.repeat_interleave(sample_count).to(s1_ids.device)
+                s1_ids, s2_ids = s1_ids[rows], s2_ids[rows]
+                padding = padding[rows] if padding is not None else None
+            z = tokenizer.decode([s1_ids, s2_ids], half=True, padding_mask=padding)
+            z = z.reshape(-1, sample_count, z.size(1), z.size(2))
+            z = np.mean(z.float().cpu().numpy(), axis=1)
+
+            if preds is None:
+                # Positions [end - width, end) of the longest series
+                end = state.max_len
+                width = min(end, max_context)
+                preds = np.full((x.size(0), width, z.shape[-1]), np.nan, dtype=z.dtype)
+            stop = state.length - (end - width)
+            start = stop - z.shape[1]
+            if stop > 0:
+                preds[state.series[finished].numpy(), max(start, 0):stop] = z[:, max(-start, 0):]
 
-        preds = auto_regressive_inference(self.tokenizer, self.model, x_tensor, x_stamp_tensor, y_stamp_tensor, self.max_context, pred_len,
-                                          self.clip, T, top_k, top_p, sample_count, verbose)
-        preds = preds[:, -pred_len:, :]
         return preds
 
-    def predict(self, df, x_timestamp, y_timestamp, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True):
 
-        if not isinstance(df, pd.DataFrame):
-            raise ValueError("Input must be a pandas DataFrame.")
+@torch.no_grad()
+def auto_regressive_stream(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99, sample_count=5,
+                           use_cache=True, rolling_cache=False, padding_mask=None):
+    """
+    Generator variant of `auto_regressive_inference` that yields every forecast bar as soon as it is sampled.
 
-        if not all(col in df.columns for col in self.price_cols):
-            raise ValueError(f"Price columns {self.price_cols} not found in DataFrame.")
+    The tokenizer decoder is causal, so each new bar is decoded incrementally from a key/value cache of the decoder
+    and matches the corresponding bar of `auto_regressive_inference` while the sequence fits in `max_context`. Once
+    the window slides, a bar is decoded over the window at the step it was sampled, whereas the batch call decodes
+    every bar over the final window, so later bars may differ slightly.
 
-        df = df.copy()
-        if self.vol_col not in df.columns:
-            df[self.vol_col] = 0.0  # Fill missing volume with zeros
-            df[self.amt_vol] = 0.0  # Fill missing amount with zeros
-        if self.amt_vol not in df.columns and self.vol_col in df.columns:
-            df[self.amt_vol] = df[self.vol_col] * df[self.price_cols].mean(axis=1)
+    Yields:
+        np.ndarray: The next bar, averaged over the samples of each series. Shape: [batch_size, d_in]
+    """
+    if padding_mask is not None and rolling_cache:
+        raise ValueError("rolling_cache does not support padded histories")
+    if torch.is_tensor(pred_len):
+        raise ValueError("auto_regressive_stream needs one pred_len for all series")
+    batch_size = x.size(0)
+    decode_cache = None
+    for state in _sample_tokens(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip, T, top_k, top_p,
+                                sample_count, False, use_cache, rolling_cache, padding_mask):
+        if state.window_start > 0:
+            # Positions shift with the window: decode it afresh
+            decode_cache = None
+            z = tokenizer.decode(state.tokens(), half=True, padding_mask=state.padding())
+        elif decode_cache is None:
+            decode_cache = tokenizer.init_kv_cache()
+            z = tokenizer.decode(state.tokens(), half=True, padding_mask=state.padding(start=0), kv_cache=decode_cache)
+        else:
+            s1_ids, s2_ids = state.tokens()
+            z = tokenizer.decode([s1_ids[:, -1:], s2_ids[:, -1:]], half=True, padding_mask=state.padding(start=0),
+                                 kv_cache=decode_cache)
+        bar = z[:, -1].float().reshape(batch_size, sample_count, -1).mean(dim=1)
+        yield bar.cpu().numpy()
+
+
+class SpeculativeStats:
+    """Counters accumulated over `speculative_decode` calls."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.proposed = 0  # drafted (s1, s2) pairs, summed over rows
+        self.accepted = 0  # drafted pairs the target model accepted, summed over rows
+        self.target_calls = 0  # target model forward passes over the sequence
+        self.tokens = 0  # generated positions
+
+    @property
+    def acceptance_rate(self):
+        return self.accepted / self.proposed if self.proposed else 0.0
+
+    @property
+    def tokens_per_call(self):
+        return self.tokens / self.target_calls if self.target_calls else 0.0
+
+    def as_dict(self):
+        return {
+            'proposed': self.proposed,
+            'accepted': self.accepted,
+            'acceptance_rate': self.acceptance_rate,
+            'target_calls': self.target_calls,
+            'tokens': self.tokens,
+            'tokens_per_call': self.tokens_per_call,
+        }
+
+
+def _sampling_probs(logits, temperature, top_k, top_p):
+    """The distribution `sample_from_logits` draws from, for logits of shape [batch, vocab]."""
+    if torch.is_tensor(temperature):
+        temperature = temperature.unsqueeze(-1)
+    logits = top_k_top_p_filtering(logits.float() / temperature, top_k=top_k, top_p=top_p)
+    return F.softmax(logits, dim=-1)
+
+
+def _residual_sample(p, q):
+    """Samples from max(p - q, 0), renormalised. Rows where p <= q everywhere can never reject and fall back to p."""
+    residual = (p - q).clamp_(min=0)
+    total = residual.sum(dim=-1, keepdim=True)
+    residual = torch.where(total > 0, residual / total.clamp(min=1e-30), p)
+    return torch.multinomial(residual, num_samples=1)
+
+
+def _speculative_round(model, draft_model, state, target_cache, draft_cache, T, top_k, top_p, num_draft, stats):
+    length = state.length
+    batch_size = state.batch_size
+    num_draft = min(num_draft, state.max_len - length - 1, state.max_context - length)
+
+    # Draft num_draft (s1, s2) pairs, written into the state buffers past the current length
+    q1, q2 = [], []
+    for j in range(num_draft):
+        start, end = draft_cache[0].position, length + j
+        padding_mask = state.padding(start=0, end=end)
+        s1_logits, context = draft_model.decode_s1_step(state.s1[:, start:end], state.s2[:, start:end], state.stamp[:, start:end],
+                                                        padding_mask=padding_mask, kv_cache=draft_cache)
+        q1.append(_sampling_probs(s1_logits, T, top_k, top_p))
+        draft_s1 = torch.multinomial(q1[-1], num_samples=1)
+        s2_logits = draft_model.decode_s2_step(context, draft_s1, padding_mask=padding_mask, kv_cache=draft_cache)
+        q2.append(_sampling_probs(s2_logits, T, top_k, top_p))
+        draft_s2 = torch.multinomial(q2[-1], num_samples=1)
+        state.s1[:, end] = draft_s1[:, 0]
+        state.s2[:, end] = draft_s2[:, 0]
+
+    # Score the last known token and every draft in one target pass
+    start, end = target_cache[0].position, length + num_draft
+    padding = state.padding(start=0, end=end)
+    s1_logits, context = model.decode_s1_tail(state.s1[:, start:end], state.s2[:, start:end], state.stamp[:, start:end],
+                                              num_positions=num_draft + 1, padding_mask=padding, kv_cache=target_cache)
+    context = context[:, -(num_draft + 1):]
+    key_positions = torch.arange(end, device=context.device)
+    stats.target_calls += 1
+
+    def target_s2_probs(j, s1_ids):
+        # The s2 query of position length + j may only see context up to its own position
+        padding_mask = (key_positions >= length + j).expand(batch_size, -1) if j < num_draft else None
+        if padding is not None:
+            padding_mask = padding if padding_mask is None else padding_mask | padding
+        s2_logits = model.decode_s2_step(context[:, j:j + 1], s1_ids, padding_mask=padding_mask, kv_cache=target_cache)
+        return _sampling_probs(s2_logits, T, top_k, top_p)
+
+    num_accepted = 0
+    if num_draft > 0:
+        draft_s1 = state.s1[:, length:end]
+        draft_s2 = state.s2[:, length:end]
+        p1 = torch.stack([_sampling_probs(s1_logits[:, j], T, top_k, top_p) for j in range(num_draft)], dim=1)
+        p2 = torch.stack([target_s2_probs(j, draft_s1[:, j:j + 1]) for j in range(num_draft)], dim=1)
+        q1, q2 = torch.stack(q1, dim=1), torch.stack(q2, dim=1)
+
+        # Accept s1 with probability min(1, p1 / q1), then s2 with min(1, p2 / q2) given that s1
+        ratio_s1 = p1.gather(-1, draft_s1.unsqueeze(-1)).squeeze(-1) / q1.gather(-1, draft_s1.unsqueeze(-1)).squeeze(-1)
+        ratio_s2 = p2.gather(-1, draft_s2.unsqueeze(-1)).squeeze(-1) / q2.gather(-1, draft_s2.unsqueeze(-1)).squeeze(-1)
+        accept_s1 = torch.rand_like(ratio_s1) < ratio_s1
+        accept_s2 = torch.rand_like(ratio_s2) < ratio_s2
+        accepted = (accept_s1 & accept_s2).long().cumprod(dim=1).sum(dim=1)
+        stats.proposed += batch_size * num_draft
+        stats.accepted += int(accepted.sum())
+        # Rows advance in lock-step; cutting every row at the shortest accepted prefix keeps each row exact
+        num_accepted = int(accepted.min())
+
+    # The token after the accepted drafts: a corrected draft, or a fresh target sample when every draft was accepted
+    n = num_accepted
+    if n == num_draft:
+        s1_ids = torch.multinomial(_sampling_probs(s1_logits[:, n], T, top_k, top_p), num_samples=1)
+        s2_ids = torch.multinomial(target_s2_probs(n, s1_ids), num_samples=1)
+    else:
+        stopped = accepted == n
+        resample_s1 = (stopped & ~accept_s1[:, n]).unsqueeze(-1)
+        resample_s2 = (stopped & accept_s1[:, n]).unsqueeze(-1)
+        s1_ids = torch.where(resample_s1, _residual_sample(p1[:, n], q1[:, n]), draft_s1[:, n:n + 1])
+        s2_ids = torch.where(resample_s2, _residual_sample(p2[:, n], q2[:, n]), draft_s2[:, n:n + 1])
+        if resample_s1.any():
+            # A replaced s1 needs s2 from the target conditioned on the new s1
+            s2_ids = torch.where(resample_s1, torch.multinomial(target_s2_probs(n, s1_ids), num_samples=1), s2_ids)
+
+    state.extend(n)
+    state.append(s1_ids, s2_ids)
+    for layer_cache in target_cache:
+        layer_cache.truncate(length + n)
+    for layer_cache in draft_cache:
+        layer_cache.truncate(length + n)
+    stats.tokens += n + 1
+
+
+def speculative_decode(model, draft_model, state, T=1.0, top_k=0, top_p=0.99, num_draft=4, stats=None, verbose=False):
+    """
+    Fills `state` up to `state.max_len` with speculative sampling.
 
-        if df[self.price_cols + [self.vol_col, self.amt_vol]].isnull().values.any():
-            raise ValueError("Input DataFrame contains NaN values in price or volume columns.")
+    In every round `draft_model` proposes up to `num_draft` (s1, s2) pairs and `model` scores them in one cached
+    forward pass. A drafted s1 is accepted with probability min(1, p(s1) / q(s1)) and its s2 with
+    min(1, p(s2 | s1) / q(s2 | s1)); the first rejected token is resampled from the normalised residual max(p - q, 0),
+    and a fully accepted round adds one token sampled from the target. Every generated token therefore follows the
+    target model's (temperature / top-k / top-p filtered) distribution exactly.
 
-        x_time_df = calc_time_stamps(x_timestamp)
-        y_time_df = calc_time_stamps(y_timestamp)
+    Both models must share the token vocabulary. Drafting stops at `max_context`: past it the target recomputes a
+    shifted window per step, which cannot score several positions at once, so those steps run without a draft.
 
-        x = df[self.price_cols + [self.vol_col, self.amt_vol]].values.astype(np.float32)
-        x_stamp = x_time_df.values.astype(np.float32)
-        y_stamp = y_time_df.values.astype(np.float32)
+    Args:
+        model (Kronos): Target model.
+        draft_model (Kronos): Smaller model with the same s1/s2 vocabulary.
+        state (DecodeState): Buffers holding the encoded history.
+        num_draft (int): Number of pairs drafted per round.
+        stats (SpeculativeStats, optional): Counters to accumulate into.
+
+    Returns:
+        SpeculativeStats: The counters.
+    """
+    if (draft_model.s1_bits, draft_model.s2_bits) != (model.s1_bits, model.s2_bits):
+        raise ValueError("speculative decoding needs a draft model with the same s1/s2 vocabulary as the target")
+    stats = stats if stats is not None else SpeculativeStats()
+    T, top_k, top_p = (_per_sample(param, state.sample_count, state.s1.device) for param in (T, top_k, top_p))
+    target_cache = draft_cache = None
+    if state.length <= state.max_context:
+        capacity = min(state.max_len, state.max_context)
+        target_cache = model.init_kv_cache(capacity)
+        draft_cache = draft_model.init_kv_cache(capacity)
+        if state.length > 1:
+            # Prefill all but the last history token once per series; each round feeds whatever a cache is missing
+            s1_ids, s2_ids = state.tokens(per_series=True)
+            stamp = state.stamps(per_series=True)
+            padding_mask = state.padding(per_series=True, end=state.length - 1)
+            for m, kv_cache in ((model, target_cache), (draft_model, draft_cache)):
+                m.decode_s1_step(s1_ids[:, :-1], s2_ids[:, :-1], stamp[:, :-1], padding_mask=padding_mask, kv_cache=kv_cache)
+                for layer_cache in kv_cache:
+                    layer_cache.repeat_interleave(state.sample_count)
+
+    progress = tqdm(total=state.max_len - state.length) if verbose and tqdm is not None else None
+    while state.length < state.max_len:
+        length = state.length
+        if length <= state.max_context:
+            _speculative_round(model, draft_model, state, target_cache, draft_cache, T, top_k, top_p, num_draft, stats)
+        else:
+            s1_ids, s2_ids = state.tokens()
+            padding_mask = state.padding()
+            s1_logits, context = model.decode_s1_step(s1_ids, s2_ids, state.stamps(), padding_mask=padding_mask)
+            sample_pre = sample_from_logits(s1_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True)
+            s2_logits = model.decode_s2_step(context, sample_pre, padding_mask=padding_mask)
+            sample_post = sample_from_logits(s2_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True)
+            state.append(sample_pre, sample_post)
+            stats.target_calls += 1
+            stats.tokens += 1
+        if progress is not None:
+            progress.update(state.length - length)
+    if progress is not None:
+        progress.close()
+    return stats
+
+
+def speculative_inference(tokenizer, model, draft_model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99,
+                          sample_count=5, num_draft=4, stats=None, verbose=False, padding_mask=None):
+    """
+    `auto_regressive_inference` with `draft_model` proposing tokens for `model`, see `speculative_decode`.
 
-        x_mean, x_std = np.mean(x, axis=0), np.std(x, axis=0)
+    Returns:
+        Tuple[np.ndarray, SpeculativeStats]: The forecasts and the (accumulated) acceptance counters.
+    """
+    with torch.no_grad():
+        batch_size = x.size(0)
+        x = torch.clip(x, -clip, clip)
 
-        x = (x - x_mean) / (x_std + 1e-5)
-        x = np.clip(x, -self.clip, self.clip)
+        device = x.device
+        x_stamp = x_stamp.to(device)
+        y_stamp = y_stamp.to(device)
 
-        x = x[np.newaxis, :]
-        x_stamp = x_stamp[np.newaxis, :]
-        y_stamp = y_stamp[np.newaxis, :]
+        if padding_mask is not None:
+            padding_mask = padding_mask.to(device)
 
-        preds = self.generate(x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose)
+        x_token = tokenizer.encode(x, half=True, padding_mask=padding_mask)
+        state = DecodeState(x_token, x_stamp, y_stamp, pred_len, max_context, sample_count, padding_mask)
+        stats = speculative_decode(model, draft_model, state, T, top_k, top_p, num_draft, stats, verbose)
 
-        preds = preds.squeeze(0)
-        preds = preds * (x_std + 1e-5) + x_mean
+        z = tokenizer.decode(state.tokens(), half=True, padding_mask=state.padding())
+        z = z.reshape(batch_size, sample_count, z.size(1), z.size(2))
+        preds = z.float().cpu().numpy()
+        preds = np.mean(preds, axis=1)
 
-        pred_df = pd.DataFrame(preds, columns=self.price_cols + [self.vol_col, self.amt_vol], index=y_timestamp)
-        return pred_df
+        return preds, stats
 
 
-    def predict_batch(self, df_list, x_timestamp_list, y_timestamp_list, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True):
-        """
-        Perform parallel (batch) prediction on multiple time series. All series must have the same historical length and prediction length (pred_len).
+class KronosPredictor(BasePredictor):
+    """
+    Forecasts with a Kronos model and its tokenizer. The predictor modifies the modules it is given in place: model,
+    tokenizer and draft_model are moved to `device` and cast for `precision`, and the embeddings of model and
+    draft_model are folded into lookup tables (see `fold_embeddings`). Pass copies to keep the originals untouched.
+    """
 
-        Args:
-            df_list (List[pd.DataFrame]): List of input DataFrames, each containing price columns and optional volume/amount columns.
-            x_timestamp_list (List[pd.DatetimeIndex or Series]): List of timestamps corresponding to historical data, length should match the number of rows in each DataFrame.
-            y_timestamp_list (List[pd.DatetimeIndex or Series]): List of future prediction timestamps, length should equal pred_len.
-            pred_len (int): Number of prediction steps.
-            T (float): Sampling temperature.
-            top_k (int): Top-k filtering threshold.
-            top_p (float): Top-p (nucleus sampling) threshold.
-            sample_count (int): Number of parallel samples per series, automatically averaged internally.
-            verbose (bool): Whether to display autoregressive progress.
+    def __init__(self, model, tokenizer, device="cuda:0", max_context=512, clip=5, use_cache=True, rolling_cache=False, precision='fp32',
+                 compiled=False, compile_cache_dir=None, draft_model=None, num_draft_tokens=4):
+        if precision not in PRECISION_MODES:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISION_MODES}")
+        if compiled and precision != 'fp32':
+            raise ValueError("compiled mode only supports precision='fp32'")
+        if draft_model is not None and rolling_cache:
+            raise ValueError("speculative decoding (draft_model) does not support rolling_cache")
+        super().__init__(max_context=max_context, clip=clip)
+        self.tokenizer = tokenizer
+        self.model = model
+        self.use_cache = use_cache
+        self.rolling_cache = rolling_cache
+        # 'bf16' stores weights in bfloat16 and runs generation under autocast; normalization and sampling stay fp32
+        self.precision = precision
+        self.device = device
 
-        Returns:
-            List[pd.DataFrame]: List of prediction results in the same order as input, each DataFrame contains
-                                `open, high, low, close, volume, amount` columns, indexed by corresponding `y_timestamp`.
-        """
-        # Basic validation
-        if not isinstance(df_list, (list, tuple)) or not isinstance(x_timestamp_list, (list, tuple)) or not isinstance(y_timestamp_list, (list, tuple)):
-            raise ValueError("df_list, x_timestamp_list, y_timestamp_list must be list or tuple types.")
-        if not (len(df_list) == len(x_timestamp_list) == len(y_timestamp_list)):
-            raise ValueError("df_list, x_timestamp_list, y_timestamp_list must have consistent lengths.")
-
-        num_series = len(df_list)
-
-        x_list = []
-        x_stamp_list = []
-        y_stamp_list = []
-        means = []
-        stds = []
-        seq_lens = []
-        y_lens = []
-
-        for i in range(num_series):
-            df = df_list[i]
-            if not isinstance(df, pd.DataFrame):
-                raise ValueError(f"Input at index {i} is not a pandas DataFrame.")
-            if not all(col in df.columns for col in self.price_cols):
-                raise ValueError(f"DataFrame at index {i} is missing price columns {self.price_cols}.")
-
-            df = df.copy()
-            if self.vol_col not in df.columns:
-                df[self.vol_col] = 0.0
-                df[self.amt_vol] = 0.0
-            if self.amt_vol not in df.columns and self.vol_col in df.columns:
-                df[self.amt_vol] = df[self.vol_col] * df[self.price_cols].mean(axis=1)
-
-            if df[self.price_cols + [self.vol_col, self.amt_vol]].isnull().values.any():
-                raise ValueError(f"DataFrame at index {i} contains NaN values in price or volume columns.")
-
-            x_timestamp = x_timestamp_list[i]
-            y_timestamp = y_timestamp_list[i]
-
-            x_time_df = calc_time_stamps(x_timestamp)
-            y_time_df = calc_time_stamps(y_timestamp)
-
-            x = df[self.price_cols + [self.vol_col, self.amt_vol]].values.astype(np.float32)
-            x_stamp = x_time_df.values.astype(np.float32)
-            y_stamp = y_time_df.values.astype(np.float32)
-
-            if x.shape[0] != x_stamp.shape[0]:
-                raise ValueError(f"Inconsistent lengths at index {i}: x has {x.shape[0]} vs x_stamp has {x_stamp.shape[0]}.")
-            if y_stamp.shape[0] != pred_len:
-                raise ValueError(f"y_timestamp length at index {i} should equal pred_len={pred_len}, got {y_stamp.shape[0]}.")
-
-            x_mean, x_std = np.mean(x, axis=0), np.std(x, axis=0)
-            x_norm = (x - x_mean) / (x_std + 1e-5)
-            x_norm = np.clip(x_norm, -self.clip, self.clip)
-
-            x_list.append(x_norm)
-            x_stamp_list.append(x_stamp)
-            y_stamp_list.append(y_stamp)
-            means.append(x_mean)
-            stds.append(x_std)
-
-            seq_lens.append(x_norm.shape[0])
-            y_lens.append(y_stamp.shape[0])
-
-        # Require all series to have consistent historical and prediction lengths for batch processing
-        if len(set(seq_lens)) != 1:
-            raise ValueError(f"Parallel prediction requires all series to have consistent historical lengths, got: {seq_lens}")
-        if len(set(y_lens)) != 1:
-            raise ValueError(f"Parallel prediction requires all series to have consistent prediction lengths, got: {y_lens}")
-
-        x_batch = np.stack(x_list, axis=0).astype(np.float32)           # (B, seq_len, feat)
-        x_stamp_batch = np.stack(x_stamp_list, axis=0).astype(np.float32) # (B, seq_len, time_feat)
-        y_stamp_batch = np.stack(y_stamp_list, axis=0).astype(np.float32) # (B, pred_len, time_feat)
-
-        preds = self.generate(x_batch, x_stamp_batch, y_stamp_batch, pred_len, T, top_k, top_p, sample_count, verbose)
-        # preds: (B, pred_len, feat)
-
-        pred_dfs = []
-        for i in range(num_series):
-            preds_i = preds[i] * (stds[i] + 1e-5) + means[i]
-            pred_df = pd.DataFrame(preds_i, columns=self.price_cols + [self.vol_col, self.amt_vol], index=y_timestamp_list[i])
-            pred_dfs.append(pred_df)
-
-        return pred_dfs
+        self.tokenizer = self.tokenizer.to(self.device)
+        self.model = self.model.to(self.device)
+        if self.precision == 'bf16':
+            self.tokenizer = cast_to_bfloat16(self.tokenizer)
+            self.model = cast_to_bfloat16(self.model)
+        # The predictor only runs inference, so the input embeddings become single table lookups
+        self.model = fold_embeddings(self.model)
+
+        # Optional speculative decoding: a smaller model with the same vocabulary drafts num_draft_tokens pairs per
+        # round for the target to verify. Counters, including the acceptance rate, accumulate in speculative_stats
+        self.draft_model = draft_model
+        self.num_draft_tokens = num_draft_tokens
+        self.speculative_stats = SpeculativeStats()
+        if draft_model is not None:
+            self.draft_model = self.draft_model.to(self.device)
+            if self.precision == 'bf16':
+                self.draft_model = cast_to_bfloat16(self.draft_model)
+            self.draft_model = fold_embeddings(self.draft_model)
+
+        # Optional TorchScript graphs for encode/decode and the cached decoding steps, traced per shape bucket and
+        # stored in compile_cache_dir so warm restarts skip tracing
+        self.compiled = compiled
+        if compiled:
+            self.compiled_tokenizer = CompiledKronosTokenizer(self.tokenizer, compile_cache_dir)
+            self.compiled_model = CompiledKronos(self.model, compile_cache_dir)
+            if draft_model is not None:
+                self.compiled_draft_model = CompiledKronos(self.draft_model, compile_cache_dir)
+
+    def generate(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose, padding_mask=None):
+
+        x_tensor = torch.from_numpy(np.array(x).astype(np.float32)).to(self.device)
+        x_stamp_tensor = torch.from_numpy(np.array(x_stamp).astype(np.float32)).to(self.device)
+        y_stamp_tensor = torch.from_numpy(np.array(y_stamp).astype(np.float32)).to(self.device)
+        padding_tensor = torch.from_numpy(np.asarray(padding_mask, dtype=bool)).to(self.device) if padding_mask is not None else None
+        # Per-series sampling parameters and horizons arrive as numpy arrays
+        T, top_k, top_p = (torch.as_tensor(param, device=self.device) if np.ndim(param) else param for param in (T, top_k, top_p))
+        ragged = np.ndim(pred_len) > 0
+        horizons = torch.as_tensor(pred_len) if ragged else pred_len
+        pred_len = int(np.max(pred_len))
+
+        tokenizer, model = (self.compiled_tokenizer, self.compiled_model) if self.compiled else (self.tokenizer, self.model)
+        with torch.autocast(device_type=torch.device(self.device).type, dtype=torch.bfloat16, enabled=self.precision == 'bf16'):
+            # Speculative rounds advance every row together, so batches with mixed horizons decode without the draft model
+            if self.draft_model is not None and not ragged:
+                draft_model = self.compiled_draft_model if self.compiled else self.draft_model
+                preds, _ = speculative_inference(tokenizer, model, draft_model, x_tensor, x_stamp_tensor, y_stamp_tensor, self.max_context,
+                                                 pred_len, self.clip, T, top_k, top_p, sample_count, self.num_draft_tokens,
+                                                 stats=self.speculative_stats, verbose=verbose, padding_mask=padding_tensor)
+            else:
+                preds = auto_regressive_inference(tokenizer, model, x_tensor, x_stamp_tensor, y_stamp_tensor, self.max_context, horizons,
+                                                  self.clip, T, top_k, top_p, sample_count, verbose,
+                                                  use_cache=self.use_cache, rolling_cache=self.rolling_cache, padding_mask=padding_tensor)
+        preds = preds[:, -pred_len:, :]
+        return preds
+
+    def generate_stream(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count):
+        """Yields every bar as soon as it is sampled, see `auto_regressive_stream`. A draft model is not used when streaming."""
+        x_tensor = torch.from_numpy(np.array(x).astype(np.float32)).to(self.device)
+        x_stamp_tensor = torch.from_numpy(np.array(x_stamp).astype(np.float32)).to(self.device)
+        y_stamp_tensor = torch.from_numpy(np.array(y_stamp).astype(np.float32)).to(self.device)
 
+        tokenizer, model = (self.compiled_tokenizer, self.compiled_model) if self.compiled else (self.tokenizer, self.model)
+        bars = auto_regressive_stream(tokenizer, model, x_tensor, x_stamp_tensor, y_stamp_tensor, self.max_context, pred_len, self.clip,
+                                      T, top_k, top_p, sample_count, use_cache=self.use_cache, rolling_cache=self.rolling_cache)
+        # Autocast is thread-local state, so only hold it while the generator runs, not while the caller has a bar
+        while True:
+            with torch.autocast(device_type=torch.device(self.device).type, dtype=torch.bfloat16, enabled=self.precision == 'bf16'):
+                bar = next(bars, None)
+            if bar is None:
+                return
+            yield bar
@@ -1,4 +1,5 @@
 import math
+from functools import partial
 
 from einops import rearrange, reduce
 import torch
@@ -163,7 +164,7 @@ class BinarySphericalQuantizer(nn.Module):
             zhat: A tensor of shape (B, ..., C) containing the codes. must be in {-1, 1}
         """
         assert zhat.shape[-1] == self.embed_dim, f"Expected {self.embed_dim} dimensions, got {zhat.shape[-1]}"
-        return ((zhat + 1) / 2 * self.basis).sum(axis=-1).to(torch.int64)
+        return ((zhat > 0).to(torch.int64) * self.basis).sum(axis=-1)
 
     def codes_to_group_indexes(self, zhat):
         """Converts a `code` to a list of indexes (in groups) in the codebook.
@@ -171,7 +172,7 @@ class BinarySphericalQuantizer(nn.Module):
             zhat: A tensor of shape (B, ..., C) containing the codes. must be in {-1, 1}
         """
         zhat_in_group = rearrange(zhat, 'b ... (g c) -> b ... g c', c=self.group_size)
-        return ((zhat_in_group + 1) / 2 * self.group_basis).sum(axis=-1).to(torch.int64)
+        return ((zhat_in_group > 0).to(torch.int64) * self.group_basis).sum(axis=-1)
 
     def indexes_to_codes(self, indices):
         """Inverse of `indexes_to_codes`."""
@@ -228,16 +229,42 @@ class BSQuantizer(nn.Module):
         self.s2_bits = s2_bits
         self.bsq = BinarySphericalQuantizer(self.codebook_dim, beta, gamma0, gamma, zeta, group_size=group_size)
 
+        # Place values of the bits, least significant first, for packing bits into s1/s2/full indices
+        self.register_buffer('bit_weights', 2 ** torch.arange(self.codebook_dim), persistent=False)
+        # Scaled bipolar codes of every s1 index (first s1_bits columns) stacked on those of every s2 index (last
+        # s2_bits columns), zero elsewhere, so that a pair of ids decodes with one embedding_bag, see `indices_to_bits`
+        self.register_buffer('bit_table', torch.block_diag(self._bit_codes(s1_bits), self._bit_codes(s2_bits)), persistent=False)
+
+    def _bit_codes(self, num_bits):
+        bits = (torch.arange(2 ** num_bits).unsqueeze(-1) >> torch.arange(num_bits)) & 1
+        return (bits.float() * 2 - 1) * (1. / (self.codebook_dim ** 0.5))
+
     def bits_to_indices(self, bits):
         bits = (bits >= 0).to(torch.long)
-        indices = 2 ** torch.arange(
-            0,
-            bits.shape[-1],
-            1,
-            dtype=torch.long,
-            device=bits.device,
-        )
-        return (bits * indices).sum(-1)
+        return (bits * self.bit_weights[:bits.shape[-1]]).sum(-1)
+
+    def indices(self, z, half=False):
+        """
+        The indices `forward` returns for z, without the normalization and the entropy losses: normalizing keeps the
+        signs, which are all the indices depend on. For inference encoding.
+        """
+        bits = (z > 0).to(torch.long)
+        if half:
+            return [(bits[..., :self.s1_bits] * self.bit_weights[:self.s1_bits]).sum(-1),
+                    (bits[..., self.s1_bits:] * self.bit_weights[:self.s2_bits]).sum(-1)]
+        return (bits * self.bit_weights).sum(-1)
+
+    def indices_to_bits(self, indices, half=False):
+        """
+        Inverse of `indices`: the scaled bipolar codes (batch, seq_len, codebook_dim) of s1/s2 id pairs (half) or of
+        full indices, read from `bit_table`.
+        """
+        if half:
+            s1_ids, s2_ids = indices
+        else:
+            s1_ids, s2_ids = indices & (2 ** self.s1_bits - 1), indices >> self.s1_bits
+        ids = torch.stack([s1_ids, s2_ids + 2 ** self.s1_bits], dim=-1)
+        return F.embedding_bag(ids.view(-1, 2), self.bit_table, mode='sum').view(*s1_ids.shape, -1)
 
     def forward(self, z, half=False):
         z = F.normalize(z, dim=-1)
@@ -265,6 +292,48 @@ class RMSNorm(torch.nn.Module):
         return output * self.weight
 
 
+def _split_fused_state(fused_name, names, sizes, module, state_dict, prefix, local_metadata):
+    # state_dict hook: store a fused layer under the keys of the layers it replaced
+    for param in ('weight', 'bias'):
+        key = f'{prefix}{fused_name}.{param}'
+        if key in state_dict:
+            for name, value in zip(names, state_dict.pop(key).split(sizes)):
+                state_dict[f'{prefix}{name}.{param}'] = value
+
+
+def _join_fused_state(fused_name, names, state_dict, prefix, local_metadata, strict, missing_keys, unexpected_keys, error_msgs):
+    # load_state_dict pre-hook: accept checkpoints written with the separate layers
+    for param in ('weight', 'bias'):
+        keys = [f'{prefix}{name}.{param}' for name in names]
+        if all(key in state_dict for key in keys):
+            state_dict[f'{prefix}{fused_name}.{param}'] = torch.cat([state_dict.pop(key) for key in keys])
+
+
+def _fuse_linears(module, fused_name, names):
+    """
+    Replaces the nn.Linear children `names` of module, which must read the same input, by one nn.Linear `fused_name`
+    whose output holds theirs side by side. The state dict keeps the original keys in both directions. Does nothing
+    unless every layer is a plain nn.Linear, e.g. after int8 quantization.
+    """
+    linears = [getattr(module, name, None) for name in names]
+    if not all(type(linear) is nn.Linear for linear in linears):
+        return
+    weight = torch.cat([linear.weight.detach() for linear in linears])
+    bias = torch.cat([linear.bias.detach() for linear in linears]) if linears[0].bias is not None else None
+    # Built on the meta device so that no throwaway weights are initialised
+    fused = nn.Linear(weight.size(1), weight.size(0), bias=bias is not None, device='meta')
+    fused.weight = nn.Parameter(weight, requires_grad=linears[0].weight.requires_grad)
+    if bias is not None:
+        fused.bias = nn.Parameter(bias, requires_grad=linears[0].bias.requires_grad)
+    for name in names:
+        delattr(module, name)
+    setattr(module, fused_name, fused)
+
+    sizes = [linear.out_features for linear in linears]
+    module._register_state_dict_hook(partial(_split_fused_state, fused_name, names, sizes))
+    module._register_load_state_dict_pre_hook(partial(_join_fused_state, fused_name, names))
+
+
 class FeedForward(nn.Module):
     def __init__(self, d_model, ff_dim, ffn_dropout_p=0.0):
         super().__init__()
@@ -273,9 +342,49 @@ class FeedForward(nn.Module):
         self.w3 = nn.Linear(d_model, ff_dim, bias=False)
         self.w2 = nn.Linear(ff_dim, d_model, bias=False)
         self.ffn_dropout = nn.Dropout(ffn_dropout_p)
+        self.w13 = None  # w1 and w3 as one layer, see `fuse_projections`
 
     def forward(self, x):
-        return self.ffn_dropout(self.w2(F.silu(self.w1(x)) * self.w3(x)))
+        if self.w13 is not None:
+            gate, up = self.w13(x).chunk(2, dim=-1)
+        else:
+            gate, up = self.w1(x), self.w3(x)
+        return self.ffn_dropout(self.w2(F.silu(gate) * up))
+
+    def fuse_projections(self):
+        """Runs w1 and w3 as a single GEMM."""
+        _fuse_linears(self, 'w13', ('w1', 'w3'))
+
+
+ROTARY_TABLE_SIZE = 512  # default max_context
+
+_rotary_table_cache = {}
+
+
+def _rotary_angles(inv_freq, length):
+    t = torch.arange(length, device=inv_freq.device).type_as(inv_freq)
+    freqs = torch.einsum('i,j->ij', t, inv_freq)
+    return torch.cat((freqs, freqs), dim=-1)
+
+
+def rotary_tables(dim, length, device=None, dtype=torch.float32):
+    """
+    Returns the cached rotary (cos, sin) tables of shape [>= length, dim], shared by every attention module with the
+    same head dimension. Tables cover ROTARY_TABLE_SIZE positions and double whenever a longer sequence needs them;
+    they are computed in fp32 and stored once per dtype they are applied in.
+    """
+    device = torch.device('cpu' if device is None else device)
+    key = (dim, device, dtype)
+    tables = _rotary_table_cache.get(key)
+    if tables is None or tables[0].size(0) < length:
+        size = ROTARY_TABLE_SIZE if tables is None else tables[0].size(0)
+        while size < length:
+            size *= 2
+        inv_freq = 1.0 / (10000 ** (torch.arange(0, dim, 2, device=device).float() / dim))
+        emb = _rotary_angles(inv_freq, size)
+        tables = emb.cos().to(dtype), emb.sin().to(dtype)
+        _rotary_table_cache[key] = tables
+    return tables
 
 
 class RotaryPositionalEmbedding(nn.Module):
@@ -283,22 +392,29 @@ class RotaryPositionalEmbedding(nn.Module):
         super().__init__()
         inv_freq = 1.0 / (10000 ** (torch.arange(0, dim, 2).float() / dim))
         self.register_buffer("inv_freq", inv_freq)
-        self.seq_len_cached = None
-        self.cos_cached = None
-        self.sin_cached = None
-
-    def _update_cos_sin_cache(self, x, seq_len):
-        if seq_len != self.seq_len_cached:
-            self.seq_len_cached = seq_len
-            t = torch.arange(seq_len, device=x.device).type_as(self.inv_freq)
-            freqs = torch.einsum('i,j->ij', t, self.inv_freq)
-            emb = torch.cat((freqs, freqs), dim=-1).to(x.device)
-            self.cos_cached = emb.cos()[None, None, :, :]
-            self.sin_cached = emb.sin()[None, None, :, :]
-        return self.cos_cached, self.sin_cached
-
-    def forward(self, q, k):
-        cos, sin = self._update_cos_sin_cache(q, q.shape[-2])
+        self.dim = dim
+
+    def _tables(self, x, length):
+        if torch.jit.is_tracing():
+            # Computed in the graph so that traced and exported graphs accept any sequence length
+            emb = _rotary_angles(self.inv_freq, length)
+            return emb.cos().to(x.dtype), emb.sin().to(x.dtype)
+        return rotary_tables(self.dim, length, x.device, x.dtype)
+
+    def forward(self, q, k, offset=0, positions=None):
+        """
+        Rotates q and k of shape [batch, n_heads, seq_len, head_dim], which sit at positions offset.. unless
+        `positions` ([batch, seq_len], each < offset + seq_len) gives per-row positions, e.g. for left-padded rows.
+        The tables are built in fp32 and applied in the activation dtype (bf16 under autocast).
+        """
+        seq_len = q.shape[-2]
+        cos, sin = self._tables(q, offset + seq_len)
+        if positions is not None:
+            cos = cos[positions].unsqueeze(1)
+            sin = sin[positions].unsqueeze(1)
+        else:
+            cos = cos[offset:offset + seq_len]
+            sin = sin[offset:offset + seq_len]
         return (
             (q * cos) + (self._rotate_half(q) * sin),
             (k * cos) + (self._rotate_half(k) * sin),
@@ -336,6 +452,204 @@ def scaled_dot_product_attention(query, key, value, attn_mask=None, dropout_p=0.
     return attn_weight @ value
 
 
+_causal_masks = {}  # device -> square bool mask, grown to the longest sequence seen
+
+
+def causal_mask(q_len, k_len, offset=0, device=None):
+    """Returns a bool mask of shape [q_len, k_len], True where query i (at position offset + i) may not attend.
+
+    The mask is a view into one cached square mask per device, which doubles in size when a longer one is needed.
+    """
+    key = str(device)
+    size = max(offset + q_len, k_len)
+    mask = _causal_masks.get(key)
+    if mask is None or mask.size(0) < size:
+        size = max(size, 2 * mask.size(0) if mask is not None else 0)
+        mask = torch.ones(size, size, dtype=torch.bool, device=device).triu(diagonal=1)
+        _causal_masks[key] = mask
+    return mask[offset:offset + q_len, :k_len]
+
+
+try:  # torch >= 2.3
+    from torch.nn.attention import sdpa_kernel as _sdpa_kernel, SDPBackend
+
+    _SDPA_KERNELS = {
+        'math': [SDPBackend.MATH],
+        'flash': [SDPBackend.FLASH_ATTENTION],
+        'efficient': [SDPBackend.EFFICIENT_ATTENTION],
+    }
+
+    def _sdpa_kernel_context(kernel):
+        return _sdpa_kernel(_SDPA_KERNELS[kernel])
+except ImportError:
+    def _sdpa_kernel_context(kernel):
+        return torch.backends.cuda.sdp_kernel(
+            enable_math=kernel == 'math',
+            enable_flash=kernel == 'flash',
+            enable_mem_efficient=kernel == 'efficient',
+        )
+
+
+def fused_scaled_dot_product_attention(query, key, value, attn_mask=None, dropout_p=0.0, is_causal=False, scale=None, kernel=None) -> torch.Tensor:
+    """Same contract as `scaled_dot_product_attention`, computed with PyTorch's fused SDPA kernels.
+
+    Bool masks keep this module's convention (True = blocked) and may be combined with `is_causal`.
+    `kernel` forces one of 'math', 'flash' or 'efficient'; by default PyTorch picks the fastest available.
+    """
+    if attn_mask is not None:
+        if is_causal:
+            mask = causal_mask(query.size(-2), key.size(-2), device=query.device)
+            if attn_mask.dtype == torch.bool:
+                attn_mask = attn_mask | mask
+            else:
+                attn_mask = attn_mask.masked_fill(mask, float("-inf"))
+            is_causal = False
+        if attn_mask.dtype == torch.bool:
+            attn_mask = attn_mask.logical_not()
+
+    if kernel is None:
+        return F.scaled_dot_product_attention(query, key, value, attn_mask=attn_mask, dropout_p=dropout_p, is_causal=is_causal, scale=scale)
+    with _sdpa_kernel_context(kernel):
+        return F.scaled_dot_product_attention(query, key, value, attn_mask=attn_mask, dropout_p=dropout_p, is_causal=is_causal, scale=scale)
+
+
+ATTENTION_BACKENDS = ('reference', 'sdpa', 'math', 'flash', 'efficient')
+_attention_backend = 'sdpa'
+
+
+def set_attention_backend(name):
+    """Selects the attention implementation used by all attention modules.
+
+    'reference' is the hand-written `scaled_dot_product_attention`, 'sdpa' lets PyTorch choose a fused kernel and
+    'math' / 'flash' / 'efficient' force a specific SDPA kernel (not every kernel is available on every device).
+    """
+    global _attention_backend
+    if name not in ATTENTION_BACKENDS:
+        raise ValueError(f"Unknown attention backend {name}, expected one of {ATTENTION_BACKENDS}")
+    _attention_backend = name
+
+
+def get_attention_backend():
+    return _attention_backend
+
+
+def attention(query, key, value, attn_mask=None, dropout_p=0.0, is_causal=False):
+    """Dispatches to the attention backend chosen with `set_attention_backend`."""
+    if _attention_backend == 'reference':
+        return scaled_dot_product_attention(query, key, value, attn_mask=attn_mask, dropout_p=dropout_p, is_causal=is_causal)
+    kernel = None if _attention_backend == 'sdpa' else _attention_backend
+    return fused_scaled_dot_product_attention(query, key, value, attn_mask=attn_mask, dropout_p=dropout_p, is_causal=is_causal, kernel=kernel)
+
+
+class KVCache:
+    """Key/value cache of one self-attention layer for incremental decoding.
+
+    Keys are stored after the rotary embedding has been applied, so cached entries
+    never need to be rotated again when new positions are appended. With a `capacity`
+    the buffers are allocated once and written in place; otherwise they grow by concatenation.
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.reset()
+
+    @property
+    def seq_len(self):
+        return self.position
+
+    def update(self, k, v):
+        """Appends new keys/values of shape [batch, n_heads, new_len, head_dim] and returns the full cache."""
+        new_len = k.size(-2)
+        if self.capacity is None:
+            if self.k is None:
+                self.k, self.v = k, v
+            else:
+                self.k = torch.cat([self.k, k], dim=-2)
+                self.v = torch.cat([self.v, v], dim=-2)
+            self.position += new_len
+            return self.k, self.v
+
+        if self.k is None:
+            shape = (*k.shape[:-2], self.capacity, k.size(-1))
+            self.k = k.new_zeros(shape)
+            self.v = v.new_zeros(shape)
+        end = self.position + new_len
+        if end > self.capacity:
+            raise ValueError(f"KVCache capacity {self.capacity} exceeded by {end - self.capacity} positions")
+        self.k[:, :, self.position:end] = k
+        self.v[:, :, self.position:end] = v
+        self.position = end
+        return self.k[:, :, :end], self.v[:, :, :end]
+
+    def get(self):
+        """Returns the cached keys/values without appending anything."""
+        if self.capacity is None or self.k is None:
+            return self.k, self.v
+        return self.k[:, :, :self.seq_len], self.v[:, :, :self.seq_len]
+
+    def repeat_interleave(self, repeats):
+        """Repeats every cached batch row `repeats` times, e.g. to fan a shared prefix out to several samples."""
+        if self.k is not None:
+            self.k = self.k.repeat_interleave(repeats, dim=0)
+            self.v = self.v.repeat_interleave(repeats, dim=0)
+
+    def select_rows(self, rows):
+        """Keeps only the batch rows selected by `rows` (index or bool mask), e.g. when finished rows leave the batch."""
+        if self.k is not None:
+            self.k = self.k[rows]
+            self.v = self.v[rows]
+
+    def truncate(self, length):
+        """Drops every position from `length` on, e.g. rejected draft tokens in speculative decoding."""
+        if length >= self.position:
+            return
+        if self.capacity is None:
+            self.k = self.k[:, :, :length]
+            self.v = self.v[:, :, :length]
+        self.position = length
+
+    def reset(self):
+        self.k = None
+        self.v = None
+        self.position = 0  # absolute position of the next token
+
+
+class RollingKVCache(KVCache):
+    """Bounded ring-buffer cache that keeps the last `capacity` positions.
+
+    Once full, each new token overwrites the oldest slot. Rotary attention scores depend only on the
+    distance between query and key, so keeping the absolute rotation of every key is equivalent to
+    re-anchoring the window at position 0 after each eviction. The result is approximate: hidden
+    states of the retained tokens were computed while the evicted tokens were still visible.
+    """
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+
+    @property
+    def seq_len(self):
+        return min(self.position, self.capacity)
+
+    def truncate(self, length):
+        if self.position > self.capacity:
+            raise ValueError("RollingKVCache cannot be truncated once positions have been evicted")
+        super().truncate(length)
+
+    def update(self, k, v):
+        new_len = k.size(-2)
+        if self.position + new_len <= self.capacity:
+            return super().update(k, v)
+
+        if new_len != 1:
+            raise ValueError(f"RollingKVCache can only append one token at a time once full, got {new_len}")
+        # Slot order is irrelevant for a single query that attends to every cached key
+        slot = self.position % self.capacity
+        self.k[:, :, slot] = k[:, :, 0]
+        self.v[:, :, slot] = v[:, :, 0]
+        self.position += 1
+        return self.k, self.v
+
+
 class MultiHeadAttentionWithRoPE(nn.Module):
     def __init__(self, d_model, n_heads, attn_dropout_p=0.0, resid_dropout_p=0.0):
         super().__init__()
@@ -350,27 +664,56 @@ class MultiHeadAttentionWithRoPE(nn.Module):
         self.rotary = RotaryPositionalEmbedding(self.head_dim)
         self.attn_dropout_p = attn_dropout_p
         self.resid_dropout = nn.Dropout(resid_dropout_p)
+        self.qkv_proj = None  # q_proj, k_proj and v_proj as one layer, see `fuse_projections`
 
-    def forward(self, x, key_padding_mask=None):
+    def project_qkv(self, x):
+        """Returns the query, key and value projections of x, each of shape [batch, seq_len, d_model]."""
+        if self.qkv_proj is not None:
+            return self.qkv_proj(x).chunk(3, dim=-1)
+        return self.q_proj(x), self.k_proj(x), self.v_proj(x)
+
+    def fuse_projections(self):
+        """Runs the query, key and value projections as a single GEMM."""
+        _fuse_linears(self, 'qkv_proj', ('q_proj', 'k_proj', 'v_proj'))
+
+    def forward(self, x, key_padding_mask=None, kv_cache=None):
+        """
+        Args:
+            x (torch.Tensor): Input of shape [batch, seq_len, d_model]. With a kv_cache this holds only the new positions.
+            key_padding_mask (torch.Tensor, optional): Bool mask over all keys (cached + new), True marks padding.
+                Rows may be left-padded: each row then counts rotary positions from its first unpadded key.
+            kv_cache (KVCache, optional): Cache of previous keys/values. New positions continue after the cached ones.
+        """
         batch_size, seq_len, _ = x.shape
+        past_len = kv_cache.position if kv_cache is not None else 0
 
-        q = self.q_proj(x).view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2)
-        k = self.k_proj(x).view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2)
-        v = self.v_proj(x).view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2)
+        q, k, v = (t.view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2) for t in self.project_qkv(x))
 
-        q, k = self.rotary(q, k)
+        positions = None
+        if key_padding_mask is not None:
+            positions = ((~key_padding_mask).cumsum(dim=-1) - 1).clamp(min=0)[:, -seq_len:]
+        q, k = self.rotary(q, k, offset=past_len, positions=positions)
+        if kv_cache is not None:
+            k, v = kv_cache.update(k, v)
 
         if key_padding_mask is not None:
-            attn_mask = key_padding_mask.unsqueeze(1).unsqueeze(2)  # [batch, 1, 1, seq_len]
-            attn_mask = attn_mask.expand(-1, self.n_heads, seq_len, -1)  # [batch, n_heads, q_len, k_len]
+            # Padded queries keep their keys so that no row of scores is fully masked; their outputs are never read
+            query_padding = key_padding_mask[:, -seq_len:]
+            attn_mask = (key_padding_mask.unsqueeze(1) & ~query_padding.unsqueeze(2)).unsqueeze(1)  # [batch, 1, q_len, k_len]
+            attn_mask = attn_mask | causal_mask(seq_len, k.size(-2), offset=past_len, device=x.device)
+            is_causal = False
         else:
             attn_mask = None
+            is_causal = past_len == 0
+            if not is_causal and seq_len > 1:
+                # New queries sit at positions past_len.. and may not see keys after their own position
+                attn_mask = causal_mask(seq_len, k.size(-2), offset=past_len, device=x.device)
 
-        attn_output = scaled_dot_product_attention(
+        attn_output = attention(
             q, k, v,
             attn_mask=attn_mask,
-            dropout_p=self.attn_dropout_p,
-            is_causal=True
+            dropout_p=self.attn_dropout_p if self.training else 0.0,
+            is_causal=is_causal
         )
 
         attn_output = attn_output.transpose(1, 2).contiguous().view(batch_size, seq_len, self.d_model)
@@ -391,14 +734,31 @@ class MultiHeadCrossAttentionWithRoPE(nn.Module):
         self.rotary = RotaryPositionalEmbedding(self.head_dim)
         self.attn_dropout_p = attn_dropout_p
         self.resid_dropout = nn.Dropout(resid_dropout)
+        self.kv_proj = None  # k_proj and v_proj as one layer, see `fuse_projections`
+
+    def project_kv(self, key, value):
+        """Returns the key and value projections, each of shape [batch, seq_len, d_model]."""
+        if self.kv_proj is not None:
+            if key is value:
+                return self.kv_proj(key).chunk(2, dim=-1)
+            k_weight, v_weight = self.kv_proj.weight.chunk(2)
+            k_bias, v_bias = self.kv_proj.bias.chunk(2)
+            return F.linear(key, k_weight, k_bias), F.linear(value, v_weight, v_bias)
+        return self.k_proj(key), self.v_proj(value)
+
+    def fuse_projections(self):
+        """
+        Runs the key and value projections as a single GEMM. The query reads the sibling embedding rather than the
+        hidden states, so it keeps its own layer.
+        """
+        _fuse_linears(self, 'kv_proj', ('k_proj', 'v_proj'))
 
     def forward(self, query, key, value, key_padding_mask=None):
         batch_size, q_len, _ = query.shape
         _, seq_len, _ = key.shape
 
         q = self.q_proj(query).view(batch_size, q_len, self.n_heads, self.head_dim).transpose(1, 2)
-        k = self.k_proj(key).view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2)
-        v = self.v_proj(value).view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2)
+        k, v = (t.view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2) for t in self.project_kv(key, value))
 
         q, k = self.rotary(q, k)
 
@@ -410,18 +770,80 @@ class MultiHeadCrossAttentionWithRoPE(nn.Module):
 
         is_causal_flag = self.training
 
-        attn_output = scaled_dot_product_attention(
+        attn_output = attention(
             q, k, v,
             attn_mask=attn_mask,
-            dropout_p=self.attn_dropout_p,
+            dropout_p=self.attn_dropout_p if self.training else 0.0,
             is_causal=is_causal_flag
         )
 
         attn_output = attn_output.transpose(1, 2).contiguous().view(batch_size, q_len, self.d_model)
         return self.resid_dropout(self.out_proj(attn_output))
 
+    def append_kv(self, key, value, kv_cache):
+        """Projects new key/value positions of shape [batch, new_len, d_model] into kv_cache for `step`.
+
+        During generation the query has length 1, so `forward` rotates queries and keys by the phase of
+        position 0, which is the identity. Cached keys are therefore stored unrotated.
+        """
+        batch_size, seq_len, _ = key.shape
+        k, v = (t.view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2) for t in self.project_kv(key, value))
+        kv_cache.update(k, v)
+
+    def step(self, query, kv_cache, key_padding_mask=None):
+        """Attends a single query position [batch, 1, d_model] over the keys/values cached with `append_kv`.
+
+        Equivalent to `forward` in eval mode with a query of length 1.
+        """
+        batch_size = query.size(0)
+        q = self.q_proj(query).view(batch_size, 1, self.n_heads, self.head_dim).transpose(1, 2)
+        k, v = kv_cache.get()
+
+        attn_mask = key_padding_mask.unsqueeze(1).unsqueeze(2) if key_padding_mask is not None else None
+        attn_output = attention(q, k, v, attn_mask=attn_mask)
+
+        attn_output = attn_output.transpose(1, 2).reshape(batch_size, 1, self.d_model)
+        return self.out_proj(attn_output)
+
+
+class FoldableEmbedding(nn.Module):
+    """
+    Base of the embeddings that `fold` into a lookup table for inference. Subclasses implement `build_table`. The
+    table is derived from the weights, so it is dropped in training mode and, once the module has been folded, rebuilt
+    by eval() and by load_state_dict. Weights changed in place otherwise need another `fold`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fold_enabled = False
+        self.register_buffer('folded', None, persistent=False)  # see `fold`
+        self.register_load_state_dict_post_hook(FoldableEmbedding._refold_after_load)
+
+    def fold(self):
+        """Builds the lookup table from the current weights and keeps it up to date from now on."""
+        self.fold_enabled = True
+        with torch.no_grad():
+            self.folded = self.build_table()
+
+    def build_table(self):
+        """Subclass hook: returns the lookup table for the current weights. Runs under no_grad."""
+        raise NotImplementedError
+
+    def train(self, mode=True):
+        super().train(mode)
+        if mode:
+            self.folded = None
+        elif self.fold_enabled:
+            self.fold()
+        return self
+
+    @staticmethod
+    def _refold_after_load(module, incompatible_keys):
+        if module.fold_enabled and not module.training:
+            module.fold()
+
 
-class HierarchicalEmbedding(nn.Module):
+class HierarchicalEmbedding(FoldableEmbedding):
     def __init__(self, s1_bits, s2_bits, d_model=256):
         super().__init__()
         self.s1_bits = s1_bits
@@ -438,6 +860,18 @@ class HierarchicalEmbedding(nn.Module):
         nn.init.normal_(self.emb_s1.weight, mean=0, std=d_model ** -0.5)
         nn.init.normal_(self.emb_s2.weight, mean=0, std=d_model ** -0.5)
 
+    def build_table(self):
+        """
+        Precomputes fusion_proj over every scaled s1 and s2 embedding row. fusion_proj is linear, so in eval mode the
+        embedding becomes the sum of one pre-projected s1 row and one s2 row, read with a single embedding_bag. See
+        `FoldableEmbedding` for when the table is rebuilt.
+        """
+        scale = math.sqrt(self.d_model)
+        weight = self.fusion_proj.weight.float()
+        s1_table = F.linear(self.emb_s1.weight.float() * scale, weight[:, :self.d_model], self.fusion_proj.bias.float())
+        s2_table = F.linear(self.emb_s2.weight.float() * scale, weight[:, self.d_model:])
+        return torch.cat([s1_table, s2_table]).to(self.fusion_proj.weight.dtype)
+
     def forward(self, token_ids):
         """Inputs:
         token_ids: [batch_size, seq_len] token ID
@@ -447,6 +881,9 @@ class HierarchicalEmbedding(nn.Module):
             s1_ids, s2_ids = token_ids
         else:
             s1_ids, s2_ids = self.split_token(token_ids, self.s2_bits)
+        if self.folded is not None and not self.training:
+            ids = torch.stack([s1_ids, s2_ids + self.emb_s1.num_embeddings], dim=-1)
+            return F.embedding_bag(ids.view(-1, 2), self.folded, mode='sum').view(*s1_ids.shape, -1)
         s1_emb = self.emb_s1(s1_ids) * math.sqrt(self.d_model)
         s2_emb = self.emb_s2(s2_ids) * math.sqrt(self.d_model)
         return self.fusion_proj(torch.cat([s1_emb, s2_emb], dim=-1))
@@ -470,6 +907,16 @@ class DependencyAwareLayer(nn.Module):
         )
         return self.norm(hidden_states + attn_out)
 
+    def step(self, last_hidden, sibling_embed, kv_cache, key_padding_mask=None):
+        """Generation path that only computes the output of the last position.
+
+        last_hidden: [batch, 1, d_model] hidden state of the last position
+        sibling_embed: [batch, 1, d_model] embedding of the sampled s1 token
+        kv_cache: cross-attention keys/values of the context, filled with `cross_attn.append_kv`
+        """
+        attn_out = self.cross_attn.step(sibling_embed, kv_cache, key_padding_mask=key_padding_mask)
+        return self.norm(last_hidden + attn_out)
+
 
 class TransformerBlock(nn.Module):
     def __init__(self, d_model, n_heads, ff_dim=1024, ffn_dropout_p=0.0, attn_dropout_p=0.0, resid_dropout_p=0.0):
@@ -479,10 +926,10 @@ class TransformerBlock(nn.Module):
         self.norm2 = RMSNorm(d_model)
         self.ffn = FeedForward(d_model, ff_dim, ffn_dropout_p)
 
-    def forward(self, x, key_padding_mask=None):
+    def forward(self, x, key_padding_mask=None, kv_cache=None):
         residual = x
         x = self.norm1(x)
-        attn_out = self.self_attn(x, key_padding_mask=key_padding_mask)
+        attn_out = self.self_attn(x, key_padding_mask=key_padding_mask, kv_cache=kv_cache)
         x = residual + attn_out
 
         residual = x
@@ -542,7 +989,7 @@ class FixedEmbedding(nn.Module):
         return self.emb(x).detach()
 
 
-class TemporalEmbedding(nn.Module):
+class TemporalEmbedding(FoldableEmbedding):
     def __init__(self, d_model, learn_pe):
         super(TemporalEmbedding, self).__init__()
 
@@ -558,9 +1005,23 @@ class TemporalEmbedding(nn.Module):
         self.weekday_embed = Embed(weekday_size, d_model)
         self.day_embed = Embed(day_size, d_model)
         self.month_embed = Embed(month_size, d_model)
+        self.register_buffer('offsets', torch.tensor([0, minute_size, minute_size + hour_size, minute_size + hour_size + weekday_size,
+                                                      minute_size + hour_size + weekday_size + day_size]), persistent=False)
+
+    def build_table(self):
+        """
+        Stacks the five tables into one so that in eval mode the sum over (minute, hour, weekday, day, month) is a single
+        embedding_bag over offset indices. A joint table keyed by the whole 5-tuple would have 60*24*7*32*13 rows.
+        """
+        embeds = (self.minute_embed, self.hour_embed, self.weekday_embed, self.day_embed, self.month_embed)
+        # FixedEmbedding wraps its nn.Embedding
+        return torch.cat([getattr(embed, 'emb', embed).weight for embed in embeds])
 
     def forward(self, x):
         x = x.long()
+        if self.folded is not None and not self.training:
+            indices = (x + self.offsets).view(-1, x.size(-1))
+            return F.embedding_bag(indices, self.folded, mode='sum').view(*x.shape[:-1], -1)
 
         minute_x = self.minute_embed(x[:, :, 0])
         hour_x = self.hour_embed(x[:, :, 1])
@@ -571,6 +1032,69 @@ class TemporalEmbedding(nn.Module):
         return hour_x + weekday_x + day_x + month_x + minute_x
 
 
+QUANTIZE_MODES = (None, 'int8')
+
+
+def quantize_dynamic_int8(model):
+    """
+    Applies dynamic int8 quantization (CPU only) to the nn.Linear layers inside TransformerBlock, FeedForward and DualHead.
+
+    Weights are stored as int8 and activations are quantized per call. Embeddings, the dependency-aware layer and the
+    tokenizer's input/output projections stay in float. The model is modified in place and returned.
+    """
+    qconfig_spec = {
+        name: torch.ao.quantization.default_dynamic_qconfig
+        for name, module in model.named_modules()
+        if isinstance(module, (TransformerBlock, FeedForward, DualHead))
+    }
+    return torch.ao.quantization.quantize_dynamic(model, qconfig_spec, dtype=torch.qint8, inplace=True)
+
+
+def fuse_projections(model):
+    """
+    Fuses the linear layers that read the same input into single GEMMs: q/k/v of every self-attention, w1/w3 of every
+    FeedForward and k/v of the dependency-aware cross-attention.
+
+    The fused weights are concatenations of the originals, so outputs are unchanged, while the state dict keeps the
+    separate keys: checkpoints load into a fused model and a fused model saves in the usual format. Layers already
+    replaced by int8 quantization are left alone, since dynamic quantization uses one scale per weight tensor. The
+    model is modified in place and returned.
+    """
+    for module in list(model.modules()):
+        if isinstance(module, (MultiHeadAttentionWithRoPE, MultiHeadCrossAttentionWithRoPE, FeedForward)):
+            module.fuse_projections()
+    return model
+
+
+def fold_embeddings(model):
+    """
+    Folds the token and time embeddings of model into lookup tables for inference, see
+    `HierarchicalEmbedding.build_table` and `TemporalEmbedding.build_table`. The tables follow load_state_dict and
+    eval(); call it again after changing the weights in place otherwise. The model is modified in place and returned.
+    """
+    for module in model.modules():
+        if isinstance(module, FoldableEmbedding):
+            module.fold()
+    return model
+
+
+PRECISION_MODES = ('fp32', 'bf16')
+
+
+def cast_to_bfloat16(model):
+    """
+    Stores the weights of model in bfloat16 for autocast inference, roughly halving its resident memory.
+
+    RMSNorm, the rotary frequency table and the BSQ quantizer are kept in fp32, so normalization, positions and
+    token ids are computed at full precision. The model is modified in place and returned.
+    """
+    model.to(torch.bfloat16)
+    for module in model.modules():
+        if isinstance(module, (RMSNorm, RotaryPositionalEmbedding, BSQuantizer)):
+            module.float()
+    return model
+
+
 
 
 
@@ -0,0 +1,207 @@
+"""
+ONNX Runtime backend for Kronos.
+
+Runs the graphs written by `model.onnx_export.export_onnx` on onnxruntime's CPU execution provider. The decoding
+loop, sampling and key/value bookkeeping are plain numpy. Importing this module does not import torch: the `model`
+package only imports `model.kronos` when one of its torch classes is first accessed.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from model.base_predictor import BasePredictor
+
+try:
+    from tqdm import trange
+except Exception:  # Fallback if tqdm not installed in minimal inference env
+    def trange(x):
+        return range(x)
+
+ONNX_CONFIG_NAME = 'onnx_config.json'
+ONNX_GRAPHS = ('tokenizer_encode', 'tokenizer_decode', 'kronos_s1_step', 'kronos_s2_step')
+
+
+def softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=-1, keepdims=True)
+
+
+def top_k_top_p_filtering(logits, top_k=0, top_p=1.0, filter_value=-np.inf, min_tokens_to_keep=1):
+    """numpy port of `model.kronos.top_k_top_p_filtering` for logits of shape [batch, vocab]; top_k takes precedence."""
+    logits = logits.copy()
+    if top_k > 0:
+        top_k = min(max(top_k, min_tokens_to_keep), logits.shape[-1])
+        kth = -np.partition(-logits, top_k - 1, axis=-1)[..., top_k - 1:top_k]
+        logits[logits < kth] = filter_value
+        return logits
+
+    if top_p < 1.0:
+        sorted_indices = np.argsort(-logits, axis=-1, kind='stable')
+        sorted_logits = np.take_along_axis(logits, sorted_indices, axis=-1)
+        cumulative_probs = np.cumsum(softmax(sorted_logits), axis=-1)
+
+        sorted_indices_to_remove = cumulative_probs > top_p
+        if min_tokens_to_keep > 1:
+            sorted_indices_to_remove[..., :min_tokens_to_keep] = False
+        sorted_indices_to_remove[..., 1:] = sorted_indices_to_remove[..., :-1].copy()
+        sorted_indices_to_remove[..., 0] = False
+
+        indices_to_remove = np.zeros_like(sorted_indices_to_remove)
+        np.put_along_axis(indices_to_remove, sorted_indices, sorted_indices_to_remove, axis=-1)
+        logits[indices_to_remove] = filter_value
+    return logits
+
+
+def sample_from_logits(logits, rng, temperature=1.0, top_k=0, top_p=1.0):
+    """Samples one token id per row, returning an int64 array of shape [batch, 1]. Parameters may be arrays of shape [batch]."""
+    if np.ndim(temperature) or np.ndim(top_k) or np.ndim(top_p):
+        rows = range(logits.shape[0])
+        temperature, top_k, top_p = (np.broadcast_to(param, (logits.shape[0],)) for param in (temperature, top_k, top_p))
+        return np.concatenate([sample_from_logits(logits[i:i + 1], rng, temperature[i], top_k[i], top_p[i]) for i in rows])
+    logits = logits.astype(np.float64) / temperature
+    if top_k > 0 or top_p < 1.0:
+        logits = top_k_top_p_filtering(logits, top_k=top_k, top_p=top_p)
+    cdf = np.cumsum(softmax(logits), axis=-1)
+    u = rng.random((logits.shape[0], 1)) * cdf[:, -1:]
+    ids = (cdf <= u).sum(axis=-1, keepdims=True)
+    return np.minimum(ids, logits.shape[-1] - 1).astype(np.int64)
+
+
+class OnnxKronosSession:
+    """
+    The four exported graphs plus the cache layout from onnx_config.json.
+
+    Args:
+        onnx_dir (str): Directory written by `export_onnx`.
+        intra_op_threads (int, optional): onnxruntime intra-op thread count. Defaults to the runtime's choice.
+    """
+
+    def __init__(self, onnx_dir, intra_op_threads=None):
+        import onnxruntime as ort
+
+        with open(os.path.join(onnx_dir, ONNX_CONFIG_NAME), 'r') as f:
+            self.config = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.sessions = {
+            name: ort.InferenceSession(os.path.join(onnx_dir, f'{name}.onnx'), options, providers=['CPUExecutionProvider'])
+            for name in ONNX_GRAPHS
+        }
+        self.past_names = [i.name for i in self.sessions['kronos_s1_step'].get_inputs()][3:]
+
+    def encode(self, x):
+        s1_ids, s2_ids = self.sessions['tokenizer_encode'].run(None, {'x': x.astype(np.float32)})
+        return s1_ids, s2_ids
+
+    def decode(self, s1_ids, s2_ids):
+        return self.sessions['tokenizer_decode'].run(None, {'s1_ids': s1_ids, 's2_ids': s2_ids})[0]
+
+    def empty_past(self, batch_size):
+        cfg = self.config
+        past = [np.zeros((batch_size, cfg['n_heads'], 0, cfg['head_dim']), np.float32) for _ in range(2 * cfg['n_layers'])]
+        past += [np.zeros((batch_size, cfg['cross_heads'], 0, cfg['cross_head_dim']), np.float32) for _ in range(2)]
+        return past
+
+    def s1_step(self, s1_ids, s2_ids, stamp, past):
+        """Returns (s1 logits of the last position, its context, present keys/values)."""
+        feed = {'s1_ids': s1_ids, 's2_ids': s2_ids, 'stamp': stamp.astype(np.float32)}
+        feed.update(zip(self.past_names, past))
+        s1_logits, context, *present = self.sessions['kronos_s1_step'].run(None, feed)
+        return s1_logits, context, present
+
+    def s2_step(self, context, s1_ids, present):
+        feed = {'context': context, 's1_ids': s1_ids, 'cross_key': present[-2], 'cross_value': present[-1]}
+        return self.sessions['kronos_s2_step'].run(None, feed)[0]
+
+
+def onnx_auto_regressive_inference(session, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99,
+                                   sample_count=5, verbose=False, rng=None):
+    """
+    numpy / onnxruntime counterpart of `model.kronos.auto_regressive_inference` with the key/value cache enabled.
+
+    Steps whose sequence fits in `max_context` feed only the new token with the previous present keys/values as
+    past; longer sequences recompute the last `max_context` tokens with an empty past, as the torch path does.
+    `T`, `top_k` and `top_p` may be arrays of shape [num_series].
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    num_series, initial_seq_len = x.shape[:2]
+    T, top_k, top_p = (np.repeat(param, sample_count) if np.ndim(param) else param for param in (T, top_k, top_p))
+    batch_size = num_series * sample_count
+    max_len = initial_seq_len + pred_len
+    x = np.clip(x, -clip, clip)
+
+    # All samples of a series share its history, so encode and prefill run once per series
+    s1_hist, s2_hist = session.encode(x)
+    s1 = np.empty((batch_size, max_len), np.int64)
+    s2 = np.empty((batch_size, max_len), np.int64)
+    s1[:, :initial_seq_len] = np.repeat(s1_hist, sample_count, axis=0)
+    s2[:, :initial_seq_len] = np.repeat(s2_hist, sample_count, axis=0)
+    stamp = np.repeat(np.concatenate([x_stamp, y_stamp[:, :pred_len]], axis=1), sample_count, axis=0)
+
+    ran = trange if verbose else range
+    present = None
+    for i in ran(pred_len):
+        length = initial_seq_len + i
+        start = max(0, length - max_context)
+
+        if i == 0:
+            window = slice(start, length)
+            s1_logits, context, present = session.s1_step(s1_hist[:, window], s2_hist[:, window], x_stamp[:, window],
+                                                          session.empty_past(num_series))
+            s1_logits = np.repeat(s1_logits, sample_count, axis=0)
+            context = np.repeat(context, sample_count, axis=0)
+            present = [np.repeat(p, sample_count, axis=0) for p in present]
+        elif length <= max_context:
+            step = slice(length - 1, length)
+            s1_logits, context, present = session.s1_step(s1[:, step], s2[:, step], stamp[:, step], present)
+        else:
+            window = slice(start, length)
+            s1_logits, context, present = session.s1_step(s1[:, window], s2[:, window], stamp[:, window],
+                                                          session.empty_past(batch_size))
+
+        sample_pre = sample_from_logits(s1_logits, rng, temperature=T, top_k=top_k, top_p=top_p)
+        s2_logits = session.s2_step(context, sample_pre, present)
+        sample_post = sample_from_logits(s2_logits, rng, temperature=T, top_k=top_k, top_p=top_p)
+
+        s1[:, length] = sample_pre[:, 0]
+        s2[:, length] = sample_post[:, 0]
+
+    start = max(0, max_len - max_context)
+    z = session.decode(s1[:, start:], s2[:, start:])
+    z = z.reshape(num_series, sample_count, z.shape[1], z.shape[2])
+    return np.mean(z, axis=1)
+
+
+class OnnxKronosPredictor(BasePredictor):
+    """
+    `KronosPredictor` counterpart that runs exported ONNX graphs through onnxruntime's CPU execution provider.
+
+    Args:
+        onnx_dir (str): Directory written by `model.onnx_export.export_onnx` (or `scripts/export_onnx.py`).
+        max_context (int): Maximum context length, as for `KronosPredictor`.
+        clip (float): Clipping bound of the normalised inputs.
+        intra_op_threads (int, optional): onnxruntime intra-op thread count.
+        seed (int, optional): Seed of the numpy generator used for sampling.
+    """
+
+    def __init__(self, onnx_dir, max_context=512, clip=5, intra_op_threads=None, seed=None):
+        super().__init__(max_context=max_context, clip=clip)
+        self.session = OnnxKronosSession(onnx_dir, intra_op_threads=intra_op_threads)
+        self.rng = np.random.default_rng(seed)
+
+    def generate(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose, padding_mask=None):
+        if padding_mask is not None:
+            raise ValueError("The exported ONNX graphs take no padding mask; batch histories of equal length")
+        if np.ndim(pred_len):
+            raise ValueError("The ONNX backend decodes every series to the same horizon; batch series with equal pred_len")
+        preds = onnx_auto_regressive_inference(
+            self.session, np.asarray(x, np.float32), np.asarray(x_stamp, np.float32), np.asarray(y_stamp, np.float32),
+            self.max_context, pred_len, self.clip, T, top_k, top_p, sample_count, verbose, rng=self.rng
+        )
+        return preds[:, -pred_len:, :]
@@ -0,0 +1,182 @@
+"""
+Exports KronosTokenizer.encode / decode and the Kronos decoding steps to ONNX for `model.onnx_backend`.
+
+Graphs written to the output directory:
+
+- tokenizer_encode.onnx: x [batch, seq, 6] -> s1_ids, s2_ids [batch, seq]
+- tokenizer_decode.onnx: s1_ids, s2_ids [batch, seq] -> x [batch, seq, 6]
+- kronos_s1_step.onnx: new tokens plus past keys/values -> s1 logits of the last position, its context and the
+  present keys/values (past + new). An empty past runs the prefill.
+- kronos_s2_step.onnx: last context, sampled s1 ids and the dependency layer's keys/values -> s2 logits
+- onnx_config.json: shapes the runtime needs to build empty caches
+
+Batch and sequence axes are dynamic. Positions are derived from the past length inside the graph.
+"""
+
+import json
+import os
+
+import torch
+import torch.nn as nn
+
+from model.compiled import TokenizerEncode
+from model.module import KVCache, attention
+from model.onnx_backend import ONNX_CONFIG_NAME
+
+DEFAULT_OPSET = 17
+
+
+class OnnxTokenizerDecode(nn.Module):
+    """`KronosTokenizer.decode(half=True)` with the bit extraction written without bitwise AND, which the ONNX
+    exporter only supports for bool tensors."""
+
+    def __init__(self, tokenizer):
+        super().__init__()
+        self.tokenizer = tokenizer
+
+    def forward(self, s1_ids, s2_ids):
+        tokenizer = self.tokenizer
+        powers = 2 ** torch.arange(tokenizer.codebook_dim // 2, device=s1_ids.device, dtype=torch.long)
+        bits = torch.cat([
+            torch.div(s1_ids.unsqueeze(-1), powers, rounding_mode='floor') % 2,
+            torch.div(s2_ids.unsqueeze(-1), powers, rounding_mode='floor') % 2,
+        ], dim=-1)
+        z = (bits.float() * 2 - 1) * (1. / (tokenizer.codebook_dim ** 0.5))
+        z = tokenizer.post_quant_embed(z)
+        for layer in tokenizer.decoder:
+            z = layer(z)
+        return tokenizer.head(z)
+
+
+class OnnxS1Step(nn.Module):
+    """`Kronos.decode_s1_step` with explicit past/present key-value tensors instead of KVCache objects."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, s1_ids, s2_ids, stamp, *past):
+        """past holds (k, v) of shape [batch, n_heads, past_len, head_dim] per layer, then the dependency layer's."""
+        model = self.model
+        batch_size, seq_len = s1_ids.shape
+        past_len = past[0].shape[2]
+        positions = torch.arange(seq_len, device=s1_ids.device) + past_len
+
+        x = model.embedding([s1_ids, s2_ids]) + model.time_emb(stamp)
+
+        inv_freq = model.transformer[0].self_attn.rotary.inv_freq
+        freqs = positions[:, None].type_as(inv_freq) * inv_freq[None, :]
+        emb = torch.cat((freqs, freqs), dim=-1)
+        cos, sin = emb.cos()[None, None], emb.sin()[None, None]
+        slots = torch.arange(seq_len + past_len, device=s1_ids.device)
+        mask = slots[None, :] > positions[:, None]  # True = blocked: keys after each query's position
+
+        presents = []
+        for i, layer in enumerate(model.transformer):
+            attn = layer.self_attn
+            h = layer.norm1(x)
+            q, k, v = (t.view(batch_size, seq_len, attn.n_heads, attn.head_dim).transpose(1, 2) for t in attn.project_qkv(h))
+            q = q * cos + attn.rotary._rotate_half(q) * sin
+            k = torch.cat([past[2 * i], k * cos + attn.rotary._rotate_half(k) * sin], dim=2)
+            v = torch.cat([past[2 * i + 1], v], dim=2)
+            presents += [k, v]
+            out = attention(q, k, v, attn_mask=mask)
+            x = x + attn.out_proj(out.transpose(1, 2).reshape(batch_size, seq_len, attn.d_model))
+            x = x + layer.ffn(layer.norm2(x))
+        x = model.norm(x)
+
+        cross_attn = model.dep_layer.cross_attn
+        k, v = (t.view(batch_size, seq_len, cross_attn.n_heads, cross_attn.head_dim).transpose(1, 2)
+                for t in cross_attn.project_kv(x, x))
+        presents += [torch.cat([past[-2], k], dim=2), torch.cat([past[-1], v], dim=2)]
+        return (model.head(x[:, -1]), x[:, -1:], *presents)
+
+
+class OnnxS2Step(nn.Module):
+    """`Kronos.decode_s2_step` over the dependency layer's keys/values returned by `OnnxS1Step`."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, context, s1_ids, cross_k, cross_v):
+        cache = KVCache()
+        cache.k, cache.v = cross_k, cross_v
+        return self.model.decode_s2_step(context, s1_ids, kv_cache=[cache])
+
+
+def export_onnx(tokenizer, model, output_dir, opset=DEFAULT_OPSET, example_len=16):
+    """
+    Exports the tokenizer and model graphs used by `OnnxKronosPredictor` into output_dir.
+
+    Args:
+        tokenizer (KronosTokenizer): Tokenizer in eval mode.
+        model (Kronos): Model in eval mode.
+        output_dir (str): Directory to write the .onnx files and onnx_config.json to.
+        opset (int): ONNX opset version.
+        example_len (int): Sequence length of the example inputs used for tracing.
+
+    Returns:
+        str: output_dir.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer, model = tokenizer.eval().cpu(), model.eval().cpu()
+
+    attn = model.transformer[0].self_attn
+    n_layers, n_heads, head_dim = len(model.transformer), attn.n_heads, attn.head_dim
+    cross_heads = model.dep_layer.cross_attn.n_heads
+    cross_dim = model.dep_layer.cross_attn.head_dim
+    batch_size = 2
+
+    x = torch.randn(batch_size, example_len, tokenizer.d_in)
+    s1_ids = torch.randint(0, 2 ** model.s1_bits, (batch_size, example_len))
+    s2_ids = torch.randint(0, 2 ** model.s2_bits, (batch_size, example_len))
+    stamp = torch.zeros(batch_size, example_len, 5)
+
+    seq_axes = {0: 'batch', 1: 'seq'}
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenizerEncode(tokenizer), (x,), os.path.join(output_dir, 'tokenizer_encode.onnx'),
+            input_names=['x'], output_names=['s1_ids', 's2_ids'],
+            dynamic_axes={'x': seq_axes, 's1_ids': seq_axes, 's2_ids': seq_axes}, opset_version=opset,
+        )
+        torch.onnx.export(
+            OnnxTokenizerDecode(tokenizer), (s1_ids, s2_ids), os.path.join(output_dir, 'tokenizer_decode.onnx'),
+            input_names=['s1_ids', 's2_ids'], output_names=['x'],
+            dynamic_axes={'s1_ids': seq_axes, 's2_ids': seq_axes, 'x': seq_axes}, opset_version=opset,
+        )
+
+        past_names, present_names = [], []
+        for i in range(n_layers):
+            past_names += [f'past_key_{i}', f'past_value_{i}']
+            present_names += [f'present_key_{i}', f'present_value_{i}']
+        past_names += ['past_cross_key', 'past_cross_value']
+        present_names += ['present_cross_key', 'present_cross_value']
+        past = [torch.randn(batch_size, n_heads, example_len, head_dim) for _ in range(2 * n_layers)]
+        past += [torch.randn(batch_size, cross_heads, example_len, cross_dim) for _ in range(2)]
+
+        dynamic_axes = {'s1_ids': seq_axes, 's2_ids': seq_axes, 'stamp': seq_axes, 's1_logits': {0: 'batch'}, 'context': {0: 'batch'}}
+        dynamic_axes.update({name: {0: 'batch', 2: 'past_seq'} for name in past_names})
+        dynamic_axes.update({name: {0: 'batch', 2: 'total_seq'} for name in present_names})
+        torch.onnx.export(
+            OnnxS1Step(model), (s1_ids, s2_ids, stamp, *past), os.path.join(output_dir, 'kronos_s1_step.onnx'),
+            input_names=['s1_ids', 's2_ids', 'stamp', *past_names], output_names=['s1_logits', 'context', *present_names],
+            dynamic_axes=dynamic_axes, opset_version=opset,
+        )
+
+        context = torch.randn(batch_size, 1, model.d_model)
+        torch.onnx.export(
+            OnnxS2Step(model), (context, s1_ids[:, :1], past[-2], past[-1]), os.path.join(output_dir, 'kronos_s2_step.onnx'),
+            input_names=['context', 's1_ids', 'cross_key', 'cross_value'], output_names=['s2_logits'],
+            dynamic_axes={'context': {0: 'batch'}, 's1_ids': {0: 'batch'}, 'cross_key': {0: 'batch', 2: 'seq'},
+                          'cross_value': {0: 'batch', 2: 'seq'}, 's2_logits': {0: 'batch'}},
+            opset_version=opset,
+        )
+
+    config = {
+        'n_layers': n_layers, 'n_heads': n_heads, 'head_dim': head_dim, 'cross_heads': cross_heads,
+        'cross_head_dim': cross_dim, 's1_bits': model.s1_bits, 's2_bits': model.s2_bits, 'opset': opset,
+    }
+    with open(os.path.join(output_dir, ONNX_CONFIG_NAME), 'w') as f:
+        json.dump(config, f, indent=2)
+    return output_dir
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Export a downloaded Kronos model to ONNX for the onnxruntime backend (model.onnx_backend.OnnxKronosPredictor).
+
+Usage: python scripts/export_onnx.py kronos-mini [--output models/kronos-mini/onnx] [--opset 17]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from model import Kronos, KronosTokenizer
+from model.onnx_export import DEFAULT_OPSET, export_onnx
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model', choices=list(Config.AVAILABLE_MODELS), help='Model to export')
+    parser.add_argument('--model-dir', default=Config.MODEL_DIR, help='Checkpoint directory (default: Config.MODEL_DIR)')
+    parser.add_argument('--output', default=None, help='Output directory (default: <model-dir>/<model>/onnx)')
+    parser.add_argument('--opset', type=int, default=DEFAULT_OPSET)
+    args = parser.parse_args()
+
+    model_path = os.path.join(args.model_dir, Config.AVAILABLE_MODELS[args.model]['path'])
+    output = args.output or os.path.join(model_path, 'onnx')
+
+    tokenizer = KronosTokenizer.from_pretrained(model_path).eval()
+    model = Kronos.from_pretrained(model_path).eval()
+    export_onnx(tokenizer, model, output, opset=args.opset)
+    print(f"✅ Exported {args.model} to {output}")
+
+
+if __name__ == '__main__':
+    main()
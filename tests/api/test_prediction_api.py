@@ -92,4 +92,32 @@ class TestPredictionHistory:
         assert record_data['id'] == sample_prediction.id
         assert record_data['stock_code'] == sample_prediction.stock_code
         assert record_data['status'] == 'completed'
-        assert 'prediction_data' in record_data
\ No newline at end of file
+        assert 'prediction_data' in record_data
+
+class TestPredictionStream:
+    """Test the server-sent event stream of forecast bars."""
+
+    def test_stream_events(self, client, app):
+        from unittest.mock import patch
+        bar = {'date': '2025-09-25', 'weekday': 'Thursday', 'open': 21.0, 'high': 21.2, 'low': 20.9,
+               'close': 21.1, 'volume': 1000.0, 'change_pct': 0.5}
+        events = [('bar', bar), ('bar', dict(bar, date='2025-09-26')),
+                  ('done', {'stock_code': '601688', 'prediction_results': [bar], 'time_to_first_bar': 0.01})]
+
+        with patch('app.api.prediction.prediction_service') as mock_service:
+            mock_service.predict_stock_stream.return_value = iter(events)
+            response = client.get('/api/predictions/stream?stock_code=601688&prediction_days=2&format=json')
+            body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert body.count('event: bar') == 2
+        assert 'event: done' in body
+        assert '"time_to_first_bar": 0.01' in body
+
+        record = PredictionRecord.query.order_by(PredictionRecord.id.desc()).first()
+        assert record.status == 'completed'
+
+    def test_stream_requires_stock_code(self, client):
+        response = client.get('/api/predictions/stream')
+        assert response.status_code == 400
@@ -87,4 +87,83 @@ def failed_prediction(app):
         
         # Refresh the object to maintain session binding
         db.session.refresh(record)
-        return record
\ No newline at end of file
+        return record
+
+# Architecture of the tiny test model, as stored in the config.json of its checkpoints
+TINY_CONFIG = {
+    's1_bits': 4, 's2_bits': 4, 'n_layers': 2, 'd_model': 32, 'n_heads': 4, 'ff_dim': 64,
+    'ffn_dropout_p': 0.0, 'attn_dropout_p': 0.0, 'resid_dropout_p': 0.0, 'token_dropout_p': 0.0, 'learn_te': True
+}
+
+
+@pytest.fixture
+def tiny_kronos():
+    """Randomly initialised (tokenizer, model) pair small enough for CPU unit tests."""
+    import torch
+    from model import Kronos, KronosTokenizer
+
+    torch.manual_seed(0)
+    # The tokenizer KronosTokenizer.from_pretrained builds from TINY_CONFIG
+    tokenizer = KronosTokenizer(
+        d_in=6, d_model=TINY_CONFIG['d_model'], n_heads=TINY_CONFIG['n_heads'], ff_dim=TINY_CONFIG['ff_dim'],
+        n_enc_layers=2, n_dec_layers=2, ffn_dropout_p=0.0, attn_dropout_p=0.0, resid_dropout_p=0.0,
+        s1_bits=TINY_CONFIG['s1_bits'], s2_bits=TINY_CONFIG['s2_bits'], beta=0.25, gamma0=0.1, gamma=0.1, zeta=1.0,
+        group_size=4
+    )
+    model = Kronos(**TINY_CONFIG)
+    return tokenizer.eval(), model.eval()
+
+
+@pytest.fixture
+def tiny_config():
+    """Architecture of tiny_kronos, as keyword arguments of Kronos."""
+    return dict(TINY_CONFIG)
+
+
+@pytest.fixture
+def write_checkpoint(tiny_kronos, tmp_path):
+    """
+    Returns write(name, safetensors=False), which saves tiny_kronos as a checkpoint directory tmp_path/name and returns
+    its path: config.json plus pytorch_model.bin or model.safetensors holding the model and, under 'tokenizer.', the
+    tokenizer, so both from_pretrained methods load from it.
+    """
+    import json
+    import torch
+
+    tokenizer, model = tiny_kronos
+
+    def write(name, safetensors=False):
+        path = tmp_path / name
+        path.mkdir()
+        (path / 'config.json').write_text(json.dumps(TINY_CONFIG))
+        state_dict = {**model.state_dict(), **{f'tokenizer.{k}': v for k, v in tokenizer.state_dict().items()}}
+        if safetensors:
+            from safetensors.torch import save_file
+            save_file({k: v.contiguous() for k, v in state_dict.items()}, str(path / 'model.safetensors'))
+        else:
+            torch.save(state_dict, path / 'pytorch_model.bin')
+        return path
+
+    return write
+
+
+@pytest.fixture
+def sample_series():
+    """Normalised history, history stamps and future stamps for a batch of two series."""
+    import torch
+
+    generator = torch.Generator().manual_seed(42)
+    x = torch.randn(2, 24, 6, generator=generator)
+    x_stamp = torch.stack([
+        torch.zeros(2, 24), torch.zeros(2, 24),
+        torch.randint(0, 7, (2, 24), generator=generator).float(),
+        torch.randint(1, 32, (2, 24), generator=generator).float(),
+        torch.randint(1, 13, (2, 24), generator=generator).float(),
+    ], dim=-1)
+    y_stamp = torch.stack([
+        torch.zeros(2, 12), torch.zeros(2, 12),
+        torch.randint(0, 7, (2, 12), generator=generator).float(),
+        torch.randint(1, 32, (2, 12), generator=generator).float(),
+        torch.randint(1, 13, (2, 12), generator=generator).float(),
+    ], dim=-1)
+    return x, x_stamp, y_stamp
@@ -0,0 +1,88 @@
+import pytest
+import torch
+
+from model.module import (
+    ATTENTION_BACKENDS, causal_mask, fused_scaled_dot_product_attention, get_attention_backend,
+    scaled_dot_product_attention, set_attention_backend,
+)
+
+
+@pytest.fixture
+def qkv():
+    generator = torch.Generator().manual_seed(0)
+    return tuple(torch.randn(2, 4, 24, 8, generator=generator) for _ in range(3))
+
+
+@pytest.fixture
+def restore_backend():
+    previous = get_attention_backend()
+    yield
+    set_attention_backend(previous)
+
+
+class TestFusedAttention:
+    """Test the fused SDPA backend against the reference implementation."""
+
+    @pytest.mark.parametrize('is_causal', [False, True])
+    def test_matches_reference_without_mask(self, qkv, is_causal):
+        q, k, v = qkv
+        expected = scaled_dot_product_attention(q, k, v, is_causal=is_causal)
+        actual = fused_scaled_dot_product_attention(q, k, v, is_causal=is_causal)
+        assert torch.allclose(actual, expected, atol=1e-5)
+
+    def test_matches_reference_with_bool_mask(self, qkv):
+        """Bool masks keep the reference convention where True blocks attention."""
+        q, k, v = qkv
+        padding = torch.zeros(2, 24, dtype=torch.bool)
+        padding[1, :5] = True
+        mask = padding[:, None, None, :].expand(-1, 4, 24, -1)
+
+        expected = scaled_dot_product_attention(q, k, v, attn_mask=mask)
+        actual = fused_scaled_dot_product_attention(q, k, v, attn_mask=mask)
+        assert torch.allclose(actual, expected, atol=1e-5)
+
+    def test_matches_reference_with_float_mask(self, qkv):
+        q, k, v = qkv
+        mask = torch.randn(24, 24)
+        expected = scaled_dot_product_attention(q, k, v, attn_mask=mask)
+        actual = fused_scaled_dot_product_attention(q, k, v, attn_mask=mask)
+        assert torch.allclose(actual, expected, atol=1e-5)
+
+    def test_causal_with_padding_mask(self, qkv):
+        """A padding mask combined with is_causal equals the reference given the merged mask."""
+        q, k, v = qkv
+        padding = torch.zeros(2, 1, 1, 24, dtype=torch.bool)
+        padding[0, ..., 20:] = True
+
+        expected = scaled_dot_product_attention(q, k, v, attn_mask=padding | causal_mask(24, 24))
+        actual = fused_scaled_dot_product_attention(q, k, v, attn_mask=padding, is_causal=True)
+        assert torch.allclose(actual, expected, atol=1e-5)
+
+    def test_causal_mask_is_cached(self):
+        storage = causal_mask(8, 12, offset=4).untyped_storage().data_ptr()
+        assert causal_mask(3, 5, offset=2).untyped_storage().data_ptr() == storage
+        assert torch.equal(causal_mask(3, 3), ~torch.ones(3, 3, dtype=torch.bool).tril())
+        assert torch.equal(causal_mask(8, 12, offset=4), torch.ones(8, 12, dtype=torch.bool).triu(diagonal=5))
+        # A longer sequence grows the cached mask
+        assert torch.equal(causal_mask(2, 40, offset=30), torch.ones(2, 40, dtype=torch.bool).triu(diagonal=31))
+
+    def test_unknown_backend_raises(self, restore_backend):
+        with pytest.raises(ValueError):
+            set_attention_backend('cudnn')
+
+    @pytest.mark.parametrize('backend', [b for b in ATTENTION_BACKENDS if b != 'reference'])
+    def test_model_logits_match_reference_backend(self, tiny_kronos, restore_backend, backend):
+        _, model = tiny_kronos
+        s1_ids = torch.randint(0, 16, (2, 20))
+        s2_ids = torch.randint(0, 16, (2, 20))
+
+        with torch.no_grad():
+            set_attention_backend('reference')
+            expected, _ = model.decode_s1(s1_ids, s2_ids)
+            set_attention_backend(backend)
+            try:
+                actual, _ = model.decode_s1(s1_ids, s2_ids)
+            except RuntimeError as e:
+                pytest.skip(f"SDPA kernel '{backend}' not available on this device: {e}")
+
+        assert torch.allclose(actual, expected, atol=1e-4)
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from app.services.scheduler_service import InferenceScheduler
+from model import KronosPredictor
+from model.batching import ContinuousBatcher, GenerationRequest
+from model.kronos import auto_regressive_inference
+
+# (history length, pred_len, sample_count)
+SPECS = [(24, 8, 2), (10, 5, 1), (17, 12, 3), (5, 3, 2)]
+
+
+def make_request(rng, history_len, pred_len, sample_count):
+    x = rng.normal(size=(history_len, 6)).astype(np.float32)
+    x_stamp = rng.integers(0, 7, (history_len, 5)).astype(np.float32)
+    y_stamp = rng.integers(0, 7, (pred_len, 5)).astype(np.float32)
+    return GenerationRequest(x, x_stamp, y_stamp, pred_len, top_k=1, sample_count=sample_count)
+
+
+def make_series(rng, length, pred_len):
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+    df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+                       'volume': rng.uniform(1e3, 1e4, length)})
+    dates = pd.Series(pd.bdate_range('2024-01-01', periods=length + pred_len))
+    return df, dates[:length], dates[length:].reset_index(drop=True)
+
+
+class TestContinuousBatching:
+    """Test that requests joining and leaving a running batch forecast exactly like separate calls."""
+
+    @pytest.mark.parametrize('max_rows', [64, 5, 1])
+    def test_matches_separate_calls(self, tiny_kronos, max_rows):
+        """Greedy decoding makes both paths deterministic; small max_rows forces requests to queue and join later."""
+        tokenizer, model = tiny_kronos
+        rng = np.random.default_rng(0)
+        requests = [make_request(rng, *spec) for spec in SPECS]
+        batcher = ContinuousBatcher(tokenizer, model, max_rows=max_rows)
+
+        batcher.add(requests[0])
+        finished = batcher.step() + batcher.step()
+        for request in requests[1:]:
+            batcher.add(request)
+        while batcher.has_work():
+            assert batcher.num_rows <= max(max_rows, 3)
+            finished += batcher.step()
+
+        assert sorted(map(id, finished)) == sorted(map(id, requests))
+        for request in requests:
+            expected = auto_regressive_inference(tokenizer, model, torch.from_numpy(request.x)[None], torch.from_numpy(request.x_stamp)[None],
+                                                 torch.from_numpy(request.y_stamp)[None], 512, request.pred_len, top_k=1,
+                                                 sample_count=request.sample_count)
+            np.testing.assert_allclose(request.preds, expected[0, -request.pred_len:], atol=1e-5)
+
+    def test_rejects_requests_beyond_max_context(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        batcher = ContinuousBatcher(tokenizer, model, max_context=16)
+        request = make_request(np.random.default_rng(0), 12, 8, 1)
+        assert not batcher.fits(request)
+        with pytest.raises(ValueError):
+            batcher.add(request)
+
+    def test_scheduler_concurrent_submits(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        predictor = KronosPredictor(model, tokenizer, device='cpu', max_context=32)
+        scheduler = InferenceScheduler(predictor, max_batch_rows=4)
+        rng = np.random.default_rng(0)
+        # The last series does not fit in max_context and runs unbatched on the worker thread
+        series = [make_series(rng, length, 4) for length in (20, 12, 25, 16, 30)]
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(series)) as pool:
+                futures = list(pool.map(lambda s: scheduler.submit(*s, pred_len=4, top_k=1), series))
+                results = [future.result(timeout=60) for future in futures]
+        finally:
+            scheduler.shutdown()
+
+        for (df, x_timestamp, y_timestamp), result in zip(series, results):
+            expected = predictor.predict(df, x_timestamp, y_timestamp, pred_len=4, top_k=1, verbose=False)
+            pd.testing.assert_frame_equal(result, expected, rtol=1e-4)
+        stats = scheduler.get_stats()
+        assert stats['completed'] == len(series)
+        assert stats['unbatched'] == 1
+        with pytest.raises(RuntimeError):
+            scheduler.submit(*series[0], pred_len=4)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from model import KronosPredictor
+from model.kronos import sample_from_logits
+from model.module import RMSNorm, cast_to_bfloat16
+
+
+@pytest.fixture
+def price_frame():
+    rng = np.random.default_rng(0)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, 40)))
+    df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+                       'volume': rng.uniform(1e5, 2e5, 40)})
+    dates = pd.Series(pd.bdate_range('2024-01-01', periods=45))
+    return df, dates[:40].reset_index(drop=True), dates[40:].reset_index(drop=True)
+
+
+class TestBfloat16:
+    """Test the bf16 autocast mode of KronosPredictor."""
+
+    def test_weights_stored_in_bf16_except_norms(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        cast_to_bfloat16(model)
+        cast_to_bfloat16(tokenizer)
+
+        assert model.transformer[0].ffn.w1.weight.dtype == torch.bfloat16
+        assert model.embedding.emb_s1.weight.dtype == torch.bfloat16
+        assert all(m.weight.dtype == torch.float32 for m in model.modules() if isinstance(m, RMSNorm))
+        assert model.transformer[0].self_attn.rotary.inv_freq.dtype == torch.float32
+        assert tokenizer.tokenizer.bsq.group_codebook.dtype == torch.float32
+
+    def test_sampling_in_fp32(self):
+        logits = torch.randn(4, 16).to(torch.bfloat16)
+        sample = sample_from_logits(logits, top_k=0, top_p=0.99)
+        assert sample.shape == (4, 1)
+
+    def test_predict_close_to_fp32(self, tiny_kronos, price_frame):
+        df, x_timestamp, y_timestamp = price_frame
+        tokenizer, model = tiny_kronos
+        fp32 = KronosPredictor(model, tokenizer, device='cpu')
+        torch.manual_seed(0)
+        ref = fp32.predict(df, x_timestamp, y_timestamp, pred_len=5, sample_count=4, verbose=False)
+
+        bf16 = KronosPredictor(model, tokenizer, device='cpu', precision='bf16')
+        torch.manual_seed(0)
+        pred = bf16.predict(df, x_timestamp, y_timestamp, pred_len=5, sample_count=4, verbose=False)
+
+        assert pred.shape == ref.shape
+        assert np.isfinite(pred.values).all()
+        assert np.allclose(pred['close'], ref['close'], rtol=0.2)
+
+    def test_rejects_unknown_precision(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        with pytest.raises(ValueError):
+            KronosPredictor(model, tokenizer, device='cpu', precision='fp16')
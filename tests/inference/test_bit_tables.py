@@ -0,0 +1,69 @@
+import pytest
+import torch
+
+from model.module import BinarySphericalQuantizer, BSQuantizer
+
+
+def reference_indices_to_bits(x, codebook_dim, half=False):
+    """`KronosTokenizer.indices_to_bits` with per-call bit masks, as before the lookup tables."""
+    if half:
+        mask = 2 ** torch.arange(codebook_dim // 2, dtype=torch.long)
+        x = torch.cat([(x[0].unsqueeze(-1) & mask) != 0, (x[1].unsqueeze(-1) & mask) != 0], dim=-1)
+    else:
+        x = (x.unsqueeze(-1) & 2 ** torch.arange(codebook_dim, dtype=torch.long)) != 0
+    return (x.float() * 2 - 1) * (1. / (codebook_dim ** 0.5))
+
+
+def reference_bits_to_indices(bits):
+    bits = (bits >= 0).to(torch.long)
+    return (bits * 2 ** torch.arange(bits.shape[-1], dtype=torch.long)).sum(-1)
+
+
+@pytest.fixture
+def quantizer():
+    return BSQuantizer(6, 6, beta=0.25, gamma0=0.1, gamma=0.1, zeta=1.0, group_size=4).eval()
+
+
+class TestBitTables:
+    """Test that the table-based bit conversions reproduce the bitwise ones exactly."""
+
+    def test_decode_every_index(self, quantizer):
+        s1_ids, s2_ids = torch.cartesian_prod(torch.arange(64), torch.arange(64)).T.reshape(2, 64, 64)
+        assert torch.equal(quantizer.indices_to_bits([s1_ids, s2_ids], half=True), reference_indices_to_bits([s1_ids, s2_ids], 12, half=True))
+
+        full = torch.arange(2 ** 12).view(8, -1)
+        assert torch.equal(quantizer.indices_to_bits(full), reference_indices_to_bits(full, 12))
+
+    def test_encode_matches_forward(self, quantizer):
+        z = torch.randn(3, 50, 12)
+        z[0, 0] = 0
+        z[0, 1, :4] = 0
+        _, quantized, (s1_ids, s2_ids) = quantizer(z, half=True)
+
+        actual_s1, actual_s2 = quantizer.indices(z, half=True)
+        assert torch.equal(actual_s1, reference_bits_to_indices(quantized[..., :6]))
+        assert torch.equal(actual_s2, reference_bits_to_indices(quantized[..., 6:]))
+        assert torch.equal(actual_s1, s1_ids) and torch.equal(actual_s2, s2_ids)
+        assert torch.equal(quantizer.indices(z), reference_bits_to_indices(quantized))
+        assert torch.equal(quantizer.indices_to_bits(quantizer.indices(z)), quantized)
+
+    def test_codes_to_indexes(self):
+        bsq = BinarySphericalQuantizer(8, 0.25, 0.1, 0.1, 1.0, group_size=4)
+        codes = torch.randint(0, 2, (5, 7, 8)).float() * 2 - 1
+
+        assert torch.equal(bsq.codes_to_indexes(codes), ((codes + 1) / 2 * bsq.basis).sum(-1).to(torch.int64))
+        assert torch.equal(bsq.indexes_to_codes(bsq.codes_to_indexes(codes)).float(), codes)
+        assert torch.equal(bsq.group_indexes_to_codes(bsq.codes_to_group_indexes(codes)).float(), codes)
+
+    def test_tokenizer_round_trip(self, tiny_kronos, sample_series):
+        tokenizer, _ = tiny_kronos
+        x, _, _ = sample_series
+        with torch.no_grad():
+            z = tokenizer.embed(x)
+            for layer in tokenizer.encoder:
+                z = layer(z)
+            _, quantized, (expected_s1, expected_s2) = tokenizer.tokenizer(tokenizer.quant_embed(z), half=True)
+            s1_ids, s2_ids = tokenizer.encode(x, half=True)
+
+        assert torch.equal(s1_ids, expected_s1) and torch.equal(s2_ids, expected_s2)
+        assert torch.equal(tokenizer.indices_to_bits([s1_ids, s2_ids], half=True), quantized)
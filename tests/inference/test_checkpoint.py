@@ -0,0 +1,102 @@
+import json
+
+import pytest
+import torch
+import torch.nn as nn
+
+from model import Kronos, KronosTokenizer
+from model.checkpoint import build_with_state_dict, empty_parameters, load_checkpoint, load_safetensors
+
+safetensors_torch = pytest.importorskip('safetensors.torch')
+
+
+@pytest.fixture
+def checkpoint(write_checkpoint):
+    """A model directory with model.safetensors holding the tiny model and, under 'tokenizer.', its tokenizer."""
+    return write_checkpoint('checkpoint', safetensors=True)
+
+
+class TestMappedLoading:
+    """Test loading checkpoints as views into a memory-mapped file."""
+
+    def test_matches_safetensors_load(self, checkpoint):
+        expected = safetensors_torch.load_file(str(checkpoint / 'model.safetensors'))
+        state_dict = load_safetensors(str(checkpoint / 'model.safetensors'))
+
+        assert sorted(state_dict) == sorted(expected)
+        for key, value in expected.items():
+            assert state_dict[key].dtype == value.dtype
+            assert torch.equal(state_dict[key], value)
+
+    def test_loads_are_copy_on_write(self, checkpoint):
+        first = load_checkpoint(str(checkpoint))
+        key = 'embedding.emb_s1.weight'
+        first[key].zero_()
+
+        assert torch.count_nonzero(load_checkpoint(str(checkpoint))[key]) > 0
+        assert torch.count_nonzero(safetensors_torch.load_file(str(checkpoint / 'model.safetensors'))[key]) > 0
+
+    def test_from_pretrained_assigns_mapped_tensors(self, tiny_kronos, checkpoint):
+        tokenizer, model = tiny_kronos
+        loaded_model = Kronos.from_pretrained(str(checkpoint), fuse=False)
+        loaded_tokenizer = KronosTokenizer.from_pretrained(str(checkpoint), fuse=False)
+
+        for loaded, module in ((loaded_model, model), (loaded_tokenizer, tokenizer)):
+            for key, value in module.state_dict().items():
+                torch.testing.assert_close(loaded.state_dict()[key], value)
+            assert not any(p.is_meta for p in loaded.parameters())
+        # No copy: parameters lie in the mapping as they lie in the file, and computed buffers are still built
+        with open(checkpoint / 'model.safetensors', 'rb') as f:
+            header = json.loads(f.read(int.from_bytes(f.read(8), 'little')))
+        offset = header['head.proj_s1.weight']['data_offsets'][0] - header['embedding.emb_s1.weight']['data_offsets'][0]
+        assert loaded_model.head.proj_s1.weight.data_ptr() - loaded_model.embedding.emb_s1.weight.data_ptr() == offset
+        assert loaded_model.transformer[0].self_attn.rotary.inv_freq.device.type == 'cpu'
+        assert loaded_tokenizer.tokenizer.bit_table.abs().sum() > 0
+
+    def test_init_skipped(self, monkeypatch, tiny_config):
+        calls = []
+        monkeypatch.setattr(nn.init, 'xavier_normal_', lambda tensor: calls.append(tensor.device.type))
+        with empty_parameters():
+            model = Kronos(**tiny_config)
+
+        assert set(calls) == {'meta'}
+        assert all(p.is_meta for p in model.parameters())
+        assert nn.Linear(2, 2).weight.device.type == 'cpu'
+
+    def test_init_skipped_only_in_calling_thread(self, tiny_config):
+        import threading
+
+        entered, built = threading.Event(), threading.Event()
+        other = []
+
+        def build_elsewhere():
+            entered.wait(10)
+            other.append(nn.Linear(2, 2))
+            built.set()
+
+        thread = threading.Thread(target=build_elsewhere)
+        thread.start()
+        with empty_parameters():
+            entered.set()
+            built.wait(10)
+            model = Kronos(**tiny_config)
+        thread.join()
+
+        assert all(p.is_meta for p in model.parameters())
+        assert other[0].weight.device.type == 'cpu'
+        assert nn.Module.register_parameter.__name__ == 'register_parameter'
+
+    def test_missing_parameters_keep_initialisation(self, tiny_kronos, tiny_config):
+        _, model = tiny_kronos
+        state_dict = {k: v for k, v in model.state_dict().items() if not k.startswith('head.')}
+        loaded = build_with_state_dict(lambda: Kronos(**tiny_config), state_dict)
+
+        assert not any(p.is_meta for p in loaded.parameters())
+        torch.testing.assert_close(loaded.embedding.emb_s1.weight, model.embedding.emb_s1.weight)
+        assert loaded.head.proj_s1.weight.requires_grad
+
+    def test_pytorch_bin(self, tiny_kronos, write_checkpoint):
+        _, model = tiny_kronos
+        loaded = Kronos.from_pretrained(str(write_checkpoint('checkpoint')), fuse=False)
+        for key, value in model.state_dict().items():
+            torch.testing.assert_close(loaded.state_dict()[key], value)
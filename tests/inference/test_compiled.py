@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from model import KronosPredictor
+from model.compiled import CompiledKronos, CompiledKronosTokenizer, batch_bucket, bucket, model_fingerprint
+from model.kronos import auto_regressive_inference
+
+
+def generate(tokenizer, model, sample_series, max_context=512, rolling_cache=False):
+    x, x_stamp, y_stamp = sample_series
+    torch.manual_seed(0)
+    return auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context=max_context, pred_len=6,
+                                     sample_count=3, rolling_cache=rolling_cache)
+
+
+class TestCompiledDecoding:
+    """Test the TorchScript-compiled tokenizer and decoding steps."""
+
+    def test_bucket(self):
+        assert bucket(1, 64) == 64
+        assert bucket(64, 64) == 64
+        assert bucket(65, 64) == 128
+        assert bucket(6, 1) == 6
+        assert [batch_bucket(n) for n in (1, 2, 3, 5, 64, 65, 130)] == [1, 2, 4, 8, 64, 128, 192]
+
+    @pytest.mark.parametrize('max_context', [512, 26])
+    def test_matches_eager(self, tiny_kronos, sample_series, max_context):
+        """Cached steps run compiled; past max_context the eager window recompute takes over."""
+        tokenizer, model = tiny_kronos
+        expected = generate(tokenizer, model, sample_series, max_context)
+        actual = generate(CompiledKronosTokenizer(tokenizer), CompiledKronos(model), sample_series, max_context)
+
+        np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+    def test_rolling_cache_falls_back_to_eager(self, tiny_kronos, sample_series):
+        tokenizer, model = tiny_kronos
+        expected = generate(tokenizer, model, sample_series, max_context=26, rolling_cache=True)
+        compiled_model = CompiledKronos(model)
+        actual = generate(tokenizer, compiled_model, sample_series, max_context=26, rolling_cache=True)
+
+        np.testing.assert_allclose(actual, expected, atol=1e-5)
+        assert not any(name.startswith('s1_step') for name in compiled_model.artifacts.graphs)
+
+    def test_warm_restart_loads_cached_graphs(self, tiny_kronos, sample_series, tmp_path, mocker):
+        tokenizer, model = tiny_kronos
+        expected = generate(CompiledKronosTokenizer(tokenizer, str(tmp_path)), CompiledKronos(model, str(tmp_path)), sample_series)
+        names = sorted(os.listdir(tmp_path))
+        assert [name.split('-')[0] for name in names] == ['decode', 'encode', 's1_step', 's2_step']
+
+        trace = mocker.spy(torch.jit, 'trace')
+        actual = generate(CompiledKronosTokenizer(tokenizer, str(tmp_path)), CompiledKronos(model, str(tmp_path)), sample_series)
+
+        assert trace.call_count == 0
+        np.testing.assert_allclose(actual, expected)
+
+    @pytest.mark.parametrize('quantize', [False, True])
+    def test_loaded_graphs_share_weights(self, tiny_kronos, sample_series, tmp_path, quantize):
+        tokenizer, model = tiny_kronos
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        expected = generate(tokenizer, CompiledKronos(model, str(tmp_path)), sample_series)
+        compiled_model = CompiledKronos(model, str(tmp_path))
+        actual = generate(tokenizer, compiled_model, sample_series)
+
+        np.testing.assert_allclose(actual, expected)
+        # Two series with sample_count=3 run in the graphs of the 8-row bucket
+        graph = compiled_model.artifacts.graphs['s1_step-b8-c64-cpu-sdpa']
+        live = dict(model.named_modules())
+        for name, submodule in graph.model.named_modules():
+            for attr, tensor in submodule.named_parameters(recurse=False):
+                assert tensor.data_ptr() == getattr(live[name], attr).data_ptr()
+            if quantize and submodule.original_name == 'LinearPackedParams':
+                assert hash(submodule._packed_params) == hash(live[name]._packed_params)
+
+    def test_new_weights_get_new_artifacts(self, tiny_kronos, tmp_path):
+        tokenizer, model = tiny_kronos
+        before = CompiledKronos(model, str(tmp_path)).artifacts.fingerprint
+        with torch.no_grad():
+            model.head.proj_s1.bias.add_(1.0)
+        assert CompiledKronos(model, str(tmp_path)).artifacts.fingerprint != before
+
+    def test_fingerprint_hashes_weight_bytes(self, tiny_kronos):
+        import copy
+        _, model = tiny_kronos
+        before = model_fingerprint(model)
+        # Same sums, different weights: a permutation and a sign swap
+        permuted = copy.deepcopy(model)
+        with torch.no_grad():
+            permuted.head.proj_s1.weight.copy_(permuted.head.proj_s1.weight.flip(0))
+        assert model_fingerprint(permuted) != before
+        signs = [copy.deepcopy(model), copy.deepcopy(model)]
+        with torch.no_grad():
+            signs[0].head.proj_s1.weight[0, :2] = torch.tensor([0.25, -0.25])
+            signs[1].head.proj_s1.weight[0, :2] = torch.tensor([-0.25, 0.25])
+        assert model_fingerprint(signs[0]) != model_fingerprint(signs[1])
+
+    def test_fingerprint_covers_int8_weights(self, tiny_kronos):
+        import copy
+        _, model = tiny_kronos
+        quantized = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model), {torch.nn.Linear}, dtype=torch.qint8)
+        changed = copy.deepcopy(model)
+        with torch.no_grad():
+            changed.head.proj_s1.weight.copy_(changed.head.proj_s1.weight.flip(0))
+        changed = torch.ao.quantization.quantize_dynamic(changed, {torch.nn.Linear}, dtype=torch.qint8)
+        assert model_fingerprint(quantized) != model_fingerprint(changed)
+
+    def test_predictor_rejects_compiled_bf16(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        with pytest.raises(ValueError):
+            KronosPredictor(model, tokenizer, device='cpu', precision='bf16', compiled=True)
@@ -0,0 +1,76 @@
+import pytest
+import torch
+
+from model.kronos import DecodeState, auto_regressive_inference
+
+
+def reference_dynamic_stamp(x_stamp, y_stamp, current_seq_len, pred_step, max_context):
+    """The stamp window previously rebuilt with torch.cat on every step."""
+    if current_seq_len <= max_context - pred_step:
+        return torch.cat([x_stamp, y_stamp[:, :pred_step, :]], dim=1)
+    start_idx = max_context - pred_step
+    return torch.cat([x_stamp[:, -start_idx:, :], y_stamp[:, :pred_step, :]], dim=1)
+
+
+class TestDecodeState:
+    """Test the preallocated decode buffers."""
+
+    @pytest.mark.parametrize('max_context', [64, 24, 18])
+    def test_windows_match_previous_slicing(self, sample_series, max_context):
+        _, x_stamp, y_stamp = sample_series
+        s1 = torch.randint(0, 16, (2, 24))
+        s2 = torch.randint(0, 16, (2, 24))
+        state = DecodeState([s1, s2], x_stamp, y_stamp, 12, max_context)
+        history = [s1, s2]
+
+        for i in range(12):
+            expected_stamp = reference_dynamic_stamp(x_stamp, y_stamp, 24 + i, i, max_context)
+            s1_ids, s2_ids = state.tokens()
+            assert torch.equal(state.stamps(), expected_stamp)
+            assert torch.equal(s1_ids, history[0][:, -max_context:])
+            assert torch.equal(s2_ids, history[1][:, -max_context:])
+
+            new_s1 = torch.randint(0, 16, (2, 1))
+            new_s2 = torch.randint(0, 16, (2, 1))
+            state.append(new_s1, new_s2)
+            history = [torch.cat([history[0], new_s1], dim=1), torch.cat([history[1], new_s2], dim=1)]
+
+    def test_buffers_are_written_in_place(self, sample_series):
+        _, x_stamp, y_stamp = sample_series
+        state = DecodeState([torch.zeros(2, 24, dtype=torch.long)] * 2, x_stamp, y_stamp, 12, 512)
+        s1_ptr = state.s1.data_ptr()
+
+        for _ in range(12):
+            state.append(torch.ones(2, 1, dtype=torch.long), torch.ones(2, 1, dtype=torch.long))
+
+        assert state.s1.data_ptr() == s1_ptr
+        assert state.length == 36
+        assert state.tokens()[0][:, -12:].eq(1).all()
+
+
+class TestSharedHistory:
+    """Test that the history is encoded once per series and broadcast to the samples."""
+
+    def test_history_broadcast_to_sample_rows(self, sample_series):
+        _, x_stamp, y_stamp = sample_series
+        s1 = torch.randint(0, 16, (2, 24))
+        s2 = torch.randint(0, 16, (2, 24))
+        state = DecodeState([s1, s2], x_stamp, y_stamp, 12, 512, sample_count=3)
+
+        s1_ids, s2_ids = state.tokens()
+        assert s1_ids.shape == (6, 24)
+        assert torch.equal(s1_ids, s1.repeat_interleave(3, dim=0))
+        assert torch.equal(s2_ids, s2.repeat_interleave(3, dim=0))
+        assert torch.equal(state.stamps(), x_stamp.repeat_interleave(3, dim=0))
+        assert torch.equal(state.tokens(per_series=True)[0], s1)
+
+    def test_tokenizer_encodes_each_series_once(self, tiny_kronos, sample_series, mocker):
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+        encode = mocker.spy(tokenizer, 'encode')
+
+        preds = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 512, 4, sample_count=5)
+
+        assert encode.call_count == 1
+        assert encode.call_args[0][0].shape[0] == 2
+        assert preds.shape == (2, 28, 6)
@@ -0,0 +1,45 @@
+import torch
+
+
+class TestDecodeStep:
+    """Test the last-position-only generation API."""
+
+    def test_step_logits_match_full_decode(self, tiny_kronos, sample_series):
+        _, model = tiny_kronos
+        _, x_stamp, _ = sample_series
+        s1_ids = torch.randint(0, 16, (2, 24))
+        s2_ids = torch.randint(0, 16, (2, 24))
+        sampled = torch.randint(0, 16, (2, 1))
+
+        with torch.no_grad():
+            s1_logits, context = model.decode_s1(s1_ids, s2_ids, x_stamp)
+            s2_logits = model.decode_s2(context, sampled)
+
+            step_s1_logits, step_context = model.decode_s1_step(s1_ids, s2_ids, x_stamp)
+            step_s2_logits = model.decode_s2_step(step_context, sampled)
+
+        assert step_s1_logits.shape == (2, 16)
+        assert torch.allclose(step_s1_logits, s1_logits[:, -1], atol=1e-5)
+        assert torch.allclose(step_s2_logits, s2_logits[:, -1], atol=1e-5)
+
+    def test_cached_steps_match_full_decode(self, tiny_kronos, sample_series):
+        """The dependency-aware layer reads its keys/values from the cache filled by decode_s1_step."""
+        _, model = tiny_kronos
+        _, x_stamp, _ = sample_series
+        s1_ids = torch.randint(0, 16, (2, 24))
+        s2_ids = torch.randint(0, 16, (2, 24))
+
+        with torch.no_grad():
+            kv_cache = model.init_kv_cache()
+            model.decode_s1_step(s1_ids[:, :20], s2_ids[:, :20], x_stamp[:, :20], kv_cache=kv_cache)
+            for t in range(20, 24):
+                sampled = torch.randint(0, 16, (2, 1))
+                step_s1_logits, context = model.decode_s1_step(s1_ids[:, t:t + 1], s2_ids[:, t:t + 1], x_stamp[:, t:t + 1], kv_cache=kv_cache)
+                step_s2_logits = model.decode_s2_step(context, sampled, kv_cache=kv_cache)
+
+                s1_logits, full_context = model.decode_s1(s1_ids[:, :t + 1], s2_ids[:, :t + 1], x_stamp[:, :t + 1])
+                s2_logits = model.decode_s2(full_context, sampled)
+                assert torch.allclose(step_s1_logits, s1_logits[:, -1], atol=1e-5)
+                assert torch.allclose(step_s2_logits, s2_logits[:, -1], atol=1e-5)
+
+        assert kv_cache[-1].seq_len == 24
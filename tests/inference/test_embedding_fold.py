@@ -0,0 +1,79 @@
+import copy
+
+import numpy as np
+import torch
+
+from model import KronosPredictor
+from model.module import HierarchicalEmbedding, TemporalEmbedding, fold_embeddings
+
+
+class TestFoldedEmbeddings:
+    """Test that the folded lookup tables reproduce the token and time embeddings."""
+
+    def test_hierarchical_matches_projection(self):
+        embedding = HierarchicalEmbedding(4, 3, 16).eval()
+        s1_ids, s2_ids = torch.randint(0, 16, (2, 7)), torch.randint(0, 8, (2, 7))
+        expected = embedding([s1_ids, s2_ids])
+        embedding.fold()
+
+        assert embedding.folded.shape == (16 + 8, 16)
+        torch.testing.assert_close(embedding([s1_ids, s2_ids]), expected)
+
+    def test_temporal_matches_sum(self):
+        stamps = torch.stack([torch.randint(0, size, (3, 9)) for size in (60, 24, 7, 32, 13)], dim=-1).float()
+        for learn_pe in (True, False):
+            embedding = TemporalEmbedding(16, learn_pe).eval()
+            expected = embedding(stamps)
+            embedding.fold()
+            torch.testing.assert_close(embedding(stamps), expected)
+
+    def test_model_outputs_unchanged(self, tiny_kronos, sample_series):
+        x, x_stamp, _ = sample_series
+        tokenizer, model = tiny_kronos
+        folded = fold_embeddings(copy.deepcopy(model))
+        s1_ids, s2_ids = tokenizer.encode(x, half=True)
+
+        with torch.no_grad():
+            expected = model(s1_ids, s2_ids, x_stamp, use_teacher_forcing=True, s1_targets=s1_ids)
+            for actual, reference in zip(folded(s1_ids, s2_ids, x_stamp, use_teacher_forcing=True, s1_targets=s1_ids), expected):
+                torch.testing.assert_close(actual, reference)
+
+    def test_training_drops_tables(self, tiny_kronos):
+        _, model = tiny_kronos
+        folded = fold_embeddings(copy.deepcopy(model))
+        assert sorted(folded.state_dict()) == sorted(model.state_dict())
+
+        folded.train()
+        assert folded.embedding.folded is None and folded.time_emb.folded is None
+        folded.eval()
+        assert folded.embedding.folded is not None and folded.time_emb.folded is not None
+        assert model.eval().embedding.folded is None
+
+    def test_load_state_dict_refolds(self, tiny_kronos, sample_series):
+        x, x_stamp, _ = sample_series
+        tokenizer, model = tiny_kronos
+        folded = fold_embeddings(copy.deepcopy(model))
+        other = copy.deepcopy(model)
+        with torch.no_grad():
+            for param in other.parameters():
+                param.mul_(1.5)
+        folded.load_state_dict(other.state_dict())
+        s1_ids, s2_ids = tokenizer.encode(x, half=True)
+
+        with torch.no_grad():
+            expected = other(s1_ids, s2_ids, x_stamp, use_teacher_forcing=True, s1_targets=s1_ids)
+            for actual, reference in zip(folded(s1_ids, s2_ids, x_stamp, use_teacher_forcing=True, s1_targets=s1_ids), expected):
+                # Scaled weights grow the logits and with them the rounding differences of the fold
+                torch.testing.assert_close(actual, reference, rtol=1e-4, atol=1e-4)
+
+    def test_predictor_folds(self, tiny_kronos, sample_series):
+        x, x_stamp, y_stamp = (t.numpy() for t in sample_series)
+        tokenizer, model = tiny_kronos
+        unfolded = copy.deepcopy(model)
+        predictor = KronosPredictor(model, tokenizer, device='cpu')
+        assert predictor.model.embedding.folded is not None
+
+        expected = KronosPredictor(unfolded, tokenizer, device='cpu')
+        expected.model.embedding.folded = expected.model.time_emb.folded = None
+        np.testing.assert_allclose(predictor.generate(x, x_stamp, y_stamp, 6, 1.0, 1, 1.0, 1, verbose=False),
+                                   expected.generate(x, x_stamp, y_stamp, 6, 1.0, 1, 1.0, 1, verbose=False), atol=1e-5)
@@ -0,0 +1,86 @@
+import copy
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from model import Kronos, KronosPredictor, KronosTokenizer
+from model.kronos import auto_regressive_inference
+from model.module import fuse_projections
+
+
+def fused_copy(tiny_kronos):
+    return tuple(fuse_projections(copy.deepcopy(module)) for module in tiny_kronos)
+
+
+class TestFusedProjections:
+    """Test the load-time fusion of q/k/v and w1/w3 into single linear layers."""
+
+    def test_fuses_every_stack(self, tiny_kronos):
+        tokenizer, model = fused_copy(tiny_kronos)
+
+        assert model.transformer[0].self_attn.qkv_proj.out_features == 3 * 32
+        assert model.transformer[0].ffn.w13.out_features == 2 * 64
+        assert model.dep_layer.cross_attn.kv_proj.out_features == 2 * 32
+        assert type(model.dep_layer.cross_attn.q_proj) is nn.Linear
+        assert tokenizer.encoder[0].self_attn.qkv_proj is not None
+        assert tokenizer.decoder[-1].ffn.w13 is not None
+        assert not hasattr(model.transformer[0].self_attn, 'q_proj')
+
+    def test_outputs_unchanged(self, tiny_kronos, sample_series):
+        x, x_stamp, y_stamp = sample_series
+        tokenizer, model = tiny_kronos
+        fused_tokenizer, fused_model = fused_copy(tiny_kronos)
+        s1_ids, s2_ids = tokenizer.encode(x, half=True)
+
+        with torch.no_grad():
+            expected = model(s1_ids, s2_ids, x_stamp, use_teacher_forcing=True, s1_targets=s1_ids)
+            actual = fused_model(s1_ids, s2_ids, x_stamp, use_teacher_forcing=True, s1_targets=s1_ids)
+            for a, b in zip(actual, expected):
+                torch.testing.assert_close(a, b)
+            for a, b in zip(fused_tokenizer.encode(x, half=True), (s1_ids, s2_ids)):
+                torch.testing.assert_close(a, b)
+            torch.testing.assert_close(fused_tokenizer.decode([s1_ids, s2_ids], half=True), tokenizer.decode([s1_ids, s2_ids], half=True))
+
+        preds = auto_regressive_inference(fused_tokenizer, fused_model, x, x_stamp, y_stamp, 16, pred_len=12, top_k=1, sample_count=2)
+        expected = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 16, pred_len=12, top_k=1, sample_count=2)
+        np.testing.assert_allclose(preds, expected, atol=1e-5)
+
+    def test_compiled_matches_eager(self, tiny_kronos, sample_series, tmp_path):
+        x, x_stamp, y_stamp = (t.numpy() for t in sample_series)
+        tokenizer, model = fused_copy(tiny_kronos)
+        eager = KronosPredictor(model, tokenizer, device='cpu')
+        compiled = KronosPredictor(model, tokenizer, device='cpu', compiled=True, compile_cache_dir=str(tmp_path))
+
+        expected = eager.generate(x, x_stamp, y_stamp, 6, 1.0, 1, 1.0, 1, verbose=False)
+        np.testing.assert_allclose(compiled.generate(x, x_stamp, y_stamp, 6, 1.0, 1, 1.0, 1, verbose=False), expected, atol=1e-5)
+
+    def test_state_dict_format_unchanged(self, tiny_kronos):
+        _, model = tiny_kronos
+        state_dict = model.state_dict()
+        _, fused_model = fused_copy(tiny_kronos)
+
+        fused_state = fused_model.state_dict()
+        assert sorted(fused_state) == sorted(state_dict)
+        for key, value in state_dict.items():
+            torch.testing.assert_close(fused_state[key], value)
+
+        # A checkpoint with separate layers loads straight into a fused model
+        for parameter in fused_model.parameters():
+            nn.init.zeros_(parameter)
+        fused_model.load_state_dict(state_dict)
+        torch.testing.assert_close(fused_model.state_dict()['transformer.0.self_attn.k_proj.weight'],
+                                   state_dict['transformer.0.self_attn.k_proj.weight'])
+
+    def test_from_pretrained(self, write_checkpoint):
+        path = str(write_checkpoint('checkpoint'))
+
+        assert Kronos.from_pretrained(path).transformer[0].self_attn.qkv_proj is not None
+        assert KronosTokenizer.from_pretrained(path).encoder[0].ffn.w13 is not None
+        assert Kronos.from_pretrained(path, fuse=False).transformer[0].self_attn.qkv_proj is None
+
+        # Quantized layers keep their own int8 weights; the float cross-attention is still fused
+        int8 = Kronos.from_pretrained(path, quantize='int8')
+        assert isinstance(int8.transformer[0].self_attn.q_proj, torch.ao.nn.quantized.dynamic.Linear)
+        assert int8.transformer[0].self_attn.qkv_proj is None
+        assert int8.dep_layer.cross_attn.kv_proj is not None
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from model import KronosPredictor
+from model.kronos import auto_regressive_inference, auto_regressive_stream
+
+HORIZONS = [3, 12, 7]
+
+
+@pytest.fixture
+def horizon_series():
+    generator = torch.Generator().manual_seed(0)
+    x = torch.randn(len(HORIZONS), 20, 6, generator=generator)
+    x_stamp = torch.randint(0, 7, (len(HORIZONS), 20, 5), generator=generator).float()
+    y_stamp = torch.randint(0, 7, (len(HORIZONS), max(HORIZONS), 5), generator=generator).float()
+    return x, x_stamp, y_stamp
+
+
+class TestRaggedHorizons:
+    """Test that series with different horizons forecast exactly like the same series run on their own."""
+
+    @pytest.mark.parametrize('max_context,use_cache', [(512, True), (512, False), (24, True)])
+    def test_matches_separate_calls(self, tiny_kronos, horizon_series, max_context, use_cache):
+        """max_context=24 makes the window slide before the longest series finishes."""
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = horizon_series
+        preds = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, torch.tensor(HORIZONS), top_k=1,
+                                          sample_count=2, use_cache=use_cache)
+        forecasts = preds[:, -max(HORIZONS):]
+
+        for i, horizon in enumerate(HORIZONS):
+            expected = auto_regressive_inference(tokenizer, model, x[i:i + 1], x_stamp[i:i + 1], y_stamp[i:i + 1], max_context, horizon,
+                                                 top_k=1, sample_count=2, use_cache=use_cache)
+            np.testing.assert_allclose(forecasts[i, :horizon], expected[0, -horizon:], atol=1e-6)
+            assert np.isnan(forecasts[i, horizon:]).all()
+
+    def test_finished_rows_leave_the_batch(self, tiny_kronos, horizon_series, monkeypatch):
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = horizon_series
+        batch_sizes = []
+        decode_s2_step = model.decode_s2_step
+
+        def record(context, s1_ids, **kwargs):
+            batch_sizes.append(s1_ids.size(0))
+            return decode_s2_step(context, s1_ids, **kwargs)
+
+        monkeypatch.setattr(model, 'decode_s2_step', record)
+        auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 512, torch.tensor(HORIZONS), sample_count=2)
+
+        assert batch_sizes == [6] * 3 + [4] * 4 + [2] * 5
+
+    def test_stream_rejects_ragged_horizons(self, tiny_kronos, horizon_series):
+        tokenizer, model = tiny_kronos
+        with pytest.raises(ValueError):
+            next(auto_regressive_stream(tokenizer, model, *horizon_series, 512, torch.tensor(HORIZONS)))
+
+    def test_predict_batch(self, tiny_kronos):
+        """Mixed horizons on top of histories of different lengths."""
+        tokenizer, model = tiny_kronos
+        predictor = KronosPredictor(model, tokenizer, device='cpu')
+        rng = np.random.default_rng(0)
+        df_list, x_timestamps, y_timestamps = [], [], []
+        for length, horizon in zip([24, 17, 10], HORIZONS):
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+            df_list.append(pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+                                         'volume': rng.uniform(1e3, 1e4, length)}))
+            dates = pd.Series(pd.bdate_range('2024-01-01', periods=length + horizon))
+            x_timestamps.append(dates[:length])
+            y_timestamps.append(dates[length:].reset_index(drop=True))
+
+        batch = predictor.predict_batch(df_list, x_timestamps, y_timestamps, pred_len=HORIZONS, top_k=1, verbose=False)
+
+        for i, horizon in enumerate(HORIZONS):
+            single = predictor.predict(df_list[i], x_timestamps[i], y_timestamps[i], pred_len=horizon, top_k=1, verbose=False)
+            pd.testing.assert_frame_equal(batch[i], single, rtol=1e-4)
+        with pytest.raises(ValueError):
+            predictor.predict_batch(df_list, x_timestamps, y_timestamps, pred_len=[3, 12, 8], verbose=False)
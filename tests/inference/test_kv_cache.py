@@ -0,0 +1,71 @@
+import pytest
+import torch
+
+from model.kronos import auto_regressive_inference
+from model.module import KVCache
+
+
+class TestKVCache:
+    """Test incremental decoding with per-layer key/value caches."""
+
+    def test_incremental_logits_match_full_pass(self, tiny_kronos, sample_series):
+        """Feeding tokens one at a time through the cache gives the same logits as a full pass."""
+        _, model = tiny_kronos
+        x, x_stamp, _ = sample_series
+        s1_ids = torch.randint(0, 16, (2, 24))
+        s2_ids = torch.randint(0, 16, (2, 24))
+
+        with torch.no_grad():
+            full_logits, full_context = model.decode_s1(s1_ids, s2_ids, x_stamp)
+
+            kv_cache = model.init_kv_cache()
+            prefix_logits, _ = model.decode_s1(s1_ids[:, :16], s2_ids[:, :16], x_stamp[:, :16], kv_cache=kv_cache)
+            step_logits = [prefix_logits]
+            for t in range(16, 24):
+                logits, _ = model.decode_s1(s1_ids[:, t:t + 1], s2_ids[:, t:t + 1], x_stamp[:, t:t + 1], kv_cache=kv_cache)
+                step_logits.append(logits)
+
+        assert kv_cache[0].seq_len == 24
+        assert torch.allclose(torch.cat(step_logits, dim=1), full_logits, atol=1e-5)
+
+    def test_multi_token_chunk_respects_causality(self, tiny_kronos):
+        """Appending several tokens at once applies the causal mask relative to the cached prefix."""
+        _, model = tiny_kronos
+        s1_ids = torch.randint(0, 16, (1, 10))
+        s2_ids = torch.randint(0, 16, (1, 10))
+
+        with torch.no_grad():
+            full_logits, _ = model.decode_s1(s1_ids, s2_ids)
+            kv_cache = model.init_kv_cache()
+            first, _ = model.decode_s1(s1_ids[:, :4], s2_ids[:, :4], kv_cache=kv_cache)
+            second, _ = model.decode_s1(s1_ids[:, 4:], s2_ids[:, 4:], kv_cache=kv_cache)
+
+        assert torch.allclose(torch.cat([first, second], dim=1), full_logits, atol=1e-5)
+
+    def test_preallocated_cache_writes_in_place(self):
+        cache = KVCache(capacity=6)
+        cache.update(torch.zeros(1, 2, 4, 8), torch.zeros(1, 2, 4, 8))
+        buffer_ptr = cache.k.data_ptr()
+        k, v = cache.update(torch.ones(1, 2, 1, 8), torch.ones(1, 2, 1, 8))
+
+        assert cache.k.data_ptr() == buffer_ptr
+        assert k.shape == (1, 2, 5, 8)
+        assert k[:, :, -1].eq(1).all()
+        with pytest.raises(ValueError):
+            cache.update(torch.ones(1, 2, 2, 8), torch.ones(1, 2, 2, 8))
+
+    @pytest.mark.parametrize('max_context', [512, 28])
+    def test_generation_matches_recompute_for_fixed_seed(self, tiny_kronos, sample_series, max_context):
+        """Cached generation reproduces the full-recompute path, including steps past max_context."""
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+
+        torch.manual_seed(123)
+        expected = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, 12,
+                                             sample_count=3, use_cache=False)
+        torch.manual_seed(123)
+        actual = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, 12,
+                                           sample_count=3, use_cache=True)
+
+        assert actual.shape == expected.shape
+        assert abs(actual - expected).max() < 1e-5
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+pytest.importorskip('onnxruntime')
+
+from model.kronos import auto_regressive_inference, top_k_top_p_filtering as torch_filtering
+from model.onnx_backend import OnnxKronosPredictor, OnnxKronosSession, onnx_auto_regressive_inference, top_k_top_p_filtering
+from model.onnx_export import export_onnx
+
+
+@pytest.fixture
+def onnx_dir(tiny_kronos, tmp_path):
+    tokenizer, model = tiny_kronos
+    return export_onnx(tokenizer, model, str(tmp_path / 'onnx'))
+
+
+class TestOnnxParity:
+    """Test the exported graphs and the onnxruntime decoding loop against the torch path."""
+
+    def test_tokenizer_graphs(self, tiny_kronos, onnx_dir, sample_series):
+        tokenizer, _ = tiny_kronos
+        session = OnnxKronosSession(onnx_dir)
+        x = sample_series[0][:, :19]  # dynamic sequence length, not the traced one
+
+        with torch.no_grad():
+            s1_ids, s2_ids = tokenizer.encode(x, half=True)
+            decoded = tokenizer.decode([s1_ids, s2_ids], half=True)
+        onnx_s1, onnx_s2 = session.encode(x.numpy())
+
+        np.testing.assert_array_equal(onnx_s1, s1_ids.numpy())
+        np.testing.assert_array_equal(onnx_s2, s2_ids.numpy())
+        np.testing.assert_allclose(session.decode(onnx_s1, onnx_s2), decoded.numpy(), atol=1e-5)
+
+    @pytest.mark.parametrize('max_context', [512, 28])
+    def test_greedy_generation_matches_torch(self, tiny_kronos, onnx_dir, sample_series, max_context):
+        """With top_k=1 both paths are deterministic, so forecasts must agree up to float error."""
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+        expected = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context=max_context, pred_len=8,
+                                             top_k=1, sample_count=2)
+        actual = onnx_auto_regressive_inference(OnnxKronosSession(onnx_dir), x.numpy(), x_stamp.numpy(), y_stamp.numpy(),
+                                                max_context=max_context, pred_len=8, top_k=1, sample_count=2)
+
+        np.testing.assert_allclose(actual, expected, atol=1e-4)
+
+    @pytest.mark.parametrize('top_k, top_p', [(3, 1.0), (0, 0.7), (3, 0.7)])
+    def test_filtering_matches_torch(self, top_k, top_p):
+        logits = torch.randn(4, 32, generator=torch.Generator().manual_seed(0))
+        expected = torch_filtering(logits.clone(), top_k=top_k, top_p=top_p)
+        actual = top_k_top_p_filtering(logits.numpy(), top_k=top_k, top_p=top_p)
+
+        np.testing.assert_array_equal(np.isinf(actual), torch.isinf(expected).numpy())
+
+    def test_predictor(self, onnx_dir):
+        rng = np.random.default_rng(0)
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, 30)))
+        df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close})
+        dates = pd.Series(pd.bdate_range('2024-01-01', periods=34))
+
+        predictor = OnnxKronosPredictor(onnx_dir, seed=0)
+        pred = predictor.predict(df, dates[:30], dates[30:].reset_index(drop=True), pred_len=4, sample_count=2, verbose=False)
+
+        assert list(pred.columns) == ['open', 'high', 'low', 'close', 'volume', 'amount']
+        assert pred.shape == (4, 6)
+        assert np.isfinite(pred.values).all()
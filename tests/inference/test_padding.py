@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from model import KronosPredictor
+from model.kronos import auto_regressive_inference, speculative_inference
+
+LENGTHS = [24, 17, 10]
+
+
+@pytest.fixture
+def ragged_series():
+    """Left-padded histories of different lengths with their padding mask."""
+    generator = torch.Generator().manual_seed(42)
+    seq_len = max(LENGTHS)
+    x = torch.randn(len(LENGTHS), seq_len, 6, generator=generator)
+    x_stamp = torch.randint(0, 7, (len(LENGTHS), seq_len, 5), generator=generator).float()
+    y_stamp = torch.randint(0, 7, (len(LENGTHS), 8, 5), generator=generator).float()
+    padding_mask = torch.zeros(len(LENGTHS), seq_len, dtype=torch.bool)
+    for i, length in enumerate(LENGTHS):
+        padding_mask[i, :seq_len - length] = True
+    x = x.masked_fill(padding_mask.unsqueeze(-1), 0)
+    x_stamp = x_stamp.masked_fill(padding_mask.unsqueeze(-1), 0)
+    return x, x_stamp, y_stamp, padding_mask
+
+
+def unpadded(tensor, i):
+    return tensor[i:i + 1, tensor.size(1) - LENGTHS[i]:]
+
+
+class TestPaddedHistories:
+    """Test that left-padded rows forecast exactly like the same series run on its own."""
+
+    def test_encode_ignores_padding(self, tiny_kronos, ragged_series):
+        tokenizer, _ = tiny_kronos
+        x, _, _, padding_mask = ragged_series
+        s1_ids, s2_ids = tokenizer.encode(x, half=True, padding_mask=padding_mask)
+
+        for i in range(len(LENGTHS)):
+            expected = tokenizer.encode(unpadded(x, i), half=True)
+            torch.testing.assert_close(unpadded(s1_ids, i), expected[0])
+            torch.testing.assert_close(unpadded(s2_ids, i), expected[1])
+
+    @pytest.mark.parametrize('max_context, use_cache', [(512, True), (20, True), (20, False), (8, True)])
+    def test_matches_per_series(self, tiny_kronos, ragged_series, max_context, use_cache):
+        """Greedy decoding makes both paths deterministic; max_context=20 slides the batch window before some rows fill it."""
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp, padding_mask = ragged_series
+        actual = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len=8, top_k=1, sample_count=2,
+                                           use_cache=use_cache, padding_mask=padding_mask)
+
+        for i in range(len(LENGTHS)):
+            expected = auto_regressive_inference(tokenizer, model, unpadded(x, i), unpadded(x_stamp, i), y_stamp[i:i + 1], max_context,
+                                                 pred_len=8, top_k=1, sample_count=2, use_cache=use_cache)
+            np.testing.assert_allclose(actual[i, -8:], expected[0, -8:], atol=1e-5)
+
+    def test_speculative_matches_per_series(self, tiny_kronos, ragged_series):
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp, padding_mask = ragged_series
+        actual, stats = speculative_inference(tokenizer, model, model, x, x_stamp, y_stamp, 512, pred_len=8, top_k=1, sample_count=2,
+                                              num_draft=3, padding_mask=padding_mask)
+
+        assert stats.acceptance_rate == 1.0
+        for i in range(len(LENGTHS)):
+            expected = auto_regressive_inference(tokenizer, model, unpadded(x, i), unpadded(x_stamp, i), y_stamp[i:i + 1], 512,
+                                                 pred_len=8, top_k=1, sample_count=2)
+            np.testing.assert_allclose(actual[i, -8:], expected[0, -8:], atol=1e-5)
+
+    def test_rolling_cache_rejects_padding(self, tiny_kronos, ragged_series):
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp, padding_mask = ragged_series
+        with pytest.raises(ValueError):
+            auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 16, pred_len=4, rolling_cache=True, padding_mask=padding_mask)
+
+    def test_predict_batch_ragged(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        predictor = KronosPredictor(model, tokenizer, device='cpu')
+        rng = np.random.default_rng(0)
+        df_list, x_timestamps, y_timestamps = [], [], []
+        for length in LENGTHS:
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+            df_list.append(pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+                                         'volume': rng.uniform(1e3, 1e4, length)}))
+            dates = pd.Series(pd.bdate_range('2024-01-01', periods=length + 4))
+            x_timestamps.append(dates[:length])
+            y_timestamps.append(dates[length:].reset_index(drop=True))
+
+        batch = predictor.predict_batch(df_list, x_timestamps, y_timestamps, pred_len=4, top_k=1, sample_count=1, verbose=False)
+
+        for i in range(len(LENGTHS)):
+            single = predictor.predict(df_list[i], x_timestamps[i], y_timestamps[i], pred_len=4, top_k=1, sample_count=1, verbose=False)
+            np.testing.assert_allclose(batch[i].values, single.values, rtol=1e-4)
+
+    def test_predict_batch_reports_series_index(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        predictor = KronosPredictor(model, tokenizer, device='cpu')
+        dates = pd.Series(pd.bdate_range('2024-01-01', periods=14))
+        close = np.linspace(10, 11, 10)
+        valid = pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close})
+        invalid = valid.assign(close=np.nan)
+
+        with pytest.raises(ValueError, match='index 1: Input DataFrame contains NaN'):
+            predictor.predict_batch([valid, invalid], [dates[:10]] * 2, [dates[10:].reset_index(drop=True)] * 2,
+                                    pred_len=4, verbose=False)
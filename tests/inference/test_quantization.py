@@ -0,0 +1,61 @@
+import pytest
+import torch
+import torch.nn as nn
+
+from model import Kronos, KronosTokenizer
+from model.kronos import auto_regressive_inference
+
+
+@pytest.fixture
+def checkpoint_dirs(write_checkpoint):
+    """The tiny tokenizer and model, each in its own save_pretrained-style directory, keyed by what loads from it."""
+    return {name: str(write_checkpoint(name)) for name in ('tokenizer', 'model')}
+
+
+class TestDynamicInt8:
+    """Test the quantize='int8' load path of Kronos and KronosTokenizer."""
+
+    def test_quantizes_only_block_and_head_linears(self, checkpoint_dirs):
+        model = Kronos.from_pretrained(checkpoint_dirs['model'], quantize='int8')
+        dynamic_linear = torch.ao.nn.quantized.dynamic.Linear
+
+        assert isinstance(model.transformer[0].self_attn.q_proj, dynamic_linear)
+        assert isinstance(model.transformer[0].ffn.w1, dynamic_linear)
+        assert isinstance(model.head.proj_s1, dynamic_linear)
+        assert type(model.embedding.fusion_proj) is nn.Linear
+        assert type(model.dep_layer.cross_attn.q_proj) is nn.Linear
+
+        tokenizer = KronosTokenizer.from_pretrained(checkpoint_dirs['tokenizer'], quantize='int8')
+        assert isinstance(tokenizer.encoder[0].ffn.w2, dynamic_linear)
+        assert type(tokenizer.embed) is nn.Linear
+
+    def test_logits_close_to_fp32(self, checkpoint_dirs, sample_series):
+        _, x_stamp, _ = sample_series
+        fp32 = Kronos.from_pretrained(checkpoint_dirs['model']).eval()
+        int8 = Kronos.from_pretrained(checkpoint_dirs['model'], quantize='int8')
+        torch.manual_seed(0)
+        s1_ids = torch.randint(0, 16, (2, 24))
+        s2_ids = torch.randint(0, 16, (2, 24))
+
+        with torch.no_grad():
+            ref_logits, _ = fp32.decode_s1(s1_ids, s2_ids, x_stamp)
+            logits, _ = int8.decode_s1(s1_ids, s2_ids, x_stamp)
+
+        assert torch.allclose(logits, ref_logits, atol=0.5)
+        assert (logits.argmax(-1) == ref_logits.argmax(-1)).float().mean() > 0.9
+
+    def test_generation_runs(self, checkpoint_dirs, sample_series):
+        x, x_stamp, y_stamp = sample_series
+        tokenizer = KronosTokenizer.from_pretrained(checkpoint_dirs['tokenizer'], quantize='int8')
+        model = Kronos.from_pretrained(checkpoint_dirs['model'], quantize='int8')
+
+        torch.manual_seed(0)
+        preds = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context=512, pred_len=4,
+                                          sample_count=2)
+
+        assert preds.shape == (2, 28, 6)
+        assert not torch.isnan(torch.as_tensor(preds)).any()
+
+    def test_rejects_unknown_mode(self, checkpoint_dirs):
+        with pytest.raises(ValueError):
+            Kronos.from_pretrained(checkpoint_dirs['model'], quantize='int4')
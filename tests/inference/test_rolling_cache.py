@@ -0,0 +1,69 @@
+import pytest
+import numpy as np
+import torch
+
+from model.kronos import auto_regressive_inference
+from model.module import MultiHeadAttentionWithRoPE, RollingKVCache
+
+
+class TestRollingKVCache:
+    """Test the bounded ring-buffer cache used once the context passes max_context."""
+
+    def test_evicts_oldest_positions(self):
+        """The cache keeps capacity slots while the absolute position keeps growing."""
+        cache = RollingKVCache(4)
+        for t in range(6):
+            k = torch.full((1, 1, 1, 2), float(t))
+            cache.update(k, k)
+
+        assert cache.seq_len == 4
+        assert cache.position == 6
+        assert sorted(cache.k[0, 0, :, 0].tolist()) == [2.0, 3.0, 4.0, 5.0]
+
+    def test_rejects_multi_token_append_when_full(self):
+        cache = RollingKVCache(4)
+        cache.update(torch.zeros(1, 1, 4, 2), torch.zeros(1, 1, 4, 2))
+        with pytest.raises(ValueError):
+            cache.update(torch.zeros(1, 1, 2, 2), torch.zeros(1, 1, 2, 2))
+
+    def test_attention_matches_reanchored_window(self):
+        """A single attention layer over the ring buffer equals recomputing the last window from position 0."""
+        torch.manual_seed(0)
+        attn = MultiHeadAttentionWithRoPE(16, 4).eval()
+        x = torch.randn(2, 12, 16)
+        capacity = 5
+
+        with torch.no_grad():
+            cache = RollingKVCache(capacity)
+            attn(x[:, :capacity], kv_cache=cache)
+            for t in range(capacity, x.size(1)):
+                rolling_out = attn(x[:, t:t + 1], kv_cache=cache)
+            window_out = attn(x[:, -capacity:])[:, -1:]
+
+        assert torch.allclose(rolling_out, window_out, atol=1e-5)
+
+
+class TestRollingGeneration:
+    """Test auto_regressive_inference with rolling_cache enabled."""
+
+    def test_matches_exact_mode_within_max_context(self, tiny_kronos, sample_series):
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+
+        torch.manual_seed(7)
+        expected = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 512, 12, sample_count=2)
+        torch.manual_seed(7)
+        actual = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 512, 12, sample_count=2,
+                                           rolling_cache=True)
+
+        assert abs(actual - expected).max() < 1e-5
+
+    def test_runs_past_max_context(self, tiny_kronos, sample_series):
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+
+        preds = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 16, 12, sample_count=2,
+                                          rolling_cache=True)
+
+        assert preds.shape == (2, 16, 6)
+        assert np.isfinite(preds).all()
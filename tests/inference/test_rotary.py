@@ -0,0 +1,59 @@
+import torch
+
+from model.module import ROTARY_TABLE_SIZE, RotaryPositionalEmbedding, rotary_tables
+
+
+def reference_rotary(q, k, positions):
+    """Rotates q and k at positions [batch, seq_len] with freshly computed tables."""
+    dim = q.size(-1)
+    inv_freq = 1.0 / (10000 ** (torch.arange(0, dim, 2).float() / dim))
+    freqs = positions[..., None].float() * inv_freq
+    emb = torch.cat((freqs, freqs), dim=-1).unsqueeze(1)
+
+    def rotate(x):
+        x1, x2 = x.chunk(2, dim=-1)
+        return x * emb.cos() + torch.cat((-x2, x1), dim=-1) * emb.sin()
+
+    return rotate(q), rotate(k)
+
+
+class TestRotaryTables:
+    """Test the shared rotary cos/sin tables."""
+
+    def test_matches_reference_with_offset(self):
+        rotary = RotaryPositionalEmbedding(16)
+        q, k = torch.randn(2, 2, 4, 3, 16).unbind(0)
+        positions = torch.arange(7, 10).expand(2, 3)
+
+        for actual, expected in zip(rotary(q, k, offset=7), reference_rotary(q, k, positions)):
+            torch.testing.assert_close(actual, expected)
+
+    def test_matches_reference_with_positions(self):
+        rotary = RotaryPositionalEmbedding(16)
+        q, k = torch.randn(2, 2, 4, 5, 16).unbind(0)
+        positions = torch.tensor([[0, 0, 0, 1, 2], [3, 4, 5, 6, 7]])
+
+        for actual, expected in zip(rotary(q, k, offset=3, positions=positions), reference_rotary(q, k, positions)):
+            torch.testing.assert_close(actual, expected)
+
+    def test_tables_shared_and_not_rebuilt(self):
+        """Every module with the same head_dim reads one table, which growing sequences only slice."""
+        first, second = RotaryPositionalEmbedding(24), RotaryPositionalEmbedding(24)
+        q = torch.randn(1, 2, 1, 24)
+        first(q, q, offset=10)
+        tables = rotary_tables(24, 1)
+        for offset in range(11, 40):
+            second(q, q, offset=offset)
+
+        assert rotary_tables(24, 1) is tables
+        assert tables[0].shape == (ROTARY_TABLE_SIZE, 24)
+        assert rotary_tables(24, 1, dtype=torch.bfloat16)[0].dtype == torch.bfloat16
+
+    def test_grows_geometrically(self):
+        rotary = RotaryPositionalEmbedding(40)
+        q = torch.randn(1, 1, 2, 40)
+        rotated, _ = rotary(q, q, offset=ROTARY_TABLE_SIZE + 8)
+
+        assert rotary_tables(40, 1)[0].size(0) == 2 * ROTARY_TABLE_SIZE
+        expected, _ = reference_rotary(q, q, torch.arange(ROTARY_TABLE_SIZE + 8, ROTARY_TABLE_SIZE + 10)[None])
+        torch.testing.assert_close(rotated, expected)
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+import torch.nn.functional as F
+
+from model import KronosPredictor
+from model.kronos import auto_regressive_inference, sample_from_logits, top_k_top_p_filtering
+
+
+def empirical(logits, num_samples=20000, **kwargs):
+    """Frequencies of sample_from_logits over num_samples copies of a single row of logits."""
+    samples = sample_from_logits(logits.expand(num_samples, -1), **kwargs)
+    return torch.bincount(samples[:, 0], minlength=logits.size(-1)).float() / num_samples
+
+
+class TestSampling:
+    """Test the fused sampler against the distribution of the explicit filter + softmax."""
+
+    @pytest.mark.parametrize('temperature, top_k, top_p', [(1.0, 0, 1.0), (0.7, 0, 1.0), (1.0, 4, 1.0), (1.3, 0, 0.8),
+                                                           (0.5, 5, 0.5)])
+    def test_matches_filtered_softmax(self, temperature, top_k, top_p):
+        torch.manual_seed(0)
+        logits = torch.randn(1, 16) * 2
+        expected = F.softmax(top_k_top_p_filtering(logits / temperature, top_k=top_k, top_p=top_p), dim=-1)[0]
+        actual = empirical(logits, temperature=temperature, top_k=top_k, top_p=top_p)
+
+        assert (actual[expected == 0] == 0).all()
+        assert 0.5 * (actual - expected).abs().sum() < 0.03
+
+    @pytest.mark.parametrize('scale', [4.0, 0.1])
+    def test_nucleus_large_vocabulary(self, scale):
+        """Peaked logits keep the nucleus inside the top candidates; flat ones need the full sort."""
+        torch.manual_seed(0)
+        logits = torch.randn(1, 256) * scale
+        expected = F.softmax(top_k_top_p_filtering(logits, top_p=0.9), dim=-1)[0]
+        actual = empirical(logits, num_samples=50000, top_p=0.9)
+
+        assert (actual[expected == 0] == 0).all()
+        assert 0.5 * (actual - expected).abs().sum() < 0.04
+
+    def test_greedy(self):
+        logits = torch.randn(8, 32, generator=torch.Generator().manual_seed(0))
+        expected = logits.argmax(dim=-1, keepdim=True)
+        torch.testing.assert_close(sample_from_logits(logits, sample_logits=False), expected)
+        torch.testing.assert_close(sample_from_logits(logits, temperature=0.5, top_k=1, top_p=0.9), expected)
+
+    def test_does_not_modify_logits(self):
+        logits = torch.randn(4, 32, generator=torch.Generator().manual_seed(0))
+        original = logits.clone()
+        sample_from_logits(logits, top_k=0, top_p=0.5)
+        top_k_top_p_filtering(logits, top_k=3)
+        top_k_top_p_filtering(logits, top_p=0.5)
+        torch.testing.assert_close(logits, original)
+
+    def test_filtering_without_filters_returns_logits(self):
+        logits = torch.randn(2, 8)
+        torch.testing.assert_close(top_k_top_p_filtering(logits), logits)
+
+
+def make_frame(length=40, pred_len=5):
+    rng = np.random.default_rng(0)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+    df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+                       'volume': rng.uniform(1e5, 2e5, length)})
+    dates = pd.Series(pd.bdate_range('2024-01-01', periods=length + pred_len))
+    return df, dates[:length].reset_index(drop=True), dates[length:].reset_index(drop=True)
+
+
+ROW_SETTINGS = [(1.0, 1, 1.0), (0.7, 3, 1.0), (1.3, 0, 0.6), (1.0, 0, 1.0)]
+
+
+class TestPerRowSampling:
+    """Test tensor-valued temperature / top_k / top_p against the scalar sampler row by row."""
+
+    @pytest.mark.parametrize('settings', [ROW_SETTINGS, ROW_SETTINGS[:3]])
+    def test_rows_follow_their_settings(self, settings):
+        """Without an unfiltered row the sampler works on the top candidates only."""
+        torch.manual_seed(0)
+        logits = torch.randn(len(settings), 16) * 2
+        temperature, top_k, top_p = (torch.tensor(values) for values in zip(*settings))
+        num_samples = 20000
+        samples = sample_from_logits(logits.repeat(num_samples, 1), temperature=temperature.repeat(num_samples),
+                                     top_k=top_k.repeat(num_samples), top_p=top_p.repeat(num_samples)).view(num_samples, -1)
+
+        for row, (T, k, p) in enumerate(settings):
+            expected = F.softmax(top_k_top_p_filtering(logits[row:row + 1] / T, top_k=k, top_p=p), dim=-1)[0]
+            actual = torch.bincount(samples[:, row], minlength=16).float() / num_samples
+            assert (actual[expected == 0] == 0).all()
+            assert 0.5 * (actual - expected).abs().sum() < 0.03
+
+    def test_filtering_matches_scalar(self):
+        logits = torch.randn(len(ROW_SETTINGS), 32, generator=torch.Generator().manual_seed(0))
+        _, top_k, top_p = (torch.tensor(values) for values in zip(*ROW_SETTINGS))
+        filtered = top_k_top_p_filtering(logits, top_k=top_k, top_p=top_p)
+
+        for row, (_, k, p) in enumerate(ROW_SETTINGS):
+            expected = top_k_top_p_filtering(logits[row:row + 1], top_k=k, top_p=p)
+            torch.testing.assert_close(torch.isinf(filtered[row:row + 1]), torch.isinf(expected))
+
+    def test_auto_regressive_inference(self, tiny_kronos, sample_series):
+        """A greedy series forecasts exactly as on its own while the other one samples."""
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+        actual = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 512, pred_len=6, T=torch.tensor([0.5, 1.0]),
+                                           top_k=torch.tensor([1, 0]), top_p=torch.tensor([1.0, 0.9]), sample_count=2)
+        expected = auto_regressive_inference(tokenizer, model, x[:1], x_stamp[:1], y_stamp[:1], 512, pred_len=6, top_k=1, sample_count=2)
+
+        np.testing.assert_allclose(actual[0], expected[0], atol=1e-5)
+
+    def test_predict_batch(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        predictor = KronosPredictor(model, tokenizer, device='cpu')
+        df, x_timestamp, y_timestamp = make_frame()
+        batch = predictor.predict_batch([df, df], [x_timestamp] * 2, [y_timestamp] * 2, pred_len=len(y_timestamp), T=[0.5, 1.0],
+                                        top_k=[1, 0], top_p=0.9, sample_count=2, verbose=False)
+        expected = predictor.predict(df, x_timestamp, y_timestamp, pred_len=len(y_timestamp), top_k=1, verbose=False)
+
+        pd.testing.assert_frame_equal(batch[0], expected, rtol=1e-4)
+        with pytest.raises(ValueError):
+            predictor.predict_batch([df, df], [x_timestamp] * 2, [y_timestamp] * 2, pred_len=len(y_timestamp), T=[0.5, 1.0, 2.0])
@@ -0,0 +1,100 @@
+import copy
+
+import numpy as np
+import pytest
+import torch
+import torch.nn.functional as F
+
+from model import Kronos, KronosPredictor
+from model.kronos import DecodeState, auto_regressive_inference, speculative_decode, speculative_inference
+from model.module import KVCache
+
+
+def make_draft(model, noise=0.02):
+    """A draft model that agrees with the target often but not always."""
+    draft = copy.deepcopy(model)
+    generator = torch.Generator().manual_seed(1)
+    with torch.no_grad():
+        for param in draft.parameters():
+            param.add_(torch.randn(param.shape, generator=generator) * noise)
+    return draft
+
+
+class TestSpeculativeDecoding:
+    """Test speculative sampling with a draft model against plain autoregressive sampling."""
+
+    def test_kv_cache_truncate(self):
+        for capacity in (None, 8):
+            cache = KVCache(capacity)
+            k = torch.randn(1, 2, 5, 4)
+            cache.update(k, k)
+            cache.truncate(3)
+            assert cache.position == 3
+            torch.testing.assert_close(cache.get()[0], k[:, :, :3])
+
+    @pytest.mark.parametrize('max_context', [512, 30, 20])
+    def test_greedy_matches_autoregressive(self, tiny_kronos, sample_series, max_context):
+        """With top_k=1 the target distribution is a point mass, so speculative output must be identical."""
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+        expected = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len=8, top_k=1, sample_count=2)
+        actual, stats = speculative_inference(tokenizer, model, make_draft(model), x, x_stamp, y_stamp, max_context, pred_len=8,
+                                              top_k=1, sample_count=2, num_draft=3)
+
+        np.testing.assert_array_equal(actual, expected)
+        assert stats.tokens == 8
+        if max_context == 512:
+            assert 0 < stats.acceptance_rate < 1
+
+    def test_self_draft_accepts_everything(self, tiny_kronos, sample_series):
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+        _, stats = speculative_inference(tokenizer, model, model, x, x_stamp, y_stamp, 512, pred_len=9, T=0.7, sample_count=2,
+                                         num_draft=3)
+
+        assert stats.acceptance_rate == 1.0
+        assert stats.target_calls == 3
+
+    def test_samples_follow_target_distribution(self, tiny_kronos):
+        """The first (s1, s2) pair is sampled from the target's joint distribution despite an unrelated draft model."""
+        _, model = tiny_kronos
+        torch.manual_seed(1)
+        draft = Kronos(s1_bits=4, s2_bits=4, n_layers=1, d_model=32, n_heads=4, ff_dim=64, ffn_dropout_p=0.0, attn_dropout_p=0.0,
+                       resid_dropout_p=0.0, token_dropout_p=0.0, learn_te=True).eval()
+        generator = torch.Generator().manual_seed(0)
+        history = [torch.randint(0, 16, (1, 8), generator=generator) for _ in range(2)]
+        stamp, future_stamp = torch.zeros(1, 8, 5), torch.zeros(1, 2, 5)
+        num_samples, T = 10000, 0.5
+
+        with torch.no_grad():
+            state = DecodeState(history, stamp, future_stamp, 2, 512, num_samples)
+            speculative_decode(model, draft, state, T=T, top_k=0, top_p=1.0, num_draft=1)
+
+            s1_logits, context = model.decode_s1_step(history[0], history[1], stamp)
+            p_s2 = F.softmax(model.decode_s2_step(context.expand(16, -1, -1), torch.arange(16)[:, None]) / T, dim=-1)
+            joint = F.softmax(s1_logits / T, dim=-1)[0, :, None] * p_s2
+
+        counts = torch.zeros(16, 16)
+        counts.index_put_((state.s1[:, 8], state.s2[:, 8]), torch.ones(num_samples), accumulate=True)
+        assert 0.5 * (counts / num_samples - joint).abs().sum() < 0.06
+
+    def test_rejects_mismatched_vocabulary(self, tiny_kronos, sample_series):
+        tokenizer, model = tiny_kronos
+        draft = Kronos(s1_bits=3, s2_bits=4, n_layers=1, d_model=32, n_heads=4, ff_dim=64, ffn_dropout_p=0.0, attn_dropout_p=0.0,
+                       resid_dropout_p=0.0, token_dropout_p=0.0, learn_te=True).eval()
+        x, x_stamp, y_stamp = sample_series
+        with pytest.raises(ValueError):
+            speculative_inference(tokenizer, model, draft, x, x_stamp, y_stamp, 512, pred_len=4)
+
+    def test_predictor_reports_acceptance(self, tiny_kronos, sample_series):
+        tokenizer, model = tiny_kronos
+        predictor = KronosPredictor(model, tokenizer, device='cpu', draft_model=model, num_draft_tokens=2)
+        x, x_stamp, y_stamp = sample_series
+        preds = predictor.generate(x.numpy(), x_stamp.numpy(), y_stamp.numpy(), pred_len=6, T=1.0, top_k=0, top_p=0.9,
+                                   sample_count=2, verbose=False)
+
+        assert preds.shape == (2, 6, 6)
+        assert predictor.speculative_stats.acceptance_rate == 1.0
+
+        with pytest.raises(ValueError):
+            KronosPredictor(model, tokenizer, device='cpu', draft_model=model, rolling_cache=True)
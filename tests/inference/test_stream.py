@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from model import KronosPredictor
+from model.kronos import auto_regressive_inference, auto_regressive_stream
+
+
+class TestStreaming:
+    """Test that streamed bars match the forecast of a single batch call."""
+
+    def test_incremental_decode_matches_full_decode(self, tiny_kronos, sample_series):
+        tokenizer, _ = tiny_kronos
+        x, _, _ = sample_series
+        s1_ids, s2_ids = tokenizer.encode(x, half=True)
+        expected = tokenizer.decode([s1_ids, s2_ids], half=True)
+
+        kv_cache = tokenizer.init_kv_cache()
+        parts = [tokenizer.decode([s1_ids[:, :16], s2_ids[:, :16]], half=True, kv_cache=kv_cache)]
+        for t in range(16, s1_ids.size(1)):
+            parts.append(tokenizer.decode([s1_ids[:, t:t + 1], s2_ids[:, t:t + 1]], half=True, kv_cache=kv_cache))
+        torch.testing.assert_close(torch.cat(parts, dim=1), expected, atol=1e-5, rtol=1e-5)
+
+    @pytest.mark.parametrize('use_cache', [True, False])
+    def test_stream_matches_batch(self, tiny_kronos, sample_series, use_cache):
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+        expected = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 512, pred_len=8, top_k=1, sample_count=2,
+                                             use_cache=use_cache)
+        bars = list(auto_regressive_stream(tokenizer, model, x, x_stamp, y_stamp, 512, pred_len=8, top_k=1, sample_count=2,
+                                           use_cache=use_cache))
+
+        assert len(bars) == 8
+        np.testing.assert_allclose(np.stack(bars, axis=1), expected[:, -8:], atol=1e-5)
+        assert torch.is_grad_enabled()
+
+    def test_stream_past_max_context(self, tiny_kronos, sample_series):
+        """Once the window slides the last bar is still decoded over the same window as the batch call."""
+        tokenizer, model = tiny_kronos
+        x, x_stamp, y_stamp = sample_series
+        expected = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, 28, pred_len=8, top_k=1, sample_count=1)
+        bars = list(auto_regressive_stream(tokenizer, model, x, x_stamp, y_stamp, 28, pred_len=8, top_k=1, sample_count=1))
+
+        assert len(bars) == 8
+        np.testing.assert_allclose(bars[-1], expected[:, -1], atol=1e-5)
+
+    def test_predict_stream(self, tiny_kronos):
+        tokenizer, model = tiny_kronos
+        predictor = KronosPredictor(model, tokenizer, device='cpu')
+        rng = np.random.default_rng(0)
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, 30)))
+        df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': rng.uniform(1e3, 1e4, 30)})
+        dates = pd.Series(pd.bdate_range('2024-01-01', periods=35))
+        x_timestamp, y_timestamp = dates[:30], dates[30:].reset_index(drop=True)
+
+        bars = list(predictor.predict_stream(df, x_timestamp, y_timestamp, pred_len=5, top_k=1))
+        expected = predictor.predict(df, x_timestamp, y_timestamp, pred_len=5, top_k=1, verbose=False)
+
+        assert [len(bar) for bar in bars] == [1] * 5
+        pd.testing.assert_frame_equal(pd.concat(bars), expected, rtol=1e-4)
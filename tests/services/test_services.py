@@ -96,4 +96,284 @@ class TestPredictionService:
             
             # Since this is a complex integration, we mainly test the flow
             assert isinstance(success, bool)
-            assert isinstance(result, dict)
\ No newline at end of file
+            assert isinstance(result, dict)
+
+@pytest.fixture
+def tiny_models(app, write_checkpoint, tmp_path):
+    """Three small checkpoints registered as the app's available models."""
+    for name in ('tiny-a', 'tiny-b', 'tiny-c'):
+        write_checkpoint(name)
+    app.config['MODEL_DIR'] = str(tmp_path)
+    app.config['AVAILABLE_MODELS'] = {name: {'path': name, 'quantize': None} for name in ('tiny-a', 'tiny-b', 'tiny-c')}
+    return app
+
+def make_request_frame(length=24, horizon=3):
+    import numpy as np
+    import pandas as pd
+    
+    close = 10 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, length)))
+    df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': 1e4})
+    dates = pd.Series(pd.bdate_range('2024-01-01', periods=length + horizon))
+    return df, dates[:length], dates[length:].reset_index(drop=True)
+
+class TestModelService:
+    """Test the multi-model registry of the model service."""
+    
+    def test_routes_requests_by_model(self, tiny_models):
+        from app.services.model_service import ModelService
+        
+        with tiny_models.app_context():
+            service = ModelService()
+            try:
+                assert service.load_model('tiny-a')[0]
+                df, x_timestamp, y_timestamp = make_request_frame()
+                pred = service.submit_prediction(df, x_timestamp, y_timestamp, 3, top_k=1, model_name='tiny-b')
+                assert len(pred) == 3
+                service.submit_prediction(df, x_timestamp, y_timestamp, 3, top_k=1)
+                
+                status = service.get_model_status()
+                registry = status['registry']
+                assert status['active_model'] == 'tiny-a'
+                assert [model['name'] for model in registry['resident']] == ['tiny-a', 'tiny-b']
+                assert registry['loads'] == 2 and registry['misses'] == 2
+                assert registry['resident'][0]['requests'] == 1 and registry['resident'][0]['load_seconds'] > 0
+                assert service.use_model('tiny-b') == (True, 'Model tiny-b already loaded')
+                assert service.get_model_status()['registry']['hits'] == 1
+                assert service.use_model('unknown')[0] is False
+            finally:
+                service.unload_model()
+    
+    def test_evicts_least_recently_used(self, tiny_models):
+        from app.services.model_service import ModelService
+        
+        with tiny_models.app_context():
+            service = ModelService()
+            try:
+                service.load_model('tiny-a')
+                size_mb = service.get_model_status()['registry']['resident'][0]['size_mb']
+                tiny_models.config['MODEL_MEMORY_BUDGET_MB'] = 2.5 * size_mb
+                service.use_model('tiny-b')
+                service.use_model('tiny-a')
+                service.use_model('tiny-c')
+                
+                registry = service.get_model_status()['registry']
+                assert [model['name'] for model in registry['resident']] == ['tiny-c', 'tiny-a']
+                assert registry['evictions'] == 1
+                assert registry['resident_mb'] <= registry['budget_mb']
+                
+                service.unload_model('tiny-a')
+                assert service.active_model is None and not service.is_model_loaded()
+                assert service.is_model_loaded('tiny-c')
+            finally:
+                service.unload_model()
+    
+    def test_speculative_model_skips_scheduler(self, tiny_models):
+        from app.services.model_service import ModelService
+        
+        tiny_models.config['AVAILABLE_MODELS']['tiny-a']['draft_model'] = 'tiny-b'
+        with tiny_models.app_context():
+            service = ModelService()
+            try:
+                service.load_model('tiny-a')
+                df, x_timestamp, y_timestamp = make_request_frame()
+                pred = service.submit_prediction(df, x_timestamp, y_timestamp, 3, top_k=1)
+                
+                assert service.scheduler is None
+                assert len(pred) == 3
+                assert service.predictor.speculative_stats.as_dict()['target_calls'] > 0
+            finally:
+                service.unload_model()
+    
+    def test_leased_model_is_not_evicted(self, tiny_models):
+        from concurrent.futures import Future
+        from app.services.scheduler_service import InferenceScheduler
+        from app.services.model_service import ModelService
+        
+        with tiny_models.app_context():
+            service = ModelService()
+            try:
+                service.load_model('tiny-a')
+                size_mb = service.get_model_status()['registry']['resident'][0]['size_mb']
+                tiny_models.config['MODEL_MEMORY_BUDGET_MB'] = 1.5 * size_mb
+                with service.lease('tiny-a') as entry:
+                    assert entry.is_busy()
+                    service.use_model('tiny-b')
+                    assert service.is_model_loaded('tiny-a')
+                assert entry.leases == 0 and not entry.is_busy()
+                service.use_model('tiny-c')
+                assert not service.is_model_loaded('tiny-a')
+                
+                # A prediction that never resolves gives up after the timeout and releases its lease
+                tiny_models.config['PREDICTION_TIMEOUT_SECONDS'] = 0.01
+                pending = Future()
+                df, x_timestamp, y_timestamp = make_request_frame()
+                with patch.object(InferenceScheduler, 'submit', return_value=pending):
+                    with pytest.raises(RuntimeError, match='did not finish'):
+                        service.submit_prediction(df, x_timestamp, y_timestamp, 3, model_name='tiny-c')
+                assert pending.cancelled()
+                assert service._models['tiny-c'].leases == 0
+            finally:
+                service.unload_model()
+    
+    def test_stream_holds_model_until_closed(self, tiny_models):
+        from app.services.model_service import ModelService
+        
+        with tiny_models.app_context():
+            service = ModelService()
+            try:
+                service.load_model('tiny-a')
+                entry = service.get_resident_model('tiny-a')
+                df, x_timestamp, y_timestamp = make_request_frame()
+                stream = service.stream_prediction(df, x_timestamp, y_timestamp, 3, top_k=1)
+                assert len(next(stream)) == 1
+                assert entry.is_busy() and entry.lock.locked()
+                stream.close()
+                assert not entry.is_busy() and not entry.lock.locked()
+                assert len(list(service.stream_prediction(df, x_timestamp, y_timestamp, 3, top_k=1))) == 3
+            finally:
+                service.unload_model()
+    
+    def test_loads_run_outside_the_lock(self, tiny_models):
+        import threading
+        import time
+        from app.services.model_service import ModelService
+        from model import Kronos
+        
+        release = threading.Event()
+        from_pretrained = Kronos.from_pretrained.__func__
+        
+        def slow_from_pretrained(cls, path, *args, **kwargs):
+            if path.endswith('tiny-b'):
+                release.wait(10)
+            return from_pretrained(cls, path, *args, **kwargs)
+        
+        service = ModelService()
+        results = []
+        
+        def request_model():
+            with tiny_models.app_context():
+                results.append(service.use_model('tiny-b'))
+        
+        with tiny_models.app_context():
+            service.load_model('tiny-a')
+            with patch.object(Kronos, 'from_pretrained', classmethod(slow_from_pretrained)):
+                threads = [threading.Thread(target=request_model) for _ in range(2)]
+                for thread in threads:
+                    thread.start()
+                try:
+                    while 'tiny-b' not in service.get_model_status()['registry']['loading']:
+                        time.sleep(0.01)
+                    # A resident model is served while another one loads
+                    assert service.get_resident_model('tiny-a').name == 'tiny-a'
+                finally:
+                    release.set()
+                    for thread in threads:
+                        thread.join()
+            try:
+                registry = service.get_model_status()['registry']
+                assert [success for success, _ in results] == [True, True]
+                assert registry['loads'] == 2 and registry['loading'] == []
+            finally:
+                service.unload_model()
+    
+    def test_status_endpoint_reports_registry(self, tiny_models, client):
+        from app.services.model_service import ModelService
+        
+        with tiny_models.app_context():
+            service = ModelService()
+            with patch('app.api.model.model_service', service):
+                service.load_model('tiny-a')
+                service.use_model('tiny-a')
+                data = client.get('/api/models/status').get_json()['data']
+                service.unload_model()
+        
+        assert data['registry']['hits'] == 1 and data['registry']['misses'] == 1
+        assert data['registry']['resident'][0]['name'] == 'tiny-a'
+    
+    def test_background_load_and_warmup(self, tiny_models, client):
+        from app.services.model_service import ModelService
+        
+        service = ModelService()
+        with patch('app.api.model.model_service', service):
+            assert client.get('/api/health/ready').status_code == 503
+            service.start_background_load(tiny_models, 'tiny-a').join()
+            try:
+                health = client.get('/api/health').get_json()
+                ready = client.get('/api/health/ready')
+            finally:
+                service.unload_model()
+        
+        assert health['live'] and health['ready']
+        assert ready.status_code == 200
+        readiness = ready.get_json()
+        assert readiness['state'] == 'ready' and readiness['model'] == 'tiny-a'
+        assert readiness['load_seconds'] > 0 and readiness['warmup_seconds'] > 0
+    
+    def test_requests_answered_during_background_load(self, tiny_models, client):
+        import threading
+        from app.services.model_service import ModelService
+        from model import Kronos
+        
+        release = threading.Event()
+        from_pretrained = Kronos.from_pretrained.__func__
+        
+        def slow_from_pretrained(cls, path, *args, **kwargs):
+            release.wait(10)
+            return from_pretrained(cls, path, *args, **kwargs)
+        
+        service = ModelService()
+        with patch('app.api.model.model_service', service), \
+                patch.object(Kronos, 'from_pretrained', classmethod(slow_from_pretrained)):
+            loader = service.start_background_load(tiny_models, 'tiny-a', warmup=False)
+            try:
+                status = client.get('/api/models/status').get_json()['data']
+                ready = client.get('/api/health/ready')
+                with tiny_models.app_context():
+                    success, message = service.use_model('tiny-a')
+            finally:
+                release.set()
+                loader.join()
+        service.unload_model()
+        
+        assert status['readiness']['state'] == 'loading' and status['registry']['loading'] == ['tiny-a']
+        assert ready.status_code == 503
+        assert success is False and 'still loading' in message
+        assert service.active_model is None and service.registry_stats['loads'] == 1
+    
+    def test_failed_background_load(self, tiny_models, client):
+        from app.services.model_service import ModelService
+        
+        service = ModelService()
+        with patch('app.api.model.model_service', service):
+            service.start_background_load(tiny_models, 'unknown').join()
+            health = client.get('/api/health')
+            ready = client.get('/api/health/ready')
+        
+        assert health.status_code == 200 and health.get_json()['ready'] is False
+        assert client.get('/api/health/live').status_code == 200
+        assert ready.status_code == 503
+        assert ready.get_json()['state'] == 'failed' and 'not found' in ready.get_json()['error']
+
+class TestStartup:
+    """Test that the app starts without importing the model and data dependencies."""
+    
+    def test_heavy_imports_deferred(self):
+        import os
+        import subprocess
+        import sys
+        
+        code = ("import sys; from app import create_app; import model.onnx_backend; create_app('testing'); "
+                "assert 'kronos' in model.model_dict; "
+                "print(' '.join(m for m in ('torch', 'model.kronos', 'china_stock_data', 'pandas') if m in sys.modules))")
+        root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = subprocess.run([sys.executable, '-c', code], cwd=root_dir, capture_output=True, text=True, check=True)
+        
+        # model.onnx_backend needs pandas, but neither it nor the app needs torch
+        assert result.stdout.split() == ['pandas']
+    
+    def test_model_dict_resolves_classes(self):
+        import model
+        from model.kronos import Kronos, KronosPredictor
+        
+        assert model.model_dict['kronos'] is Kronos and model.get_model_class('kronos') is Kronos
+        assert dict(model.model_dict)['kronos_predictor'] is KronosPredictor